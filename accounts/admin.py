@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser
+from reports import purge
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
@@ -19,5 +20,21 @@ class CustomUserAdmin(UserAdmin):
         ('社員情報', {'fields': ('employee_id', 'department', 'position', 'bio')}),
     )
 
+    # 【論理削除】削除はログインを止めて日報を非表示にするだけにし、関連行はバックグラウンドで削除する（reports/purge.py）。
+    # 削除確認画面でも関連行（日報・コメントなど）を Collector で数えない
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(deleted_at__isnull=True)
+
+    def delete_model(self, request, obj):
+        purge.delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            purge.delete_user(user)
+
+    def get_deleted_objects(self, objs, request):
+        deleted = [str(obj) for obj in objs]
+        return deleted, {self.model._meta.verbose_name_plural: len(deleted)}, set(), []
+
 # カスタマイズした設定で登録
 admin.site.register(CustomUser, CustomUserAdmin)
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+【ログインユーザーのキャッシュ】
+AuthenticationMiddleware は、ログイン中のリクエストのたびにセッションのユーザーIDで custom_user を SELECT します。
+CachedModelBackend はユーザーをキャッシュ（CACHES['auth']）に保持し、2回目以降は DB を引きません。
+
+- ユーザーの保存・削除（パスワード変更の set_password() + save() を含む）で、シグナルからキャッシュを消す（accounts/signals.py）
+- QuerySet.update() / bulk_update() はシグナルを送らないため、社員の QuerySet（accounts.models.UserQuerySet）が
+  更新した行のキャッシュを消す
+- ORM を通らない変更（SQL の直接実行など）に備え、キャッシュの有効期限は短くしておく（settings.AUTH_USER_CACHE_TIMEOUT）
+- パスワードを変更すると、キャッシュから消えたユーザーを DB から読み直すので、他のセッションはこれまでどおりログアウトされる
+- ヒット・ミスの件数は /metrics に出す（ヒット1回 = 認証の SELECT 1回の節約）
+
+    AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import transaction
+
+from reports import metrics
+
+LABELS = (('cache', 'user'),)
+
+
+def _cache():
+    return caches[getattr(settings, 'AUTH_CACHE_ALIAS', 'auth')]
+
+
+def _key(user_id):
+    return f'accounts:user:{user_id}'
+
+
+def invalidate_users(user_ids, using=None):
+    """
+    社員のキャッシュを消す。トランザクションの中で呼ばれた場合、コミット前に他のリクエストが古い行を読んで
+    キャッシュし直すことがあるため、コミット後にもう一度消す。
+    """
+    keys = [_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    _cache().delete_many(keys)
+    transaction.on_commit(lambda: _cache().delete_many(keys), using=using)
+
+
+def invalidate_user(user_id, using=None):
+    invalidate_users([user_id], using=using)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend の get_user（リクエストごとのユーザーの読み込み）をキャッシュする。ログイン時の認証は ModelBackend のまま。
+    """
+
+    def get_user(self, user_id):
+        cache = _cache()
+        user = cache.get(_key(user_id))
+        if user is not None:
+            metrics.registry.inc('reports_auth_cache_hits_total', LABELS)
+            return user if self.user_can_authenticate(user) else None
+
+        metrics.registry.inc('reports_auth_cache_misses_total', LABELS)
+        user = super().get_user(user_id)
+        if user is not None:
+            cache.set(_key(user_id), user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 5 * 60))
+        return user
@@ -1,6 +1,27 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
+
+class UserQuerySet(models.QuerySet):
+    """
+    【ログインユーザーのキャッシュの無効化】
+    QuerySet.update()（bulk_update() も内部で使う）はシグナルを送らないため、更新した社員のキャッシュをここで消す
+    （accounts/backends.py）。更新する行の id を先に1回 SELECT する。
+    """
+
+    def update(self, **kwargs):
+        from .backends import invalidate_users
+
+        ids = list(self.values_list('pk', flat=True))
+        count = super().update(**kwargs)
+        invalidate_users(ids, using=self.db)
+        return count
+
+
+class CustomUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class CustomUser(AbstractUser):
     """
     【講義用ポイント】
@@ -19,6 +40,12 @@ class CustomUser(AbstractUser):
     # 「人となり」を知るための自己紹介（PDFのビジョン対応）
     bio = models.TextField("自己紹介", blank=True, help_text="趣味や最近ハマっていることなど")
 
+    # 【論理削除】削除された日時。削除時はログインできなくして（is_active=False）日報を非表示にし、
+    # 日報・コメントなどの関連行とユーザーの行はバックグラウンドで少しずつ削除する（reports/purge.py）
+    deleted_at = models.DateTimeField("削除日時", null=True, blank=True, editable=False)
+
+    objects = CustomUserManager()
+
     class Meta:
         db_table = 'custom_user'
         verbose_name = '社員'
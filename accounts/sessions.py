@@ -0,0 +1,36 @@
+"""
+【キャッシュ付きのセッション（write-through）】
+データベースのセッション（django.contrib.sessions.backends.db）では、ログイン中のリクエストのたびに
+django_session を SELECT します。ここでは Django の cached_db（保存時に DB とキャッシュの両方へ書く）を使い、
+読み取りはキャッシュにあれば DB を引きません。キャッシュが消えても DB から読み直すため、ログインは切れません。
+
+キャッシュは settings.SESSION_CACHE_ALIAS（CACHES['auth']）。ヒット・ミスの件数は /metrics に出します。
+
+    SESSION_ENGINE = 'accounts.sessions'
+"""
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+from reports import metrics
+
+LABELS = (('cache', 'session'),)
+
+
+class SessionStore(CachedDBStore):
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            # 不正なキーで例外を出すキャッシュもある（cached_db と同じく、その場合はミス扱い）
+            data = None
+        if data is not None:
+            metrics.registry.inc('reports_auth_cache_hits_total', LABELS)
+            return data
+
+        metrics.registry.inc('reports_auth_cache_misses_total', LABELS)
+        s = self._get_session_from_db()
+        if s is None:
+            return {}
+        data = self.decode(s.session_data)
+        self._cache.set(self.cache_key, data, self.get_expiry_age(expiry=s.expire_date))
+        return data
@@ -0,0 +1,18 @@
+"""
+【ログインユーザーのキャッシュの無効化】
+ユーザーの保存・削除に合わせて、CachedModelBackend のキャッシュ（accounts/backends.py）を消します。
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, using=None, **kwargs):
+    """
+    ユーザーの保存・削除（パスワード変更・ログイン日時の更新を含む）で、ログインユーザーのキャッシュを消す。
+    """
+    invalidate_user(instance.pk, using=using)
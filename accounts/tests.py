@@ -1,3 +1,57 @@
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+# セッション・ログインユーザーのキャッシュ（CACHES['auth']）は、テストではファイルではなくメモリに置く
+TEST_CACHES = {
+    **settings.CACHES,
+    'auth': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-auth'},
+}
+
+
+# パスワードのハッシュ計算が遅いと、遅いリクエストとしてログに出るため軽いものにする
+@override_settings(CACHES=TEST_CACHES, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedUserTests(TestCase):
+    """
+    【ログインユーザーのキャッシュ】パスワード変更や QuerySet.update() の後は、キャッシュではなく DB の社員で認証する。
+    """
+
+    def setUp(self):
+        caches['auth'].clear()
+        self.user = get_user_model().objects.create_user(username='tester', password='pass12345', employee_id='T0001')
+        self.url = reverse('report_feed')  # ログインが必要な画面
+        self.clients = []
+        for _ in range(2):
+            client = Client()
+            self.assertTrue(client.login(username='tester', password='pass12345'))
+            # 1回表示して、セッションとユーザーをキャッシュに載せる
+            self.assertEqual(client.get(self.url).status_code, 200)
+            self.clients.append(client)
+
+    def assertLoggedOut(self, client):
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('login')))
+
+    def test_password_change_logs_out_other_sessions(self):
+        changer, other = self.clients
+        response = changer.post(reverse('password_change'), {
+            'old_password': 'pass12345', 'new_password1': 'n3w-Passw0rd!', 'new_password2': 'n3w-Passw0rd!',
+        })
+        self.assertEqual(response.status_code, 302)
+
+        self.assertLoggedOut(other)
+        # 変更したセッションは update_session_auth_hash でログインしたまま
+        self.assertEqual(changer.get(self.url).status_code, 200)
+
+    def test_queryset_update_invalidates_cache(self):
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        for client in self.clients:
+            self.assertLoggedOut(client)
+
+    def test_bulk_update_invalidates_cache(self):
+        self.user.is_active = False
+        get_user_model().objects.bulk_update([self.user], ['is_active'])
+        self.assertLoggedOut(self.clients[0])
@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
+
+起動例（uvicorn ワーカーの gunicorn）:
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8001
 """
 
 import os
@@ -12,5 +15,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# 【追加】ASGI で起動したときは閲覧画面に非同期版のビューを使う（reports/async_views.py）
+os.environ.setdefault('REPORTS_ASYNC_VIEWS', '1')
+# 【追加】ASGI ではリクエストごとに別のスレッドで接続が作られるため、接続の再利用（CONN_MAX_AGE）を無効にする
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -44,6 +44,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # 【追加】静的ファイル（ハッシュ付き・事前圧縮済み）の配信。後続の処理を通さずに返すため先頭に置く
+    'reports.middleware.StaticFilesMiddleware',
+    # 【追加】画面ごとのレイテンシ・SQL・テンプレート時間の計測（全体を包むため先頭に置く）
+    'reports.middleware.MetricsMiddleware',
+    # 【追加】閲覧リクエストの読み取りをレプリカへ振り分ける（セッション・認証の読み取りも対象にするため Session より前）
+    'reports.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,7 +63,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # 【変更】描画時間を計測する DjangoTemplates（reports/metrics.py）
+        'BACKEND': 'reports.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -90,9 +97,66 @@ DATABASES = {
         'PASSWORD': 'postgres',
         'HOST': 'db',
         'PORT': '5432',
+        # 【追加】接続をリクエストごとに張り直さず再利用する（秒）。再利用の前に接続が生きているかを確認する
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# 【追加】読み取り専用レプリカ。DB_REPLICA_HOSTS にカンマ区切りでホストを指定すると replica1, replica2, ... を追加する
+# （ローカルでは DB_REPLICA_HOSTS=db とすると、同じDBを指す2つ目の接続名で振り分けを確認できる）
+for number, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['reports.routers.PrimaryReplicaRouter']
+
+# 【追加】書き込みの後、そのブラウザの読み取りをプライマリに固定する時間（秒）。レプリカの遅延より長くする
+REPLICA_PIN_SECONDS = 5
+
+
+# 【追加】キャッシュ
+# fragments: 一覧カードのHTMLキャッシュ。LocMemCache は件数上限に達すると
+# 最も長く参照されていないもの（LRU）から削除するため、外部サーバー無しでメモリ使用量が頭打ちになる
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'report-fragments',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 10,  # 上限到達時に古い順から 1/10 を削除
+        },
+    },
+    # auth: セッションとログインユーザー（accounts/sessions.py, accounts/backends.py）。
+    # ログアウトやパスワード変更をすべてのワーカーに即座に反映するため、プロセスごとの LocMemCache ではなく
+    # ワーカー間で共有できるキャッシュにする（既定はファイル。Redis などがあれば AUTH_CACHE_BACKEND で差し替える）
+    'auth': {
+        'BACKEND': os.environ.get('AUTH_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('AUTH_CACHE_LOCATION', os.path.join(BASE_DIR, '.cache', 'auth')),
+        'TIMEOUT': 60 * 60 * 24 * 14,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+}
+
+# 【追加】セッションはキャッシュから読み、保存時は DB とキャッシュの両方に書く（write-through）
+SESSION_ENGINE = 'accounts.sessions'
+SESSION_CACHE_ALIAS = 'auth'
+
+# 【追加】リクエストごとのログインユーザーの読み込みをキャッシュする（保存・削除・QuerySet.update で無効化）
+# ORM を通らない変更（SQL の直接実行など）も、有効期限（秒）が過ぎれば反映される
+AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+AUTH_CACHE_ALIAS = 'auth'
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -130,6 +194,14 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# 【追加】collectstatic の出力先。ハッシュ付きのファイル名と gzip / brotli の圧縮版を書き出し、
+# reports.middleware.StaticFilesMiddleware が長期キャッシュのヘッダー付きで配信する（reports/staticfiles.py）
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'reports.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -141,6 +213,41 @@ MEDIA_URL = '/media/'
 # 画像ファイルの実際の保存場所（プロジェクト内の 'media' フォルダ）
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# 【追加】PVカウントをDBへまとめて書き出す間隔（秒）。0 なら閲覧ごとに即時反映
+VIEW_COUNT_FLUSH_INTERVAL = 5
+
+# 【追加】閲覧画面を非同期版（reports/async_views.py）で動かすか。config/asgi.py が ASGI 起動時に有効にする
+ASYNC_READ_VIEWS = os.environ.get('REPORTS_ASYNC_VIEWS') == '1'
+
+# 【追加】非同期ビューが並行クエリに使うスレッド数（= プロセスあたりの追加のDB接続数の上限）
+ASYNC_DB_WORKERS = 4
+
+# 【追加】画像の縮小版・WebP版をバックグラウンドのスレッドで生成するか（False ならコミット直後に同期生成）
+IMAGE_DERIVATIVES_ASYNC = True
+
+# 【追加】この時間（ミリ秒）を超えたリクエストを SQL つきで警告ログに出す。0 なら無効
+METRICS_SLOW_REQUEST_MS = 500
+
+# 【追加】/metrics の認証トークン（未設定なら誰でも取得可能。本番では環境変数で設定する）
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# 【追加】作成からこの日数より前の月の日報を archive_reports コマンドでアーカイブへ移す（reports/archive.py）
+REPORT_ARCHIVE_AFTER_DAYS = 365
+
+# 【追加】SOS（調子: 不調）の通知の送り方（reports/alerts.py）。EmailBackend にするとメールで送る
+SOS_NOTIFY_BACKEND = os.environ.get('SOS_NOTIFY_BACKEND', 'reports.alerts.FileBackend')
+SOS_NOTIFY_FILE = os.path.join(BASE_DIR, 'sos_alerts.log')
+# 通知先の役職（日報の部署のこの役職のユーザーに通知し、いなければスタッフに通知する）と、通知に載せるURLの先頭
+SOS_MANAGER_POSITIONS = ['リーダー', 'PM']
+SOS_NOTIFY_BASE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+
+# 【追加】似ている日報の索引（TF-IDF のスナップショット。reports/similar.py）の保存先。
+# Web と run_workers（build_similar_index ジョブで作り直す）の両方から同じディレクトリを参照すること
+SIMILAR_INDEX_DIR = os.environ.get('SIMILAR_INDEX_DIR', os.path.join(BASE_DIR, 'similar_index'))
+
+# 【追加】日報の一括投稿（reports/batch.py）ができる役職（スタッフは役職に関係なく投稿できる）
+REPORT_BATCH_POSITIONS = ['リーダー', 'PM']
+
 # 【追加】ログイン・ログアウト後のリダイレクト先
 LOGIN_REDIRECT_URL = 'report_list'  # ログインしたら一覧ページへ
 LOGOUT_REDIRECT_URL = 'report_list' # ログアウトしても一覧ページへ
@@ -1,8 +1,28 @@
 from django.contrib import admin
 from .models import DailyReport, Category, Tag, Comment
+from . import purge
+
+
+class DailyReportAdmin(admin.ModelAdmin):
+    """
+    【論理削除】管理画面からの削除も、コメントなどの関連行をまとめて削除せずに論理削除する（reports/purge.py）。
+    削除確認画面でも関連行を Collector で数えない（コメントの多い日報で確認画面が重くなるのを防ぐ）。
+    """
+
+    def delete_model(self, request, obj):
+        purge.delete_report(obj)
+
+    def delete_queryset(self, request, queryset):
+        for report in queryset:
+            purge.delete_report(report)
+
+    def get_deleted_objects(self, objs, request):
+        deleted = [str(obj) for obj in objs]
+        return deleted, {self.model._meta.verbose_name_plural: len(deleted)}, set(), []
+
 
 # 管理画面に日報関連のテーブルを表示する
-admin.site.register(DailyReport)
+admin.site.register(DailyReport, DailyReportAdmin)
 admin.site.register(Category)
 admin.site.register(Tag)
-admin.site.register(Comment)
\ No newline at end of file
+admin.site.register(Comment)
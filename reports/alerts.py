@@ -0,0 +1,167 @@
+"""
+【SOS アラート】
+調子が「不調/SOS」の日報が投稿された（または編集で SOS に変わった）ら、その部署の管理者に通知します。
+通知は日報を保存するトランザクションの中では行わず、コミット後にジョブキュー（reports/jobs.py）へ積み、
+run_workers コマンドが送ります。投稿の応答時間は通知先の数やメールサーバーの速さに左右されません。
+
+- notify_sos: 日報の部署の管理者（settings.SOS_MANAGER_POSITIONS の役職。部署にいなければスタッフ）に通知する。
+  同じバッチに複数の SOS があれば、管理者ごとに1通にまとめる。送信までに SOS でなくなった日報は通知しない
+- refresh_rollups: SOS の日報の日付のロールアップを日報から作り直す（reports/rollups.py）。
+  シグナルを経由しない変更でずれていても、SOS が出た日のダッシュボードの SOS 率はこれで正しくなる
+
+通知の送り方は settings.SOS_NOTIFY_BACKEND で切り替える。
+- FileBackend: settings.SOS_NOTIFY_FILE に JSONL で追記する（開発・検証用）
+- EmailBackend: Django のメール送信（settings.EMAIL_BACKEND の設定に従う）。全員分を1つの接続で送る
+"""
+import json
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mass_mail
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.module_loading import import_string
+
+from . import jobs, rollups
+from .models import DailyReport
+
+SOS_CONDITION = rollups.SOS_CONDITION
+
+
+@dataclass
+class Notification:
+    """
+    1人の管理者に送る1通分の通知。
+    """
+    recipient: object
+    subject: str
+    body: str
+    report_ids: list = field(default_factory=list)
+
+
+class FileBackend:
+    """
+    通知を1行1通の JSONL でファイルに追記する。
+    """
+
+    def __init__(self):
+        self.path = getattr(settings, 'SOS_NOTIFY_FILE', 'sos_alerts.log')
+
+    def send(self, notifications):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for n in notifications:
+                f.write(json.dumps({
+                    'sent_at': timezone.now().isoformat(),
+                    'to': n.recipient.username,
+                    'subject': n.subject,
+                    'body': n.body,
+                    'reports': n.report_ids,
+                }, ensure_ascii=False) + '\n')
+
+
+class EmailBackend:
+    """
+    通知をメールで送る。メールアドレスの無い管理者には送らない。
+    """
+
+    def send(self, notifications):
+        messages = [
+            (n.subject, n.body, None, [n.recipient.email])
+            for n in notifications if n.recipient.email
+        ]
+        if messages:
+            send_mass_mail(messages, fail_silently=False)
+
+
+def get_backend():
+    return import_string(getattr(settings, 'SOS_NOTIFY_BACKEND', 'reports.alerts.FileBackend'))()
+
+
+def report_saved(report, was_sos=False):
+    """
+    日報の投稿・編集のトランザクションの中でビューから呼ぶ。SOS になった日報の通知とロールアップの作り直しを、
+    コミット後にジョブキューへ積む（もともと SOS だった日報の編集では積まない）。
+    """
+    if report.condition != SOS_CONDITION or was_sos:
+        return
+    jobs.enqueue('notify_sos', {'report_id': report.pk})
+    jobs.enqueue('refresh_rollups', {'date': timezone.localdate(report.created_at).isoformat()})
+
+
+def reports_saved(reports):
+    """
+    一括投稿（reports/batch.py）で作成した日報について、report_saved と同じジョブを種類ごとに INSERT 1回で積む。
+    """
+    sos = [report for report in reports if report.condition == SOS_CONDITION]
+    jobs.enqueue_many('notify_sos', [{'report_id': report.pk} for report in sos])
+    days = sorted({timezone.localdate(report.created_at).isoformat() for report in sos})
+    jobs.enqueue_many('refresh_rollups', [{'date': day} for day in days])
+
+
+def managers_by_department(departments):
+    """
+    部署 → 通知先の管理者のリスト。管理者のいない部署はスタッフ（is_staff）に通知する。
+    """
+    User = get_user_model()
+    active = User.objects.filter(is_active=True)
+    positions = getattr(settings, 'SOS_MANAGER_POSITIONS', ['リーダー', 'PM'])
+    found = {department: [] for department in departments}
+    for user in active.filter(department__in=departments, position__in=positions).order_by('pk'):
+        found[user.department].append(user)
+    if not all(found.values()):
+        staff = list(active.filter(is_staff=True).order_by('pk'))
+        for department, users in found.items():
+            if not users:
+                users.extend(staff)
+    return found
+
+
+def _message(recipient, reports):
+    base_url = getattr(settings, 'SOS_NOTIFY_BASE_URL', '')
+    lines = [f'{recipient.username} さん', '', 'コンディションが「不調/SOS」の日報が投稿されました。', '']
+    for report in reports:
+        lines.append(f'- {report.author.username}（{report.department}）: {report.title}')
+        lines.append(f'  {base_url}{reverse("report_detail", args=[report.pk])}')
+    return Notification(
+        recipient=recipient,
+        subject=f'【SOS】{len(reports)} 件の日報で不調の申告がありました',
+        body='\n'.join(lines) + '\n',
+        report_ids=[report.pk for report in reports],
+    )
+
+
+@jobs.handler('notify_sos')
+def notify_sos(payloads):
+    """
+    SOS の日報の部署の管理者に通知する。同じ管理者宛ての通知は1通にまとめる。
+    """
+    ids = {payload['report_id'] for payload in payloads}
+    reports = list(
+        DailyReport.objects.select_related('author').filter(pk__in=ids, condition=SOS_CONDITION)
+                           .only('title', 'department', 'author__username').order_by('pk')
+    )
+    if not reports:
+        return
+    managers = managers_by_department({report.department for report in reports})
+
+    inbox = {}
+    for report in reports:
+        for manager in managers[report.department]:
+            if manager.pk != report.author_id:
+                inbox.setdefault(manager.pk, (manager, []))[1].append(report)
+    notifications = [_message(manager, items) for manager, items in inbox.values()]
+    if notifications:
+        get_backend().send(notifications)
+
+
+@jobs.handler('refresh_rollups')
+def refresh_rollups(payloads):
+    """
+    指定された日付のロールアップを作り直す（同じ日付は1回だけ）。
+    rollups.rebuild は作り直しの間ロールアップのテーブルをロックするため、同時に保存された日報の差分更新は失われない。
+    """
+    for value in sorted({payload['date'] for payload in payloads}):
+        day = parse_date(value)
+        rollups.rebuild(day, day)
@@ -0,0 +1,230 @@
+"""
+【読み取り専用の JSON API】
+社内ダッシュボードやモバイルアプリ向けに、日報の一覧・詳細を JSON で返します。
+
+    GET /api/reports/?query=...&category=...&cursor=...&limit=...&fields=title,condition
+    GET /api/reports/<id>/?fields=...
+
+書き込みは一括投稿（reports/batch.py）の1つだけです。
+
+    POST /api/reports/batch/  {"reports": [{"author": "<社員番号>", "category": <カテゴリーID>, "tags": [<タグID>, ...],
+                                            "condition": "normal", "title": "...", "content": "..."}, ...]}
+
+- 一覧はキーセット（カーソル）ページネーション（reports/pagination.py）。next_cursor / prev_cursor を cursor に渡す
+- fields で返す項目を絞ると、その項目に必要な列・JOIN・prefetch だけを実行する（id は常に返す）
+- 強い ETag を返す。If-None-Match が一致すれば 304 Not Modified を返し、本体の取得・シリアライズは行わない
+
+【ETag の計算】
+ETag は「そのページに並ぶ日報の (id, updated_at, comment_count)」と次・前のページのカーソル、
+表示名の世代番号（fragments.current_versions）から作る。
+- 日報の編集・タグの付け替え → updated_at が変わる（signals.py）
+- コメントの投稿・削除       → comment_count が変わる
+- 日報の追加・削除           → ページに並ぶ id か、next_cursor / prev_cursor（次・前のページの有無）が変わる
+- ユーザー名・カテゴリー名・タグ名の変更 → 世代番号が変わる
+これらは (created_at, id) などのインデックスを辿る細い SELECT だけで求まるため、
+ポーリングが 304 で終わる場合は著者・カテゴリーの JOIN もタグの prefetch も実行しない。
+PV数（view_count）は閲覧のたびに変わり ETag が一致しなくなるため、API では返さない。
+"""
+import hashlib
+import json
+
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET, require_POST
+
+from . import batch, fragments, search
+from .forms import ReportApiForm
+from .models import DailyReport
+from .pagination import PAGE_SIZE, paginate
+
+# レスポンスの形式を変えたら上げる（古い形式の ETag と一致させない）
+API_VERSION = 1
+
+
+def _image_url(report):
+    return report.image.url if report.image else None
+
+
+# 項目名 → (必要な列, select_related, prefetch_related, 値の取り出し)
+FIELDS = {
+    'title': (('title',), None, None, lambda r: r.title),
+    'content': (('content',), None, None, lambda r: r.content),
+    'condition': (('condition',), None, None, lambda r: r.condition),
+    'author': (
+        ('author__username', 'author__employee_id'), 'author', None,
+        lambda r: {'id': r.author_id, 'username': r.author.username, 'employee_id': r.author.employee_id},
+    ),
+    'category': (
+        ('category__name', 'category__slug'), 'category', None,
+        lambda r: {'id': r.category_id, 'name': r.category.name, 'slug': r.category.slug},
+    ),
+    'tags': ((), None, 'tags', lambda r: [tag.name for tag in r.tags.all()]),
+    'comment_count': (('comment_count',), None, None, lambda r: r.comment_count),
+    'image': (('image',), None, None, _image_url),
+    'created_at': (('created_at',), None, None, lambda r: r.created_at.isoformat()),
+    'updated_at': (('updated_at',), None, None, lambda r: r.updated_at.isoformat()),
+}
+# 名前の世代番号（fragments.VERSION_NAMES）が表示に影響する項目
+VERSIONED_FIELDS = {'author', 'category', 'tags'}
+
+
+def parse_fields(value):
+    """
+    ?fields=title,condition を項目名のタプルにする（未指定なら全項目）。未知の項目は ValueError。
+    """
+    if not value:
+        return tuple(FIELDS)
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip() and name.strip() != 'id'))
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown:
+        raise ValueError(f"未知の項目です: {', '.join(unknown)}（指定できる項目: {', '.join(FIELDS)}）")
+    return names
+
+
+def _load(queryset, fields):
+    """
+    fields の出力に必要な列・JOIN・prefetch だけを読み込む queryset にする。
+    """
+    columns = ['id']
+    related, prefetch = [], []
+    for name in fields:
+        field_columns, select, prefetch_name = FIELDS[name][:3]
+        columns.extend(field_columns)
+        if select:
+            related.append(select)
+        if prefetch_name:
+            prefetch.append(prefetch_name)
+    if related:
+        # 引数なしの select_related() はすべての外部キーを JOIN するため、必要なときだけ呼ぶ
+        queryset = queryset.select_related(*related)
+    return queryset.prefetch_related(*prefetch).only(*columns)
+
+
+def serialize(report, fields):
+    data = {'id': report.pk}
+    for name in fields:
+        data[name] = FIELDS[name][3](report)
+    return data
+
+
+def _etag(fields, keys, cursors=()):
+    """
+    (id, updated_at, comment_count) の並びとページ送りのカーソル、表示名の世代番号から強い ETag を作る。
+    """
+    parts = [str(API_VERSION), ','.join(fields), *(cursor or '' for cursor in cursors)]
+    if VERSIONED_FIELDS.intersection(fields):
+        parts.append(fragments.current_versions())
+    parts.extend(f'{pk}:{updated_at.timestamp()}:{comment_count}' for pk, updated_at, comment_count in keys)
+    return quote_etag(hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest())
+
+
+def _not_modified(request, etag):
+    """
+    If-None-Match が一致すれば 304 のレスポンスを返す（一致しなければ None）。
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _json(data, etag, status=200):
+    response = JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+    response['ETag'] = etag
+    # キャッシュしてよいが、使う前に必ず ETag で再検証させる
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+def report_list(request):
+    """
+    日報一覧の JSON。絞り込み条件は一覧画面と同じ（search.apply_filters）。
+    1. ページに並ぶ日報の (id, updated_at, comment_count) だけをキーセットで取得して ETag を計算
+    2. 一致すれば 304。一致しなければ、その id の日報を fields に必要な分だけ読み込んで返す
+    """
+    form = ReportApiForm(request.GET)
+    if not form.is_valid():
+        return _error(form.errors.as_text())
+    data = form.cleaned_data
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return _error(str(e))
+
+    keys = DailyReport.objects.only('id', 'created_at', 'updated_at', 'comment_count')
+    keys, order_field = search.apply_filters(keys, data['query'], data['category'])
+    page = paginate(keys, data['cursor'], page_size=data['limit'] or PAGE_SIZE, order_field=order_field)
+
+    # 本体に含める next_cursor / prev_cursor も ETag に入れる（ページの後ろに日報が増えた場合など）
+    etag = _etag(fields, [(r.pk, r.updated_at, r.comment_count) for r in page], (page.next_cursor, page.prev_cursor))
+    response = _not_modified(request, etag)
+    if response is not None:
+        return response
+
+    ids = [r.pk for r in page]
+    reports = {r.pk: r for r in _load(DailyReport.objects.filter(pk__in=ids), fields)}
+    return _json({
+        'results': [serialize(reports[pk], fields) for pk in ids if pk in reports],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }, etag)
+
+
+@require_GET
+def report_detail(request, pk):
+    """
+    日報1件の JSON。(updated_at, comment_count) だけを読んで ETag を計算し、一致すれば 304 を返す。
+    """
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return _error(str(e))
+
+    key = DailyReport.objects.filter(pk=pk).values_list('updated_at', 'comment_count').first()
+    if key is None:
+        return _error('日報が見つかりません', status=404)
+    etag = _etag(fields, [(pk, *key)])
+    response = _not_modified(request, etag)
+    if response is not None:
+        return response
+
+    try:
+        # first() だと ORDER BY が付き、SQLite では主キー検索の1行でもソートが入るため get() で読む
+        report = _load(DailyReport.objects.filter(pk=pk), fields).get()
+    except DailyReport.DoesNotExist:
+        return _error('日報が見つかりません', status=404)
+    return _json(serialize(report, fields), etag)
+
+
+@require_POST
+def report_batch(request):
+    """
+    日報の一括投稿。画面（views.report_batch）と同じ検証で、エラーは行ごとに返す（1行でもエラーがあれば保存しない）。
+    ログイン中のセッションで呼ぶため、X-CSRFToken ヘッダーが必要。成功すると作成した日報の id を 201 で返す。
+    """
+    if not request.user.is_authenticated:
+        return _error('ログインが必要です', status=401)
+    if not batch.can_submit(request.user):
+        return _error('一括投稿の権限がありません', status=403)
+    try:
+        rows = json.loads(request.body)['reports']
+    except (ValueError, KeyError, TypeError):
+        return _error('本文は {"reports": [...]} の JSON で指定してください')
+    if not isinstance(rows, list) or not rows:
+        return _error('reports には1件以上の日報を指定してください')
+    if len(rows) > batch.MAX_ROWS:
+        return _error(f'一度に投稿できるのは {batch.MAX_ROWS} 件までです')
+
+    choices = batch.choices_for(request.user)
+    cleaned, errors = batch.validate(rows, choices)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400, json_dumps_params={'ensure_ascii': False})
+    reports = batch.save(cleaned, choices)
+    return JsonResponse({'ids': [report.pk for report in reports]}, status=201)
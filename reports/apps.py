@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reports'
+
+    def ready(self):
+        # シグナルハンドラの登録
+        from . import signals  # noqa: F401
+        # ジョブキューのハンドラの登録（reports/jobs.py）
+        from . import alerts, purge  # noqa: F401
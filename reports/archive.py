@@ -0,0 +1,165 @@
+"""
+【古い日報のアーカイブ（コールドストレージ）】
+作成から1年以上たった日報はほとんど読まれない一方で、日報・コメントのテーブルとインデックスを大きくし、
+VACUUM の対象を増やします。archive_reports コマンドで、それらを日報テーブルから ArchivedReport へ移します。
+
+- 日報1件をコメント・タグごと1レコード（transfer.report_to_record と同じ形式）にまとめ、zlib で圧縮して1行に保存する。
+  import_reports の入力と同じ形式なので、unpack() した内容はそのまま取り込み直せる
+- アーカイブした日報は、一覧・検索・ランキング・ダッシュボード・ファセット件数・部署フィードの対象から外れる
+  （派生テーブルには削除と同じ差分をまとめて反映する）
+- 詳細画面（report_detail）は、日報テーブルに無い ID をアーカイブから探して閲覧専用で表示する
+- 移す単位は月で、cutoff() の月より前の月をすべて移す
+  - PostgreSQL（月別パーティション。reports/partitions.py）: 月ごとに1トランザクションでアーカイブへコピーし、
+    最後にパーティションを DETACH して DROP する（日報の行は DELETE しない）
+  - それ以外（とデフォルトパーティションの行）: BATCH_SIZE 件ずつ、コピーと DELETE を1トランザクションで行う
+- 画像ファイルは削除しない（アーカイブの詳細画面でも表示する）
+"""
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import facets, partitions, rollups, stats, transfer
+from .models import ArchivedReport, Comment, DailyReport, DepartmentFeedEntry, ReportSearchDocument
+
+Through = DailyReport.tags.through
+
+# 1トランザクション（パーティション単位の場合は1回の SELECT）で移す日報の件数
+BATCH_SIZE = 500
+
+
+def pack(record):
+    return zlib.compress(json.dumps(record, ensure_ascii=False).encode(), 9)
+
+
+def unpack(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+def cutoff(days=None, now=None):
+    """
+    アーカイブの境界。days 日前（既定は settings.REPORT_ARCHIVE_AFTER_DAYS）を含む月の月初（UTC）で、
+    これより前に作成された日報がアーカイブの対象になる。
+    """
+    if days is None:
+        days = getattr(settings, 'REPORT_ARCHIVE_AFTER_DAYS', 365)
+    return partitions.month_start((now or timezone.now()) - timedelta(days=days))
+
+
+def _delete(model, column, ids):
+    # 削除のシグナル（コメント件数・集計テーブルの差分更新）を送らずに削除する。派生テーブルは呼び出し元でまとめて更新する
+    table = connection.ops.quote_name(model._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {connection.ops.quote_name(column)} IN ({placeholders})', ids)
+
+
+def archive_batch(ids, delete_reports=True):
+    """
+    ids の日報をアーカイブへコピーし、コメント・タグ・検索ドキュメント・部署フィードの行を削除して派生テーブルから差し引く。
+    delete_reports=False なら日報の行は残す（パーティションごと削除する場合）。移した件数を返す。
+    呼び出し元のトランザクションの中で実行すること。
+    """
+    reports = list(transfer.export_queryset(DailyReport.objects.filter(pk__in=ids)))
+    if not reports:
+        return 0
+    # 部署はロールアップの差し引きにだけ使う（出力用の queryset では読み込まない列）
+    departments = dict(DailyReport.objects.filter(pk__in=ids).values_list('pk', 'department'))
+    now = timezone.now()
+    ArchivedReport.objects.bulk_create([
+        ArchivedReport(
+            id=report.pk, author_id=report.author_id, category_id=report.category_id, title=report.title,
+            condition=report.condition, created_at=report.created_at, archived_at=now,
+            payload=pack(transfer.report_to_record(report)),
+        )
+        for report in reports
+    ])
+
+    # 日報の削除時のシグナル（signals.update_stats_on_delete）と同じ差分を、まとめて反映する
+    deltas = {}
+    for report in reports:
+        report.department = departments[report.pk]
+        key = (report.author_id, report.condition)
+        deltas[key] = deltas.get(key, 0) - 1
+    for (author_id, condition), delta in deltas.items():
+        stats.add(author_id, condition, delta)
+    rollups.add_reports(reports, delta=-1)
+    facets.add_reports(reports, [(report, tag.pk) for report in reports for tag in report.tags.all()], delta=-1)
+
+    ids = [report.pk for report in reports]
+    _delete(ReportSearchDocument, 'report_id', ids)
+    _delete(DepartmentFeedEntry, 'report_id', ids)
+    _delete(Comment, 'report_id', ids)
+    _delete(Through, 'dailyreport_id', ids)
+    if delete_reports:
+        _delete(DailyReport, 'id', ids)
+    return len(reports)
+
+
+def _id_batches(reports, batch_size):
+    """
+    reports の ID を batch_size 件ずつ、ID 順のキーセットで返す。
+    """
+    last = 0
+    while True:
+        ids = list(reports.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def archive_before(before, batch_size=BATCH_SIZE):
+    """
+    before より前に作成された日報をアーカイブへ移す。(移した件数, 削除したパーティション名のリスト) を返す。
+    """
+    archived, dropped = 0, []
+    for name, start, end in partitions.partitions_before(before):
+        # 1か月分を1トランザクションで移す（途中で失敗しても、その月は日報テーブルに残ったまま）
+        with transaction.atomic():
+            for ids in _id_batches(DailyReport.objects.filter(created_at__gte=start, created_at__lt=end), batch_size):
+                archived += archive_batch(ids, delete_reports=False)
+            # パージ待ちの論理削除した日報はアーカイブせず、関連行だけ削除してパーティションと一緒に消す
+            deleted = DailyReport.all_objects.filter(created_at__gte=start, created_at__lt=end, deleted_at__isnull=False)
+            for ids in _id_batches(deleted, batch_size):
+                _delete(ReportSearchDocument, 'report_id', ids)
+                _delete(DepartmentFeedEntry, 'report_id', ids)
+                _delete(Comment, 'report_id', ids)
+                _delete(Through, 'dailyreport_id', ids)
+            partitions.drop_partition(name)
+        dropped.append(name)
+
+    # パーティションに分かれていない行（SQLite などの全件、PostgreSQL のデフォルトパーティションの行）
+    for ids in _id_batches(DailyReport.objects.filter(created_at__lt=before), batch_size):
+        with transaction.atomic():
+            archived += archive_batch(ids)
+    return archived, dropped
+
+
+def load(pk):
+    """
+    詳細画面用に、アーカイブした日報を読み込む（無ければ None）。
+    圧縮を展開したレコードを record に、表示用のコメント（著者名つき）を comments に、画像の URL を image_url に持たせる。
+    """
+    archived = ArchivedReport.objects.select_related('category').filter(pk=pk).first()
+    if archived is None:
+        return None
+    record = unpack(archived.payload)
+    comments = record.get('comments') or []
+    names = dict(
+        get_user_model().objects.filter(employee_id__in={c['author'] for c in comments})
+                                .values_list('employee_id', 'username')
+    )
+    archived.record = record
+    archived.comments = [
+        {'author': names.get(c['author'], c['author']), 'text': c['text'], 'created_at': parse_datetime(c['created_at'])}
+        for c in comments
+    ]
+    archived.image_url = default_storage.url(record['image']) if record.get('image') else None
+    return archived
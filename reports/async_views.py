@@ -0,0 +1,147 @@
+"""
+【非同期版の閲覧画面（ASGI 用）】
+report_list / report_detail / report_ranking の非同期版です。ASGI で起動したとき（config/asgi.py）に
+urls.py がこちらを使います。画面の内容とクエリは views.py の同期版と同じで、違いは次の点です。
+
+- 互いに独立したクエリを同時に実行する
+  （リクエストの接続では非同期ORM、もう一方は asyncdb.run で別の接続。詳細は reports/asyncdb.py）
+- リクエストの処理中に WSGI のようにワーカースレッドを占有しないため、
+  DBの応答待ちの間も同じプロセスで他のリクエストを処理できる
+
+書き込み（コメント投稿）は同期版のビューに委譲します。
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import render
+
+from . import asyncdb, fragments, search, similar, stats, views, viewcounter
+from .forms import CommentForm
+from .models import Category, DailyReport
+from .pagination import paginate
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset.aiterator()]
+
+
+async def _load_user(request):
+    # テンプレート（context processor）から request.user を参照したときに
+    # 非同期コンテキストで同期クエリが走らないよう、先に非同期で読み込んで差し替える
+    request.user = await request.auser()
+    return request.user
+
+
+async def report_list(request):
+    """
+    日報一覧表示 + 検索・絞り込み機能（非同期版。内容は views.report_list と同じ）
+    【並行実行】
+    - 1ページ分の日報 + カードHTML（検索・キーセットページネーション・フラグメントキャッシュ）: 別の接続
+    - ファセット件数: 別の接続
+    - 検索フォーム用のカテゴリー一覧: リクエストの接続（非同期ORM）
+    の3つを同時に実行します。
+    """
+    filters = search.parse_filters(request.GET)
+    cursor = request.GET.get('cursor')
+
+    def load_page():
+        reports, order_field = search.apply_filters(
+            DailyReport.objects.select_related('author', 'category'), **filters,
+        )
+        page = paginate(reports, cursor, order_field=order_field)
+        return page, fragments.render_cards(page)
+
+    _, (page, (cards, hits, misses)), (counts, tags), categories = await asyncio.gather(
+        _load_user(request),
+        asyncdb.run(load_page),
+        asyncdb.run(views._report_facets, filters),
+        _alist(Category.objects.all()),
+    )
+
+    params = request.GET.copy()
+    params.pop('cursor', None)
+
+    context = {
+        'cards': cards,
+        'page': page,
+        'base_query': params.urlencode(),
+        'categories': categories,
+        'facets': views._facet_links(request.GET, filters, counts, tags, categories),
+        'filters': filters,
+        'request': request,
+    }
+    response = render(request, 'reports/report_list.html', context)
+    response['X-Card-Cache'] = f'hit={hits} miss={misses}'
+    return response
+
+
+async def report_detail(request, pk):
+    """
+    記事詳細表示（非同期版。内容は views.report_detail と同じ）
+    【並行実行】
+    - 日報本体 + 著者 + カテゴリー + タグ: リクエストの接続（aget）
+    - コメント1ページ分: 別の接続
+    - 似ている日報: 別の接続
+    コメント・似ている日報の取得は日報IDだけで行えるため、日報本体の取得を待たずに開始します。
+    """
+    if request.method == 'POST':
+        # コメント投稿（書き込み）は同期版で処理する
+        return await sync_to_async(views.report_detail)(request, pk)
+
+    cursor = request.GET.get('comments')
+
+    def load_comments():
+        comments = paginate(
+            DailyReport(pk=pk).comments.select_related('author').filter(author__deleted_at__isnull=True),
+            cursor, page_size=views.COMMENT_PAGE_SIZE,
+        )
+        comments.object_list.reverse()
+        return comments
+
+    try:
+        _, report, comments, similar_reports = await asyncio.gather(
+            _load_user(request),
+            DailyReport.objects.select_related('author', 'category').prefetch_related('tags').aget(pk=pk),
+            asyncdb.run(load_comments),
+            asyncdb.run(similar.similar_reports, pk),
+        )
+    except DailyReport.DoesNotExist:
+        # アーカイブ済みの日報（閲覧専用）は同期版で表示する
+        return await sync_to_async(views.report_archived)(request, pk)
+
+    # PVの加算はメモリ上のバッファに積むだけ（即時反映の設定なら書き込みが発生するので同期で実行）
+    if viewcounter.buffer.interval > 0:
+        report.view_count += viewcounter.record_view(report.pk)
+    else:
+        report.view_count += await sync_to_async(viewcounter.record_view)(report.pk)
+
+    context = {
+        'report': report,
+        'comments': comments,
+        'comment_form': CommentForm(),
+        'similar_reports': similar_reports,
+    }
+    return render(request, 'reports/report_detail.html', context)
+
+
+async def report_ranking(request):
+    """
+    ランキング・集計画面（非同期版。内容は views.report_ranking と同じ）
+    【並行実行】投稿数ランキングと SOS ランキングの Top-N を別々の接続で同時に読み出します。
+    """
+    user = await _load_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    # 読み出しは同期版と同じ stats の関数（リクエストの接続と、プールの別の接続で同時に実行）
+    effort_ranking, sos_ranking = await asyncio.gather(
+        sync_to_async(stats.effort_ranking)(5),
+        asyncdb.run(stats.sos_ranking, 5),
+    )
+
+    context = {
+        'effort_ranking': effort_ranking,
+        'sos_ranking': sos_ranking,
+    }
+    return render(request, 'reports/report_ranking.html', context)
@@ -0,0 +1,95 @@
+"""
+【非同期ビューからのDBクエリの並行実行】
+Django の非同期ORM（aget, aiterator など）は、1リクエスト内では同じDB接続・同じスレッドで順番に実行されるため、
+互いに独立したクエリを asyncio.gather() で並べても実際には1本ずつしか流れません。
+
+ここでは専用のスレッドプールを用意し、各スレッドが自分専用のDB接続を持つようにします。
+    page, category_count = await asyncio.gather(
+        asyncdb.run(load_page),                                  # プールのスレッド（別の接続）
+        Category.objects.acount(),                               # リクエストの接続（非同期ORM）
+    )
+のように、非同期ORMの実行と run() の実行が別々の接続で同時に進みます。
+
+- 接続はスレッドごとに保持し、実行の前後で close_old_connections() を呼ぶ
+  （CONN_MAX_AGE を過ぎた接続・壊れた接続を捨てる。CONN_MAX_AGE=0 の場合は毎回接続し直す）
+- 同時に張る接続数は settings.ASYNC_DB_WORKERS（プロセスあたり）で頭打ちになる
+- 実行中の SQL・テンプレート描画は、呼び出し元リクエストの計測値（metrics）に合算される
+- 読み取り先（プライマリ / レプリカ）は呼び出し元リクエストと同じ（reports/routers.py）
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from . import metrics
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_DB_WORKERS', 4),
+                thread_name_prefix='reports-db',
+            )
+        return _executor
+
+
+def _call(fn, args, kwargs):
+    # DB接続はスレッドごとに別（connections はスレッドローカル）なので、このスレッド専用の接続が使われる。
+    # 計測値は呼び出し元と同時に書き換えないよう、ここで別に用意して呼び出し元に渡す
+    close_old_connections()
+    recorded = metrics.RequestMetrics()
+    token = metrics.current.set(recorded)
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        metrics.current.reset(token)
+        close_old_connections()
+    return result, recorded
+
+
+async def run(fn, *args, **kwargs):
+    """
+    同期関数 fn をプールのスレッド（専用のDB接続）で実行し、結果を返す。
+    fn の中で使う queryset の評価（list() など）は fn の中で完結させること。
+    """
+    loop = asyncio.get_running_loop()
+    # run_in_executor はコンテキストを引き継がないため、読み取り先の接続（routers）などを含めてコピーして渡す
+    context = contextvars.copy_context()
+    result, recorded = await loop.run_in_executor(
+        _get_executor(), context.run, functools.partial(_call, fn, args, kwargs),
+    )
+    parent = metrics.current.get()
+    if parent is not None:
+        parent.adopt(recorded)
+    return result
+
+
+def shutdown():
+    """
+    プールの各スレッドのDB接続を閉じ、プールを止める（テストの後片付け用。次の run() で作り直す）。
+    """
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is None:
+        return
+    workers = executor._max_workers
+    # 全スレッドがそろうまで待たせ、1スレッドに1回ずつ接続を閉じさせる
+    barrier = threading.Barrier(workers)
+
+    def close():
+        barrier.wait()
+        connections.close_all()
+
+    for future in [executor.submit(close) for _ in range(workers)]:
+        future.result()
+    executor.shutdown()
@@ -0,0 +1,112 @@
+"""
+【日報の一括投稿】
+リーダーが現場のメンバーの日報をまとめて投稿する画面（views.report_batch）と JSON API（api.report_batch）。
+report_create で1件ずつ投稿すると、1件ごとに往復・トランザクション・report.save()・save_m2m()
+（とシグナルによる派生テーブルの更新）が発生し、200件で約1000クエリになります。ここでは
+
+- 選択肢（投稿先の社員・カテゴリー・タグ）をそれぞれ1クエリで読み、全行を同じ選択肢で検証する（行ごとのクエリは無い）
+- エラーは行ごとに返し、1行でもエラーがあれば何も保存しない
+- 全行が正しければ、1つの transaction.atomic の中で日報を bulk_create 1回、タグの中間テーブルを bulk_create 1回で保存する
+  （検索ドキュメント・集計テーブルは transfer.bulk_save がまとめて更新し、SOS の通知は種類ごとに1回でジョブキューへ積む）
+
+一括投稿できるのはスタッフと settings.REPORT_BATCH_POSITIONS の役職の社員。スタッフ以外は自分の部署の社員の分だけ投稿できる。
+画像の添付は1件ずつの投稿（report_create）で行う。
+"""
+from dataclasses import dataclass, field
+
+from django import forms
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from . import alerts, transfer
+from .forms import BatchReportRowForm
+from .models import Category, DailyReport, Tag
+
+# 1回に投稿できる行数の上限
+MAX_ROWS = 200
+
+
+@dataclass
+class Choices:
+    """
+    一括投稿の選択肢。members は 社員番号 → (ユーザーID, 部署)。
+    """
+    authors: list = field(default_factory=list)
+    categories: list = field(default_factory=list)
+    tags: list = field(default_factory=list)
+    members: dict = field(default_factory=dict)
+
+
+def can_submit(user):
+    positions = getattr(settings, 'REPORT_BATCH_POSITIONS', ['リーダー', 'PM'])
+    return user.is_staff or user.position in positions
+
+
+def choices_for(user):
+    """
+    user が一括投稿で選べる社員・カテゴリー・タグを、それぞれ1クエリで読む。
+    """
+    members = get_user_model().objects.filter(is_active=True, deleted_at__isnull=True)
+    if not user.is_staff:
+        members = members.filter(department=user.department)
+    choices = Choices(
+        categories=list(Category.objects.order_by('id').values_list('id', 'name')),
+        tags=list(Tag.objects.order_by('name').values_list('id', 'name')),
+    )
+    for pk, employee_id, username, department in \
+            members.order_by('employee_id').values_list('pk', 'employee_id', 'username', 'department'):
+        choices.authors.append((employee_id, f'{username}（{employee_id}）'))
+        choices.members[employee_id] = (pk, department)
+    return choices
+
+
+def formset(data=None, *, choices, rows=10):
+    """
+    画面用のフォームセット。空の行は無視し、1行以上・MAX_ROWS 行以下を必須にする。
+    """
+    FormSet = forms.formset_factory(
+        BatchReportRowForm, extra=max(min(rows, MAX_ROWS) - 1, 0), min_num=1, validate_min=True,
+        max_num=MAX_ROWS, validate_max=True, absolute_max=MAX_ROWS,
+    )
+    return FormSet(data, form_kwargs={'choices': choices}, prefix='reports')
+
+
+def validate(rows, choices):
+    """
+    JSON で受け取った行（dict のリスト）を検証する。(cleaned_data のリスト, 行ごとのエラーのリスト) を返す。
+    エラーは {"row": 行番号（0始まり）, "errors": {項目名: [メッセージ, ...]}}。
+    """
+    cleaned, errors = [], []
+    for number, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': number, 'errors': {'__all__': ['日報はオブジェクトで指定してください']}})
+            continue
+        form = BatchReportRowForm(row, choices=choices)
+        if form.is_valid():
+            cleaned.append(form.cleaned_data)
+        else:
+            errors.append({
+                'row': number,
+                'errors': {name: [e['message'] for e in items] for name, items in form.errors.get_json_data().items()},
+            })
+    return cleaned, errors
+
+
+def save(rows, choices):
+    """
+    検証済みの行（cleaned_data のリスト）を1トランザクションで保存し、作成した日報のリストを返す。
+    """
+    built = []
+    for row in rows:
+        author_id, department = choices.members[row['author']]
+        report = DailyReport(
+            author_id=author_id, department=department, category_id=row['category'],
+            condition=row['condition'], title=row['title'], content=row['content'],
+        )
+        built.append((report, row['tags'], []))
+    with transaction.atomic():
+        reports = transfer.bulk_save(built)
+        # SOS の通知はコミット後にジョブキューへ積む（このトランザクションでは送らない）
+        alerts.reports_saved(reports)
+    return reports
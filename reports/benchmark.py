@@ -0,0 +1,150 @@
+"""
+【ベンチマークの計測ロジック】
+run_benchmark コマンドから使う、エンドポイントごとの計測と集計・比較の処理。
+
+- レイテンシ: 1リクエストごとの処理時間から p50 / p95 / p99 を算出
+- SQL: 1リクエストあたりのクエリ数（CaptureQueriesContext。レプリカを含むすべての接続の合計）
+- メモリ: tracemalloc による1リクエスト中のピーク確保量（計測のオーバーヘッドが大きいので別パスで測る）
+
+measure_http() は起動中のサーバー（WSGI / ASGI）に HTTP で同時アクセスし、
+スループット（リクエスト/秒）とレイテンシを測る。WSGI と ASGI の比較に使う。
+"""
+import json
+import subprocess
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(sorted_values, p):
+    """
+    昇順に並んだ値の p パーセンタイル（線形補間）。
+    """
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(latencies_ms, queries, peak_bytes, status_codes):
+    values = sorted(latencies_ms)
+    return {
+        'requests': len(values),
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'mean_ms': round(sum(values) / len(values), 3) if values else 0.0,
+        'max_ms': round(values[-1], 3) if values else 0.0,
+        'queries': max(queries) if queries else 0,
+        'peak_memory_kb': round(peak_bytes / 1024, 1),
+        'status_codes': sorted(set(status_codes)),
+    }
+
+
+def measure(send, requests, warmup=3):
+    """
+    send() を warmup 回空打ちしてから requests 回呼び出し、集計結果を返す。
+    send は HttpResponse を返す関数（Django のテストクライアント呼び出しなど）。
+    """
+    for _ in range(warmup):
+        send()
+
+    latencies, queries, status_codes = [], [], []
+    for _ in range(requests):
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            started = time.perf_counter()
+            response = send()
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(sum(len(c.captured_queries) for c in captured))
+        status_codes.append(response.status_code)
+
+    # メモリのピークは計測オーバーヘッドがレイテンシに混ざらないよう別パスで測る
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        send()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return summarize(latencies, queries, peak, status_codes)
+
+
+def measure_http(url, requests, concurrency=1, warmup=3, headers=None):
+    """
+    url に concurrency 本のスレッドから合計 requests 回 GET し、集計結果（rps を含む）を返す。
+    SQL本数・メモリはサーバー側の値なので計測しない（サーバーの /metrics を参照）。
+    """
+    def send(_=None):
+        request = urllib.request.Request(url, headers=headers or {})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        return (time.perf_counter() - started) * 1000, status
+
+    for _ in range(warmup):
+        send()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(send, range(requests)))
+        elapsed = time.perf_counter() - started
+
+    result = summarize([latency for latency, _ in results], [], 0, [status for _, status in results])
+    result.update({
+        'queries': None,
+        'peak_memory_kb': None,
+        'concurrency': concurrency,
+        'rps': round(requests / elapsed, 1) if elapsed else 0.0,
+    })
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    """
+    2つの計測結果（JSON）を比較し、エンドポイントごとの変化率の行を返す。
+    """
+    lines = []
+    for name, result in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            lines.append(f'{name}: (比較対象なし)')
+            continue
+        parts = []
+        for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'peak_memory_kb'):
+            old, new = before.get(key), result.get(key)
+            if old is None and new is None:
+                continue
+            if not old or new is None:
+                parts.append(f'{key} {new}')
+                continue
+            parts.append(f'{key} {old} -> {new} ({(new - old) / old * 100:+.1f}%)')
+        lines.append(f'{name}: ' + ', '.join(parts))
+    return lines
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
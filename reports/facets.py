@@ -0,0 +1,239 @@
+"""
+【タグでの絞り込みとファセット件数】
+一覧画面で「いまの検索条件で、カテゴリー・調子・タグごとに何件あるか」を表示します。
+タグごとに COUNT(*) を発行すると タグ数 × 日報数 の読み取りになるため、次のように求めます。
+
+- キーワード検索が無い場合: ReportFacetCount（(カテゴリー, 調子, タグ) ごとの件数）を SUM するだけ。
+  このテーブルは日報の作成・編集・削除・タグの付け替え時に +1 / -1 で差分更新する（signals.py）
+- キーワード検索がある場合・複数タグの組み合わせの件数が必要な場合: 絞り込んだ日報を GROUP BY で数える
+  （全文検索でヒットした行だけが対象になる）。検索結果のページ送りのたびに数え直さないよう、
+  結果を LIVE_CACHE_SECONDS 秒だけキャッシュする（その間に投稿された日報は件数に遅れて反映される）
+
+カテゴリーと調子の件数は「その項目自身の絞り込みを外した」件数にする。
+カテゴリーを選んだあとでも、他のカテゴリーに切り替えたら何件になるかが分かるようにするため。
+タグの件数は、いまの条件にそのタグを追加で指定した場合の件数（絞り込み中の日報に付いているタグの数）。
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from .models import DailyReport, ReportFacetCount
+
+Through = DailyReport.tags.through
+
+# タグの件数を表示する最大数（件数の多い順）
+TAG_FACET_LIMIT = 20
+# 日報を数えて求めた件数をキャッシュする秒数
+LIVE_CACHE_SECONDS = 60
+
+
+def filter_tags(queryset, tag_ids, match_all=True):
+    """
+    タグで絞り込む。match_all=True なら指定したタグをすべて持つ日報（AND）、False ならいずれかを持つ日報（OR）。
+    どちらも中間テーブルの tag_id のインデックスを引くサブクエリ1つになる
+    （AND は GROUP BY 日報 HAVING COUNT(*) = タグ数）。
+    """
+    tag_ids = set(tag_ids)
+    if not tag_ids:
+        return queryset
+    links = Through.objects.filter(tag_id__in=tag_ids)
+    if match_all and len(tag_ids) > 1:
+        links = links.values('dailyreport_id').annotate(matched=Count('tag_id')).filter(matched=len(tag_ids))
+    return queryset.filter(id__in=links.values('dailyreport_id'))
+
+
+# ---------------------------------------------------------------- 件数の差分更新
+
+def add(category_id, condition, tag_id, delta):
+    """
+    1カテゴリー・1コンディション・1タグ（None ならタグ無関係の合計）の件数に delta を加える。行が無ければ作成する。
+    """
+    rows = ReportFacetCount.objects.filter(category_id=category_id, condition=condition, tag_id=tag_id)
+    # 減算は 0 で止める（件数がずれていても、PositiveIntegerField の CHECK 制約で保存・削除ごと失敗させない）
+    count = Greatest(F('report_count') + delta, 0) if delta < 0 else F('report_count') + delta
+    if rows.update(report_count=count):
+        return
+    if delta < 0:
+        # 行が無い状態での減算は集計漏れ。rebuild_facet_counts で補正する
+        return
+    try:
+        with transaction.atomic():
+            ReportFacetCount.objects.create(
+                category_id=category_id, condition=condition, tag_id=tag_id, report_count=delta,
+            )
+    except IntegrityError:
+        # 同時に別リクエストが行を作成した場合は UPDATE でやり直す
+        rows.update(report_count=count)
+
+
+def _add_all(deltas):
+    for key, delta in deltas.items():
+        if delta:
+            add(*key, delta)
+
+
+def tag_ids_of(report_id):
+    return list(Through.objects.filter(dailyreport_id=report_id).values_list('tag_id', flat=True))
+
+
+def report_saved(report_id, old, new):
+    """
+    日報の保存による差分を反映する。old / new はそれぞれ保存前後の (category_id, condition)。新規作成時は old=None。
+    タグの付け替えは tags_changed() が反映するので、ここではカテゴリー・調子の移動だけを扱う。
+    """
+    if old == new:
+        return
+    if old is None:
+        add(*new, None, +1)
+        return
+    for tag_id in [None] + tag_ids_of(report_id):
+        add(*old, tag_id, -1)
+        add(*new, tag_id, +1)
+
+
+def report_deleted(old, tag_ids):
+    """
+    日報の削除を反映する。tag_ids は削除前に付いていたタグ（中間テーブルの行は日報と一緒に消えるため、事前に読んでおく）。
+    """
+    for tag_id in [None] + list(tag_ids):
+        add(*old, tag_id, -1)
+
+
+def tag_links(instance, reverse, pk_set):
+    """
+    m2m_changed の対象になった (category_id, condition, tag_id) のリスト。
+    instance は日報（reverse=True ならタグ）、pk_set は相手側の ID（clear では None）。
+    """
+    # 論理削除した日報（reports/purge.py）は件数から差し引き済みなので数えない
+    links = Through.objects.filter(dailyreport__deleted_at__isnull=True)
+    if reverse:
+        links = links.filter(tag_id=instance.pk)
+        if pk_set is not None:
+            links = links.filter(dailyreport_id__in=pk_set)
+    else:
+        links = links.filter(dailyreport_id=instance.pk)
+        if pk_set is not None:
+            links = links.filter(tag_id__in=pk_set)
+    return list(links.values_list('dailyreport__category_id', 'dailyreport__condition', 'tag_id'))
+
+
+def tags_changed(links, delta):
+    deltas = {}
+    for key in links:
+        deltas[key] = deltas.get(key, 0) + delta
+    _add_all(deltas)
+
+
+def add_reports(reports, links=(), delta=1):
+    """
+    bulk_create した日報（と中間テーブルの (日報, tag_id)）をまとめて加算する（bulk_create はシグナルを送らないため）。
+    delta=-1 ならまとめて減算する（アーカイブへ移した日報）。
+    """
+    deltas = {}
+    for report in reports:
+        key = (report.category_id, report.condition, None)
+        deltas[key] = deltas.get(key, 0) + delta
+    for report, tag_id in links:
+        key = (report.category_id, report.condition, tag_id)
+        deltas[key] = deltas.get(key, 0) + delta
+    _add_all(deltas)
+
+
+def rebuild():
+    """
+    日報からファセット件数を作り直す（GROUP BY 2回 + bulk_create）。作り直した行数を返す。
+    集計の読み取りと置き換えは1つのトランザクションで行い、PostgreSQL ではその間ファセット件数のテーブルをロックする
+    （作り直しの間の add を失わない。rollups.rebuild と同じ）。
+    """
+    totals = DailyReport.objects.order_by().values('category_id', 'condition').annotate(report_count=Count('id'))
+    tagged = Through.objects.filter(dailyreport__deleted_at__isnull=True).order_by() \
+        .values('tag_id', category_id=F('dailyreport__category_id'), condition=F('dailyreport__condition')) \
+        .annotate(report_count=Count('id'))
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # 読み取りは許し、add の UPDATE / INSERT だけを待たせる
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {ReportFacetCount._meta.db_table} IN EXCLUSIVE MODE')
+        objects = [
+            ReportFacetCount(
+                category_id=row['category_id'], condition=row['condition'], tag_id=row.get('tag_id'),
+                report_count=row['report_count'],
+            )
+            for row in list(totals) + list(tagged)
+        ]
+        ReportFacetCount.objects.all().delete()
+        ReportFacetCount.objects.bulk_create(objects, batch_size=1000)
+    return len(objects)
+
+
+# ---------------------------------------------------------------- 件数の取得
+
+def _split(rows, category_id, condition):
+    """
+    (category_id, condition, 件数) の行から、カテゴリー別（調子の条件だけ適用）と
+    調子別（カテゴリーの条件だけ適用）の件数を求める。1回の GROUP BY で両方のファセットが求まる。
+    """
+    categories, conditions = {}, {}
+    for row_category, row_condition, total in rows:
+        if not total:
+            continue
+        if condition is None or row_condition == condition:
+            categories[row_category] = categories.get(row_category, 0) + total
+        if category_id is None or row_category == category_id:
+            conditions[row_condition] = conditions.get(row_condition, 0) + total
+    return categories, conditions
+
+
+def counts(base, query, category_id, condition, tag_ids, cache_key=None):
+    """
+    カテゴリー・調子・タグごとの件数を返す。
+    base() は、キーワードとタグの条件だけで絞り込んだ日報の queryset を返す関数
+    （カテゴリー・調子の条件はここで付け外しする）。ファセット件数テーブルで求まらない場合にだけ呼ぶ。
+    cache_key は絞り込み条件全体を表す文字列で、日報を数えて求めた場合の結果のキャッシュに使う。
+    戻り値: {'categories': {category_id: 件数}, 'conditions': {condition: 件数}, 'tags': [(tag_id, 件数), ...]}
+    """
+    tag_ids = set(tag_ids)
+    live = bool(query) or len(tag_ids) > 1
+    if live and cache_key is not None:
+        key = 'facets:' + hashlib.md5(cache_key.encode(), usedforsecurity=False).hexdigest()
+        result = cache.get(key)
+        if result is None:
+            result = counts(base, query, category_id, condition, tag_ids)
+            cache.set(key, result, LIVE_CACHE_SECONDS)
+        return result
+
+    reports = base() if live or tag_ids else None
+
+    if not live:
+        # タグ1つまでの絞り込みなら、そのタグの行（タグ無しなら合計の行）を読むだけでよい
+        rows = ReportFacetCount.objects.filter(tag_id=next(iter(tag_ids), None)) \
+                                       .values_list('category_id', 'condition', 'report_count')
+    else:
+        rows = reports.order_by().values_list('category_id', 'condition').annotate(total=Count('id'))
+    categories, conditions = _split(rows, category_id, condition)
+
+    if reports is None:
+        rows = ReportFacetCount.objects.filter(tag__isnull=False)
+        if category_id:
+            rows = rows.filter(category_id=category_id)
+        if condition:
+            rows = rows.filter(condition=condition)
+        tags = rows.order_by().values_list('tag_id').annotate(total=Sum('report_count'))
+    else:
+        # 絞り込み中の日報に付いているタグを数える（タグの組み合わせの件数はテーブルに無いため）
+        if category_id:
+            reports = reports.filter(category_id=category_id)
+        if condition:
+            reports = reports.filter(condition=condition)
+        tags = Through.objects.using(reports.db).filter(dailyreport_id__in=reports.values('id')) \
+                              .order_by().values_list('tag_id').annotate(total=Count('id'))
+
+    tags = [(tag_id, total) for tag_id, total in tags if total]
+    return {
+        'categories': categories,
+        'conditions': conditions,
+        'tags': sorted(tags, key=lambda item: (-item[1], item[0]))[:TAG_FACET_LIMIT],
+    }
@@ -0,0 +1,125 @@
+"""
+【部署フィード（ファンアウト・オン・ライト）】
+「自分の部署の日報」を新着順に表示します（views.report_feed）。
+DailyReport を author__department で絞って created_at で並べると、毎回 社員テーブルとの JOIN と、
+部署に一致した日報全体のソートが必要になります（日報テーブルのインデックスに著者の部署は無いため）。
+
+ここでは投稿時に、DepartmentFeedEntry（受信箱）へ (著者の部署, 日報, 作成日時) の1行を書いておきます。
+画面は (department, created_at DESC, id DESC) のインデックスを辿って1ページ分の行を読み、
+その日報だけを主キーで取得するので、部署の日報が何件あっても1ページ目と同じコストで表示できます。
+
+- 作成: 日報の post_save（signals.update_feed_on_save）と一括保存（transfer.bulk_save）で行を書く
+- 削除: 論理削除（purge._soft_delete_reports）で行を消す。パージ・アーカイブでも日報と一緒に消す
+- 著者の付け替え: 行を新しい著者の部署へ移す
+- 社員の異動: 社員の部署が変わると move_department_feed ジョブを積み、過去の日報の行を
+  BATCH_SIZE 件ずつ新しい部署へ移す（1回の UPDATE でロックする行数を抑える）
+
+行の部署は「いまの所属部署」です（DailyReport.department は投稿時の部署で、異動しても変わりません）。
+rebuild_department_feed コマンドで日報から作り直せます。
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from . import jobs
+from .models import DailyReport, DepartmentFeedEntry
+from .pagination import PAGE_SIZE, paginate
+
+# 異動時のジョブ1回で別の部署へ移す行数の上限
+BATCH_SIZE = 1000
+
+
+def add_reports(reports):
+    """
+    新しく保存した日報を、著者の部署の受信箱に入れる（INSERT 1回）。
+    日報の department は保存時に著者の現在の部署で埋まっている（signals.set_report_department / transfer.bulk_save）。
+    """
+    DepartmentFeedEntry.objects.bulk_create([
+        DepartmentFeedEntry(
+            department=report.department, report_id=report.pk, author_id=report.author_id,
+            created_at=report.created_at,
+        )
+        for report in reports
+    ], ignore_conflicts=True)
+
+
+def author_changed(report):
+    """
+    著者を付け替えた日報の行を、新しい著者の部署へ移す。
+    """
+    DepartmentFeedEntry.objects.filter(report_id=report.pk) \
+                               .update(department=report.department, author_id=report.author_id)
+
+
+def remove(reports):
+    """
+    reports（DailyReport の queryset）の行を受信箱から消す（DELETE 1回。日報の行は読み込まない）。
+    """
+    DepartmentFeedEntry.objects.filter(report_id__in=reports.values('id')).delete()
+
+
+def user_moved(user_id):
+    """
+    社員の部署が変わったときに呼ぶ。コミット後に過去の日報の行を移すジョブを積む。
+    """
+    jobs.enqueue('move_department_feed', {'user_id': user_id})
+
+
+def move_step(user_id, batch_size=BATCH_SIZE):
+    """
+    社員の日報の行のうち、いまの部署と違うものを最大 batch_size 件だけ移す。移した件数を返す
+    （batch_size と同じなら、まだ残っている可能性がある）。
+    部署はジョブの実行時に読み直すため、続けて異動した場合も最後の部署にそろう。
+    """
+    department = get_user_model().objects.filter(pk=user_id).values_list('department', flat=True).first()
+    if department is None:
+        return 0
+    entries = DepartmentFeedEntry.objects.filter(author_id=user_id).exclude(department=department)
+    ids = list(entries.values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    return DepartmentFeedEntry.objects.filter(pk__in=ids).update(department=department)
+
+
+@jobs.handler('move_department_feed')
+def move_department_feed(payloads):
+    """
+    異動した社員ごとに move_step を1回実行し、残りがあればジョブを積み直す。
+    """
+    for user_id in sorted({payload['user_id'] for payload in payloads}):
+        if move_step(user_id) == BATCH_SIZE:
+            jobs.enqueue('move_department_feed', {'user_id': user_id})
+
+
+def rebuild(batch_size=1000):
+    """
+    日報と著者の現在の部署から受信箱を作り直す（SELECT 1回を batch_size 件ずつ読み、bulk_create）。作り直した行数を返す。
+    """
+    rows = DailyReport.objects.order_by().values_list('pk', 'author_id', 'author__department', 'created_at')
+    count = 0
+    with transaction.atomic():
+        DepartmentFeedEntry.objects.all().delete()
+        batch = []
+        for report_id, author_id, department, created_at in rows.iterator(chunk_size=batch_size):
+            batch.append(DepartmentFeedEntry(
+                department=department, report_id=report_id, author_id=author_id, created_at=created_at,
+            ))
+            if len(batch) == batch_size:
+                DepartmentFeedEntry.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        DepartmentFeedEntry.objects.bulk_create(batch)
+        count += len(batch)
+    return count
+
+
+def page(department, cursor=None, page_size=PAGE_SIZE):
+    """
+    部署の日報を新着順に1ページ分返す（pagination.KeysetPage。object_list は著者・カテゴリーを JOIN 済みの日報）。
+    受信箱のインデックスで page_size + 1 件の行を読み、その日報だけを主キーで取得する（2クエリ）。
+    """
+    entries = DepartmentFeedEntry.objects.filter(department=department).only('id', 'report_id', 'created_at')
+    result = paginate(entries, cursor, page_size=page_size)
+    reports = DailyReport.objects.select_related('author', 'category').in_bulk([entry.report_id for entry in result])
+    # 論理削除と同時に読んだ場合など、日報が見つからない行は表示しない
+    result.object_list = [reports[entry.report_id] for entry in result if entry.report_id in reports]
+    return result
@@ -23,4 +23,71 @@ class CommentForm(forms.ModelForm):
                 'rows': 3, 
                 'placeholder': 'ねぎらいの言葉やアドバイスを送りましょう...'
             }),
-        }
\ No newline at end of file
+        }
+
+class BatchReportRowForm(forms.Form):
+    """
+    日報の一括投稿（reports/batch.py）の1行分。
+    選択肢（社員・カテゴリー・タグ）は batch.choices_for() で1回だけ読み、全行に同じものを渡す
+    （ModelChoiceField のように行ごとにクエリを発行しない）。
+    """
+    author = forms.ChoiceField(label='社員')
+    category = forms.TypedChoiceField(label='カテゴリー', coerce=int)
+    condition = forms.ChoiceField(label='調子', choices=DailyReport.CONDITION_CHOICES, initial='normal', required=False)
+    title = forms.CharField(label='タイトル', max_length=200,
+                            widget=forms.TextInput(attrs={'class': 'form-control'}))
+    content = forms.CharField(label='内容', widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 2}))
+    tags = forms.TypedMultipleChoiceField(label='タグ', coerce=int, required=False)
+
+    def __init__(self, *args, choices, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['author'].choices = [('', '---------')] + choices.authors
+        self.fields['category'].choices = [('', '---------')] + choices.categories
+        self.fields['tags'].choices = choices.tags
+
+    def clean_condition(self):
+        # JSON API で省略された場合は「普通」にする（取り込み transfer と同じ既定値）
+        return self.cleaned_data['condition'] or 'normal'
+
+
+class ReportExportForm(forms.Form):
+    """
+    日報の一括出力（report_export）の条件。query / category は一覧画面と同じ意味。
+    """
+    FORMAT_CHOICES = [('csv', 'CSV'), ('jsonl', 'JSONL')]
+
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, required=False)
+    query = forms.CharField(required=False)
+    category = forms.IntegerField(required=False)
+    department = forms.CharField(required=False)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError('開始日は終了日以前の日付を指定してください')
+        return cleaned_data
+
+
+class ReportApiForm(forms.Form):
+    """
+    JSON API の一覧（api_report_list）の条件。query / category は一覧画面と同じ意味。
+    返す項目（fields）は api.parse_fields で検査する。
+    """
+    query = forms.CharField(required=False)
+    category = forms.IntegerField(required=False)
+    cursor = forms.CharField(required=False)
+    limit = forms.IntegerField(min_value=1, max_value=100, required=False)
+
+
+class ConditionDashboardForm(forms.Form):
+    """
+    部署別コンディションのダッシュボード（report_dashboard）の表示条件。
+    """
+    PERIOD_CHOICES = [('week', '週ごと'), ('month', '月ごと')]
+
+    period = forms.ChoiceField(choices=PERIOD_CHOICES, required=False)
+    span = forms.IntegerField(min_value=1, max_value=52, required=False)
+    category = forms.IntegerField(required=False)
@@ -0,0 +1,100 @@
+"""
+【一覧カードのフラグメントキャッシュ】
+日報は投稿後ほとんど変更されないため、一覧のカード1枚分のHTMLを日報ごとにキャッシュし、
+一覧画面はキャッシュ済みHTMLを連結するだけにします（truncatechars やタグのループを毎回実行しない）。
+
+キャッシュキー: card:<日報ID>:<updated_at>:<画像派生の有無>:<タグ/カテゴリー/ユーザーの世代番号>
+- 日報の保存       → updated_at が変わるので自動的に別キーになる
+- タグの付け替え   → m2m_changed で updated_at を更新（signals.py）
+- タグ・カテゴリー・ユーザー名の変更 → FragmentVersion の世代番号を +1（signals.py）
+古いキーは参照されなくなり、LRU（最も長く使われていないものから削除）で自然に追い出されます。
+
+キャッシュ本体は settings.CACHES['fragments']（既定はサーバー不要の LocMemCache、件数上限つき LRU）。
+"""
+import threading
+
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import FragmentVersion
+
+CACHE_ALIAS = 'fragments'
+CARD_TEMPLATE = 'reports/report_card.html'
+
+# 世代番号の種類
+VERSION_NAMES = ('tags', 'categories', 'users')
+
+# プロセス全体のヒット/ミス件数（/metrics などで参照）
+_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0}
+
+
+def stats():
+    with _lock:
+        return dict(_counters)
+
+
+def _count(hits, misses):
+    with _lock:
+        _counters['hits'] += hits
+        _counters['misses'] += misses
+
+
+def current_versions():
+    """
+    世代番号を 'tags.3-categories.1-users.0' の形の文字列で返す（1クエリ）。
+    """
+    versions = dict(FragmentVersion.objects.values_list('name', 'version'))
+    return '-'.join(f'{name}.{versions.get(name, 0)}' for name in VERSION_NAMES)
+
+
+def bump_version(name):
+    """
+    世代番号を +1 し、その種類に依存するカードのキャッシュをすべて無効化する。
+    """
+    if FragmentVersion.objects.filter(name=name).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            FragmentVersion.objects.create(name=name, version=1)
+    except IntegrityError:
+        FragmentVersion.objects.filter(name=name).update(version=F('version') + 1)
+
+
+def card_key(report, versions):
+    derived = 'd' if report.image_derivatives else '-'
+    return f'card:{report.pk}:{report.updated_at.timestamp()}:{derived}:{versions}'
+
+
+def render_cards(reports):
+    """
+    日報のリストをカードHTMLのリストに変換する。
+    キャッシュに無いものだけタグを prefetch してテンプレートを描画し、まとめてキャッシュに保存する。
+    戻り値は (カードHTMLのリスト, ヒット数, ミス数)。
+    """
+    reports = list(reports)
+    if not reports:
+        return [], 0, 0
+
+    cache = caches[CACHE_ALIAS]
+    versions = current_versions()
+    keys = [card_key(report, versions) for report in reports]
+    cached = cache.get_many(keys)
+
+    misses = [report for report, key in zip(reports, keys) if key not in cached]
+    if misses:
+        # タグの取得もキャッシュに無かった日報の分だけ（全件ヒットならクエリ0件）
+        prefetch_related_objects(misses, 'tags')
+        rendered = {
+            card_key(report, versions): render_to_string(CARD_TEMPLATE, {'report': report})
+            for report in misses
+        }
+        cache.set_many(rendered)
+        cached.update(rendered)
+
+    hits = len(reports) - len(misses)
+    _count(hits, len(misses))
+    return [mark_safe(cached[key]) for key in keys], hits, len(misses)
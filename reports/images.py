@@ -0,0 +1,150 @@
+"""
+【画像の派生ファイル生成】
+一覧画面で元画像（数MB）をそのまま読み込み CSS で縮めると、1ページで数十MBの転送になります。
+アップロード後に Pillow で次の派生ファイルを作り、元画像と同じ場所に保存します。
+
+    uploads/photo.jpg          元画像
+    uploads/photo.card.jpg     一覧カード用（最大 800x500）
+    uploads/photo.card.webp
+    uploads/photo.detail.jpg   詳細画面用（最大 1600x1600）
+    uploads/photo.detail.webp
+
+生成はリクエスト処理とは別スレッドで、日報を保存したトランザクションのコミット後に実行します。
+画像を差し替え・削除したときは、古い画像の派生ファイルをコミット後に削除します（discard_derivatives）。
+テンプレートは {% report_picture %} タグ（templatetags/report_images.py）で srcset を出力します。
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .models import DailyReport
+
+logger = logging.getLogger(__name__)
+
+# 派生ファイルの種類 → 最大サイズ（幅, 高さ）。縦横比は保ち、拡大はしない
+VARIANTS = {
+    'card': (800, 500),
+    'detail': (1600, 1600),
+}
+
+# 出力形式 → (拡張子, Pillow の保存オプション)
+FORMATS = {
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-derivatives')
+
+
+def derivative_name(name, variant, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{variant}.{extension}'
+
+
+def _derivative_files(derivatives):
+    return [entry[fmt] for entry in (derivatives or {}).values() for fmt in FORMATS if entry.get(fmt)]
+
+
+def delete_derivatives(derivatives, storage=None):
+    """
+    image_derivatives に記録された派生ファイルを削除する（元画像は削除しない）。
+    """
+    storage = storage or default_storage
+    for name in _derivative_files(derivatives):
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.exception('failed to delete image derivative %s', name)
+
+
+def discard_derivatives(derivatives):
+    """
+    画像を差し替え・削除した日報の、古い画像の派生ファイルを現在のトランザクションのコミット後に削除する。
+    """
+    if _derivative_files(derivatives):
+        transaction.on_commit(lambda: delete_derivatives(derivatives))
+
+
+def _to_rgb(image):
+    # 透過PNGなどは白背景に合成して JPEG で保存できるようにする
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_derivatives(report):
+    """
+    日報の画像から派生ファイルを生成して保存し、image_derivatives を更新する。
+    画像が無い場合は空の dict を保存する。
+    """
+    if not report.image:
+        DailyReport.objects.filter(pk=report.pk).update(image_derivatives={})
+        return {}
+
+    storage = report.image.storage
+    with storage.open(report.image.name, 'rb') as f:
+        original = Image.open(f)
+        original.load()
+    # スマートフォン写真の回転情報（EXIF）を反映し、RGB にそろえる
+    original = _to_rgb(ImageOps.exif_transpose(original))
+
+    derivatives = {}
+    for variant, size in VARIANTS.items():
+        resized = original.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        entry = {'width': resized.width, 'height': resized.height}
+        for fmt, (extension, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, **options)
+            name = derivative_name(report.image.name, variant, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            entry[fmt] = storage.save(name, ContentFile(buffer.getvalue()))
+        derivatives[variant] = entry
+
+    # シグナル（検索・集計の更新）を発火させないよう queryset.update で保存する
+    if not DailyReport.objects.filter(pk=report.pk, image=report.image.name).update(image_derivatives=derivatives):
+        # 生成中に画像が差し替えられた（日報が削除された）。どこからも参照されないファイルを残さない
+        delete_derivatives(derivatives, storage)
+        return {}
+    report.image_derivatives = derivatives
+    return derivatives
+
+
+def _run(pk):
+    try:
+        report = DailyReport.objects.only('id', 'image').get(pk=pk)
+        generate_derivatives(report)
+    except DailyReport.DoesNotExist:
+        pass
+    except Exception:
+        logger.exception('failed to generate image derivatives for report %s', pk)
+    finally:
+        # ワーカースレッドのDB接続を閉じる
+        connection.close()
+
+
+def schedule_derivatives(report):
+    """
+    現在のトランザクションのコミット後に、派生ファイルの生成を予約する。
+    settings.IMAGE_DERIVATIVES_ASYNC が False の場合はコミット後に同じスレッドで生成する。
+    """
+    pk = report.pk
+
+    def start():
+        if getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+            _executor.submit(_run, pk)
+        else:
+            generate_derivatives(DailyReport.objects.only('id', 'image').get(pk=pk))
+
+    transaction.on_commit(start)
@@ -0,0 +1,114 @@
+"""
+【DBのジョブキュー】
+通知の送信のように時間のかかる処理を、日報を保存するトランザクションの中で実行すると、
+その間ロックを持ったまま応答が遅れます。ここではジョブを Job テーブルに積み、run_workers コマンドが別プロセスで実行します。
+
+    jobs.enqueue('notify_sos', {'report_id': report.pk})   # コミット後に INSERT される
+
+- 登録は transaction.on_commit で行う。ロールバックされた保存のジョブは積まれず、
+  日報のトランザクションにはジョブの INSERT も含まれない（コミット直後にプロセスが落ちた場合、そのジョブは失われる）
+- ワーカーは SELECT ... FOR UPDATE SKIP LOCKED で最大 batch_size 件を取り出す。
+  他のワーカーが処理中の行は読み飛ばすため、複数のワーカーを並べても同じジョブを二重に実行しない（PostgreSQL）
+- 取り出したジョブは種類ごとにまとめて1回ハンドラに渡す（同じ日のロールアップの作り直しを1回にする、など）
+- ハンドラが例外を出したら、その種類のジョブを RETRY_DELAYS の間隔で再実行し、MAX_ATTEMPTS 回失敗したら failed で残す
+- 成功したジョブは削除する。ハンドラの実行とジョブの削除は同じトランザクションなので、少なくとも1回は実行される
+
+ハンドラは @handler('種類') で登録する関数で、その種類のジョブの payload のリストを受け取る。
+"""
+import logging
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# 失敗したジョブを再実行するまでの秒数（試行回数ごと。足りなければ最後の値）
+RETRY_DELAYS = [10, 60, 300, 1800]
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 50
+
+# 種類 → ハンドラ（payload のリストを受け取る関数）
+HANDLERS = {}
+
+
+def handler(kind):
+    """
+    ジョブのハンドラを登録するデコレーター。
+    """
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def _insert(kind, payload, run_at):
+    Job.objects.create(kind=kind, payload=payload, run_at=run_at or timezone.now())
+
+
+def enqueue(kind, payload, run_at=None):
+    """
+    ジョブを登録する。トランザクションの中ならコミット後に、外なら即座に INSERT する。
+    """
+    transaction.on_commit(partial(_insert, kind, payload, run_at))
+
+
+def _insert_many(kind, payloads, run_at):
+    run_at = run_at or timezone.now()
+    Job.objects.bulk_create([Job(kind=kind, payload=payload, run_at=run_at) for payload in payloads])
+
+
+def enqueue_many(kind, payloads, run_at=None):
+    """
+    同じ種類のジョブをまとめて登録する（コミット後に INSERT 1回）。
+    """
+    payloads = list(payloads)
+    if payloads:
+        transaction.on_commit(partial(_insert_many, kind, payloads, run_at))
+
+
+def _retry(jobs, error, now):
+    for job in jobs:
+        job.attempts += 1
+        job.last_error = error
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = Job.FAILED
+        else:
+            delay = RETRY_DELAYS[min(job.attempts, len(RETRY_DELAYS)) - 1]
+            job.run_at = now + timedelta(seconds=delay)
+    Job.objects.bulk_update(jobs, ['attempts', 'last_error', 'status', 'run_at'])
+
+
+def work_batch(batch_size=BATCH_SIZE):
+    """
+    実行予定日時を過ぎたジョブを最大 batch_size 件取り出して実行する。処理したジョブの件数を返す（0 なら空）。
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = list(
+            Job.objects.select_for_update(skip_locked=True)
+                       .filter(status=Job.PENDING, run_at__lte=now)
+                       .order_by('run_at', 'id')[:batch_size]
+        )
+        groups = {}
+        for job in claimed:
+            groups.setdefault(job.kind, []).append(job)
+
+        for kind, group in groups.items():
+            fn = HANDLERS.get(kind)
+            try:
+                if fn is None:
+                    raise LookupError(f'未登録のジョブです: {kind}')
+                # 失敗したハンドラの書き込みだけを取り消す（他の種類のジョブの結果は残す）
+                with transaction.atomic():
+                    fn([job.payload for job in group])
+            except Exception:
+                logger.exception('job %s failed (%d jobs)', kind, len(group))
+                _retry(group, traceback.format_exc(limit=5), now)
+            else:
+                Job.objects.filter(pk__in=[job.pk for job in group]).delete()
+    return len(claimed)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reports import archive
+from reports.models import DailyReport
+
+
+class Command(BaseCommand):
+    """
+    作成から --days 日以上たった月の日報を、日報テーブルからアーカイブ（ArchivedReport）へ移す。
+    PostgreSQL では月別パーティションごと移して DROP し、それ以外では --batch-size 件ずつ移して DELETE する。
+    アーカイブした日報は一覧・集計から外れ、詳細画面（ID 指定）でだけ閲覧できる。
+
+        python manage.py archive_reports --dry-run
+        python manage.py archive_reports --days 365
+    """
+    help = '古い日報を圧縮してアーカイブへ移します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='この日数より前の月を移す（既定は settings.REPORT_ARCHIVE_AFTER_DAYS）')
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='対象の件数だけを表示する')
+
+    def handle(self, *args, days, batch_size, dry_run, **options):
+        if batch_size <= 0 or (days is not None and days < 0):
+            raise CommandError('--batch-size は1以上、--days は0以上を指定してください')
+        before = archive.cutoff(days)
+        if dry_run:
+            count = DailyReport.objects.filter(created_at__lt=before).count()
+            self.stdout.write(f'{before:%Y-%m-%d} より前に作成された日報 {count} 件が対象です')
+            return
+        archived, dropped = archive.archive_before(before, batch_size=batch_size)
+        for name in dropped:
+            self.stdout.write(f'  {name} を削除しました')
+        self.stdout.write(self.style.SUCCESS(
+            f'{before:%Y-%m-%d} より前に作成された日報 {archived} 件をアーカイブしました'
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports import similar
+
+
+class Command(BaseCommand):
+    """
+    似ている日報の索引（TF-IDF のスナップショット。reports/similar.py）を作る。
+    既定では、前回のスナップショットに、その後に作成・編集された日報を取り込む（削除した日報の行も除く）。
+    --full を付けると全件から作り直し、idf（語の珍しさ）も現在の日報で計算し直す。
+
+        python manage.py build_similar_index
+        python manage.py build_similar_index --full
+    """
+    help = '似ている日報の検索用に、TF-IDF ベクトルのスナップショットを作成します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='差分の取り込みではなく全件から作り直す')
+
+    def handle(self, *args, full, **options):
+        if not similar.available():
+            raise CommandError('numpy がインストールされていません（pip install -r requirements.txt）')
+        started = time.monotonic()
+        count = similar.build(full=full)
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} 件の日報のスナップショットを {similar.index_dir()} に作成しました（{time.monotonic() - started:.1f} 秒）'
+        ))
@@ -0,0 +1,153 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from reports import partitions, routers
+from reports.models import (
+    Category, Comment, DailyReport, DepartmentConditionDaily, DepartmentFeedEntry, ReportSearchDocument, Tag,
+    UserReportStats,
+)
+
+
+# 件数が増え続けるため、全件スキャン（Seq Scan）を許さないテーブル
+WATCHED_TABLES = {
+    DailyReport._meta.db_table,
+    DailyReport.tags.through._meta.db_table,
+    Comment._meta.db_table,
+    ReportSearchDocument._meta.db_table,
+    UserReportStats._meta.db_table,
+    DepartmentConditionDaily._meta.db_table,
+    DepartmentFeedEntry._meta.db_table,
+}
+
+
+class Command(BaseCommand):
+    """
+    【クエリプランの回帰テスト】
+    各画面（report_list / report_detail / report_feed / report_ranking / report_dashboard）をテストクライアントで実際に表示し、
+    発行された SELECT 文をすべて EXPLAIN して、インデックスが使われているかを検査する。
+
+    - 監視対象テーブルの全件スキャン（PostgreSQL: Seq Scan / SQLite: SCAN table）
+    - ディスクに溢れたソート（PostgreSQL: Sort Space Type = Disk）
+    - インデックスで解決できないソート（SQLite: USE TEMP B-TREE FOR ORDER BY）
+    のいずれかが見つかれば失敗（終了コード1）にする。
+
+    小さなテーブルではプランナがあえて全件スキャンを選ぶため、
+    seed_benchmark などでデータを投入したDBに対して実行すること。
+
+        python manage.py check_query_plans
+    """
+    help = '各画面のクエリを EXPLAIN し、全件スキャンやソートの溢れが無いか検査します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='全クエリのプランを表示する')
+
+    def handle(self, *args, verbose_plans, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'{connection.vendor} には対応していません')
+
+        client = Client()
+        user = get_user_model().objects.order_by('pk').first()
+        report = DailyReport.objects.order_by('-created_at', '-id').first()
+        category = Category.objects.order_by('pk').first()
+        tag = Tag.objects.order_by('pk').first()
+        if user is None or report is None:
+            raise CommandError('ユーザーと日報が1件以上必要です（seed_benchmark でデータを投入してください）')
+        client.force_login(user)
+
+        # (名前, URL, 順位付けのためのソートを許可するか)
+        checks = [
+            ('report_list', reverse('report_list'), False),
+            ('report_list?category', f"{reverse('report_list')}?category={category.pk}", False),
+            # 全文検索は関連度順に並べるため、ヒットした行のソートは避けられない
+            ('report_list?query', f"{reverse('report_list')}?query={report.title[:4]}", True),
+            ('report_detail', reverse('report_detail', args=[report.pk]), False),
+            ('report_feed', reverse('report_feed'), False),
+            ('report_ranking', reverse('report_ranking'), False),
+            ('report_dashboard', f"{reverse('report_dashboard')}?period=month&span=12", False),
+            ('api_report_list', reverse('api_report_list'), False),
+            ('api_report_detail', reverse('api_report_detail', args=[report.pk]), False),
+        ]
+        if tag is not None:
+            # タグで絞った行は中間テーブルの tag_id インデックスで引き、ヒットした行だけをソートする
+            # （PostgreSQL は付いている日報の多いタグなら created_at のインデックス順に辿る計画も比較して選ぶ）
+            checks += [
+                ('report_list?tag', f"{reverse('report_list')}?tag={tag.pk}", True),
+                ('report_list?tag&tag', f"{reverse('report_list')}?tag={tag.pk}&tag={tag.pk + 1}", True),
+            ]
+
+        failures = []
+        for name, url, allow_sort in checks:
+            # 記録した SQL をこの接続で EXPLAIN するため、画面の読み取りもプライマリで行う
+            with routers.use_primary(), CaptureQueriesContext(connection) as captured:
+                response = client.get(url)
+            if response.status_code != 200:
+                failures.append(f'{name}: HTTP {response.status_code}')
+                continue
+
+            selects = [q['sql'] for q in captured.captured_queries if q['sql'].lstrip().upper().startswith('SELECT')]
+            self.stdout.write(f'{name}: {len(selects)} SELECT')
+            for sql in selects:
+                plan, problems = self._explain(sql, allow_sort)
+                if verbose_plans or problems:
+                    self.stdout.write(f'  {sql[:200]}')
+                    for line in plan:
+                        self.stdout.write(f'    {line}')
+                for problem in problems:
+                    failures.append(f'{name}: {problem}\n    {sql[:200]}')
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(self.style.ERROR(failure))
+            raise CommandError(f'{len(failures)} 件のクエリプランの問題が見つかりました')
+        self.stdout.write(self.style.SUCCESS('すべてのクエリがインデックスで解決されています'))
+
+    def _explain(self, sql, allow_sort):
+        if connection.vendor == 'postgresql':
+            return self._explain_postgresql(sql, allow_sort)
+        return self._explain_sqlite(sql, allow_sort)
+
+    def _explain_postgresql(self, sql, allow_sort):
+        # ANALYZE で実際に実行し、ソートがメモリに収まったかも確認する
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql)
+            result = cursor.fetchone()[0]
+
+        plan, problems = [], []
+
+        def walk(node, depth):
+            node_type = node['Node Type']
+            relation = node.get('Relation Name')
+            plan.append('  ' * depth + node_type + (f' on {relation}' if relation else ''))
+            if node_type == 'Seq Scan' and partitions.table_of(relation) in WATCHED_TABLES:
+                # 日報の月別パーティションは、空のパーティション（先の月など）の Seq Scan なら問題にしない
+                scanned = node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)
+                if relation in WATCHED_TABLES or scanned:
+                    problems.append(f'Seq Scan on {relation}')
+            if node.get('Sort Space Type') == 'Disk':
+                problems.append(f"Sort spilled to disk ({node.get('Sort Method')})")
+            for child in node.get('Plans', []):
+                walk(child, depth + 1)
+
+        walk(result[0]['Plan'], 0)
+        return plan, problems
+
+    def _explain_sqlite(self, sql, allow_sort):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            rows = cursor.fetchall()
+
+        plan, problems = [], []
+        for row in rows:
+            detail = row[-1]
+            plan.append(detail)
+            words = detail.split()
+            if words[:1] == ['SCAN'] and len(words) > 1 and words[1] in WATCHED_TABLES \
+                    and 'INDEX' not in detail:
+                problems.append(f'full table scan: {detail}')
+            if detail.startswith('USE TEMP B-TREE FOR ORDER BY') and not allow_sort:
+                problems.append(f'sort not backed by an index: {detail}')
+        return plan, problems
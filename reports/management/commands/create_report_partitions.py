@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reports import partitions
+
+
+class Command(BaseCommand):
+    """
+    日報テーブルの月別パーティション（PostgreSQL）を、今月から --months か月先まで作成する。
+    デフォルトパーティションに入った行があれば、その月のパーティションを作って移す。
+    月が替わる前にパーティションが用意されているよう、cron などで毎日実行する。
+
+        python manage.py create_report_partitions
+        python manage.py create_report_partitions --months 6
+    """
+    help = '日報テーブルの月別パーティションを先の月まで作成します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=partitions.FUTURE_MONTHS, help='今月より先に作成する月数')
+
+    def handle(self, *args, months, **options):
+        if months < 0:
+            raise CommandError('--months は0以上を指定してください')
+        if not partitions.is_partitioned():
+            self.stdout.write('日報テーブルはパーティションに分割されていません（PostgreSQL 以外）')
+            return
+        created = partitions.ensure_partitions(months)
+        for name in created:
+            self.stdout.write(f'  {name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} 個のパーティションを作成しました'))
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports import transfer
+
+
+class Command(BaseCommand):
+    """
+    日報をタグ・コメントごと JSONL / CSV で書き出す。
+    .iterator(chunk_size=...) でチャンク単位に取得するため、件数に関係なくメモリ使用量は一定。
+
+        python manage.py export_reports --format jsonl --output reports.jsonl
+        python manage.py export_reports --format csv > reports.csv
+    """
+    help = '日報を JSONL / CSV 形式でストリーミング出力します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+        parser.add_argument('--output', help='出力先ファイル（省略時は標準出力）')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='1回のSELECTで取得する件数')
+
+    def handle(self, *args, format, output, chunk_size, **options):
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size は1以上を指定してください')
+        writer = transfer.write_csv if format == 'csv' else transfer.write_jsonl
+        reports = transfer.export_queryset(with_comments=format == 'jsonl').iterator(chunk_size=chunk_size)
+
+        if output:
+            with open(output, 'w', encoding='utf-8', newline='') as stream:
+                count = writer(stream, reports)
+        else:
+            count = writer(sys.stdout, reports)
+        self.stderr.write(self.style.SUCCESS(f'{count} 件の日報を出力しました'))
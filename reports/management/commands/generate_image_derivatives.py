@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from reports import images
+from reports.models import DailyReport
+
+
+class Command(BaseCommand):
+    """
+    既存の投稿画像から、一覧・詳細用の縮小版と WebP 版を生成する（バックフィル）。
+    すでに生成済みの日報はスキップする。
+
+        python manage.py generate_image_derivatives [--force]
+    """
+    help = '投稿画像の縮小版・WebP版を生成します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='生成済みの日報も作り直す')
+
+    def handle(self, *args, force, **options):
+        reports = DailyReport.objects.exclude(image='').exclude(image__isnull=True) \
+                                     .only('id', 'image', 'image_derivatives').order_by('id')
+        done = failed = skipped = 0
+        for report in reports.iterator(chunk_size=200):
+            if report.image_derivatives and not force:
+                skipped += 1
+                continue
+            try:
+                images.generate_derivatives(report)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'report {report.pk}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'生成 {done} 件 / スキップ {skipped} 件 / 失敗 {failed} 件'))
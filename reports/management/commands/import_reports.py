@@ -0,0 +1,68 @@
+import os
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports import partitions, transfer
+
+
+class Command(BaseCommand):
+    """
+    JSONL / CSV の日報データを一括で取り込む。
+    著者は社員番号（employee_id）、カテゴリーは slug で対応付け、タグは名前で対応付ける（未登録なら作成）。
+
+    batch_size 件ごとに1トランザクションでコミットし、進捗（取り込み済みのレコード数）を
+    <入力ファイル>.progress に記録する。中断しても --resume で続きから再開できる。
+
+        python manage.py import_reports reports.jsonl
+        python manage.py import_reports reports.csv --format csv --batch-size 5000 --resume
+    """
+    help = 'JSONL / CSV の日報データを一括で取り込みます'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='入力ファイル')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='省略時は拡張子から判定')
+        parser.add_argument('--batch-size', type=int, default=1000, help='1トランザクションで取り込む件数')
+        parser.add_argument('--resume', action='store_true', help='前回の進捗ファイルの続きから再開する')
+
+    def handle(self, *args, path, format, batch_size, resume, **options):
+        if batch_size <= 0:
+            raise CommandError('--batch-size は1以上を指定してください')
+        if not os.path.exists(path):
+            raise CommandError(f'{path} が見つかりません')
+        format = format or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        reader = transfer.read_csv if format == 'csv' else transfer.read_jsonl
+
+        progress_path = path + '.progress'
+        done = 0
+        if resume and os.path.exists(progress_path):
+            with open(progress_path) as f:
+                done = int(f.read().strip() or 0)
+            self.stdout.write(f'{done} 件目まで取り込み済みのため、続きから再開します')
+
+        importer = transfer.ReportImporter(batch_size=batch_size)
+        imported = 0
+        with open(path, encoding='utf-8', newline='') as stream:
+            records = enumerate(reader(stream), start=1)
+            # 取り込み済みのレコードは読み飛ばす
+            for _ in islice(records, done):
+                pass
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    break
+                imported += importer.import_batch(batch)
+                done = batch[-1][0]
+                # コミット済みの位置を記録（次回 --resume で使用）
+                with open(progress_path, 'w') as f:
+                    f.write(str(done))
+                self.stdout.write(f'  {done} 件処理 / {imported} 件取り込み')
+
+        # 過去の日付の日報はデフォルトパーティションに入るため、月別パーティションへ移す（PostgreSQL）
+        partitions.ensure_partitions()
+
+        for number, message in importer.errors:
+            self.stderr.write(f'record {number}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{imported} 件の日報を取り込みました（エラー {len(importer.errors)} 件）'
+        ))
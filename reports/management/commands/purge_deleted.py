@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reports import purge
+
+
+class Command(BaseCommand):
+    """
+    論理削除した日報・ユーザーと、その関連行（コメント・タグの中間テーブルなど）を --batch-size 件ずつ削除する。
+    通常は削除時に積まれるジョブ（purge_deleted）を run_workers が実行するため、手動で残りを片付けたいときに使う。
+
+        python manage.py purge_deleted --dry-run
+        python manage.py purge_deleted --batch-size 500
+    """
+    help = '論理削除した日報・ユーザーを少しずつ物理削除します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=purge.BATCH_SIZE,
+                            help='1トランザクションで削除する行数の上限（テーブルごと）')
+        parser.add_argument('--dry-run', action='store_true', help='削除を待っている件数だけを表示する')
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        if batch_size <= 0:
+            raise CommandError('--batch-size は1以上を指定してください')
+        if dry_run:
+            for name, count in purge.pending().items():
+                self.stdout.write(f'  {name}: {count} 件')
+            return
+
+        total = purge.PurgeProgress()
+        steps = 0
+        while True:
+            progress = purge.purge_step(batch_size)
+            steps += 1
+            total.merge(progress)
+            summary = ', '.join(f'{name} {count}' for name, count in progress.deleted.items()) or 'なし'
+            self.stdout.write(f'  {steps}回目: {summary}')
+            if progress.done:
+                break
+        summary = ', '.join(f'{name} {count} 件' for name, count in total.deleted.items()) or '削除する行はありませんでした'
+        self.stdout.write(self.style.SUCCESS(f'パージが完了しました: {summary}'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from reports import rollups
+
+
+class Command(BaseCommand):
+    """
+    部署別コンディションのロールアップ（DepartmentConditionDaily）を DailyReport から作り直す。
+    loaddata や SQL の直接操作など、シグナルを経由しない変更のあとに実行する。
+    期間を指定すると、その日付の範囲だけを置き換える。
+
+        python manage.py rebuild_condition_rollups
+        python manage.py rebuild_condition_rollups --from 2025-04-01 --to 2025-04-30
+    """
+    help = '部署別コンディションの日次ロールアップを再構築します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='開始日（YYYY-MM-DD）')
+        parser.add_argument('--to', dest='date_to', help='終了日（YYYY-MM-DD）')
+
+    def handle(self, *args, date_from, date_to, **options):
+        date_from = self._parse(date_from)
+        date_to = self._parse(date_to)
+        count = rollups.rebuild(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f'{count} 行の部署別ロールアップを再構築しました'))
+
+    def _parse(self, value):
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise CommandError(f'日付の形式が不正です: {value!r}（YYYY-MM-DD で指定してください）')
+        return parsed
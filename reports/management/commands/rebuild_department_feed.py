@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from reports import feed
+
+
+class Command(BaseCommand):
+    """
+    部署フィードの受信箱（DepartmentFeedEntry）を DailyReport と社員の現在の部署から作り直す。
+    loaddata や SQL の直接操作など、シグナルを経由しない変更のあとに実行する。
+
+        python manage.py rebuild_department_feed
+    """
+    help = '部署ごとの日報フィード（受信箱）を再構築します'
+
+    def handle(self, *args, **options):
+        count = feed.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{count} 行の部署フィードを再構築しました'))
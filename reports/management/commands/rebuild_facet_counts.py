@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from reports import facets
+
+
+class Command(BaseCommand):
+    """
+    一覧画面のファセット件数（ReportFacetCount）を DailyReport とタグの中間テーブルから作り直す。
+    loaddata や SQL の直接操作など、シグナルを経由しない変更のあとに実行する。
+
+        python manage.py rebuild_facet_counts
+    """
+    help = 'カテゴリー・調子・タグごとのファセット件数を再構築します'
+
+    def handle(self, *args, **options):
+        count = facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{count} 行のファセット件数を再構築しました'))
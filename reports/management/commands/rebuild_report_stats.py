@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from reports import stats
+
+
+class Command(BaseCommand):
+    """
+    ランキング用の集計テーブル（UserReportStats）を DailyReport 全件から作り直す。
+    loaddata や SQL の直接操作など、シグナルを経由しない変更のあとに実行する。
+
+        python manage.py rebuild_report_stats
+    """
+    help = 'ユーザーごとの投稿集計テーブルを再構築します'
+
+    def handle(self, *args, **options):
+        count = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{count} 人分の投稿集計を再構築しました'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from reports import search
+from reports.models import DailyReport, ReportSearchDocument
+
+
+class Command(BaseCommand):
+    """
+    全日報の検索ドキュメントを作り直す。
+    トークナイザを変更したときや、loaddata / 外部ツールで日報を投入したあとに実行する。
+
+        python manage.py rebuild_search_index
+    """
+    help = '日報の全文検索インデックスを再構築します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='1回のINSERTでまとめる件数')
+        parser.add_argument('--clear', action='store_true', help='既存の検索ドキュメントを全削除してから作り直す')
+
+    def handle(self, *args, batch_size, clear, **options):
+        if clear:
+            ReportSearchDocument.objects.all().delete()
+
+        total = 0
+        batch = []
+        reports = DailyReport.objects.only('id', 'title', 'content').order_by('id')
+        for report in reports.iterator(chunk_size=batch_size):
+            batch.append(search.build_document(report))
+            if len(batch) >= batch_size:
+                total += self._flush(batch)
+                batch = []
+        if batch:
+            total += self._flush(batch)
+
+        if connection.vendor == 'sqlite':
+            # FTS5 の索引を元テーブルから丸ごと作り直して、トリガー漏れがあっても整合させる
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) VALUES ('rebuild')")
+
+        self.stdout.write(self.style.SUCCESS(f'{total} 件の検索ドキュメントを再構築しました'))
+
+    def _flush(self, batch):
+        # 1バッチ = 1トランザクション。既存行は UPSERT で上書きする
+        with transaction.atomic():
+            ReportSearchDocument.objects.bulk_create(
+                batch,
+                update_conflicts=True,
+                unique_fields=['report'],
+                update_fields=['title_terms', 'content_terms', 'indexed_at'],
+            )
+        return len(batch)
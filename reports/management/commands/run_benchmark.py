@@ -0,0 +1,145 @@
+import json
+import platform
+from urllib.parse import urlencode
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+
+from reports import benchmark
+from reports.models import Category, DailyReport
+
+
+class Command(BaseCommand):
+    """
+    【全画面のベンチマーク】
+    Django のテストクライアントで各画面を繰り返し表示し、エンドポイントごとに
+    p50 / p95 / p99 レイテンシ・SQLクエリ数・ピークメモリを JSON に記録する。
+    --compare に前回の JSON を渡すと、コミット間の変化率を表示する。
+
+        python manage.py seed_benchmark --reports 100000
+        python manage.py run_benchmark --requests 100 --output bench/before.json
+        python manage.py run_benchmark --requests 100 --compare bench/before.json
+
+    report_create は計測後にロールバックするため、データは増えない。
+
+    --url を指定すると、テストクライアントではなく起動中のサーバーに HTTP で --concurrency 本同時にアクセスし、
+    リクエスト/秒（rps）とレイテンシを測る（閲覧画面のみ）。同じ DB を使う WSGI と ASGI のサーバーを比較できる。
+
+        gunicorn config.wsgi:application -w 4 -b :8000
+        gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker -w 4 -b :8001
+        python manage.py run_benchmark --url http://localhost:8000 --concurrency 32 --output bench/wsgi.json
+        python manage.py run_benchmark --url http://localhost:8001 --concurrency 32 --compare bench/wsgi.json
+    """
+    help = '各画面のレイテンシ・クエリ数・メモリを計測して JSON に出力します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='エンドポイントごとのリクエスト数')
+        parser.add_argument('--warmup', type=int, default=3, help='計測前の空打ち回数')
+        parser.add_argument('--only', nargs='*', help='計測するエンドポイント名（省略時は全て）')
+        parser.add_argument('--output', help='結果の JSON を保存するファイル')
+        parser.add_argument('--compare', help='比較対象の JSON ファイル')
+        parser.add_argument('--url', help='計測する起動中のサーバー（例: http://localhost:8001）')
+        parser.add_argument('--concurrency', type=int, default=1, help='--url 指定時の同時接続数')
+
+    def handle(self, *args, requests, warmup, only, output, compare, url, concurrency, **options):
+        user = get_user_model().objects.order_by('pk').first()
+        report = DailyReport.objects.order_by('-created_at', '-id').first()
+        category = Category.objects.order_by('pk').first()
+        if user is None or report is None:
+            raise CommandError('データがありません。先に seed_benchmark を実行してください')
+
+        client = Client()
+        client.force_login(user)
+        list_url = reverse('report_list')
+        create_form = {
+            'category': category.pk,
+            'condition': 'normal',
+            'title': 'ベンチマーク用の日報',
+            'content': '計測のための投稿です。',
+        }
+
+        endpoints = {
+            'report_list': lambda: client.get(list_url),
+            'report_list?query': lambda: client.get(list_url, {'query': report.title[:4]}),
+            'report_list?category': lambda: client.get(list_url, {'category': category.pk}),
+            'report_detail': lambda: client.get(reverse('report_detail', args=[report.pk])),
+            'report_ranking': lambda: client.get(reverse('report_ranking')),
+            'report_create': lambda: client.post(reverse('report_create'), create_form),
+        }
+        if only:
+            unknown = set(only) - set(endpoints)
+            if unknown:
+                raise CommandError(f'不明なエンドポイント: {", ".join(sorted(unknown))}')
+            endpoints = {name: send for name, send in endpoints.items() if name in only}
+
+        if url:
+            results = self._measure_server(url, client, report, category, endpoints, requests, concurrency, warmup)
+        else:
+            results = self._measure_client(endpoints, requests, warmup)
+
+        report_data = {
+            'meta': {
+                'revision': benchmark.git_revision(),
+                'measured_at': datetime.now(timezone.utc).isoformat(),
+                'target': url or 'test-client',
+                'concurrency': concurrency if url else 1,
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'requests': requests,
+                'reports': DailyReport.objects.count(),
+            },
+            'endpoints': results,
+        }
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(report_data, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'{output} に保存しました'))
+        if compare:
+            for line in benchmark.compare(report_data, benchmark.load(compare)):
+                self.stdout.write(line)
+
+    def _measure_client(self, endpoints, requests, warmup):
+        results = {}
+        for name, send in endpoints.items():
+            if name == 'report_create':
+                # 書き込みの計測はまとめてロールバックする
+                with transaction.atomic():
+                    results[name] = benchmark.measure(send, requests, warmup)
+                    transaction.set_rollback(True)
+            else:
+                results[name] = benchmark.measure(send, requests, warmup)
+            self._print(name, results[name])
+        return results
+
+    def _measure_server(self, url, client, report, category, endpoints, requests, concurrency, warmup):
+        # force_login で作ったセッションの Cookie をそのまま使う（サーバーと同じ DB であること）
+        cookie = '; '.join(f'{key}={morsel.value}' for key, morsel in client.cookies.items())
+        paths = {
+            'report_list': reverse('report_list'),
+            'report_list?query': f"{reverse('report_list')}?{urlencode({'query': report.title[:4]})}",
+            'report_list?category': f"{reverse('report_list')}?category={category.pk}",
+            'report_detail': reverse('report_detail', args=[report.pk]),
+            'report_ranking': reverse('report_ranking'),
+        }
+        results = {}
+        for name in endpoints:
+            if name not in paths:
+                self.stdout.write(f'{name:<22} (--url 指定時は閲覧画面のみ計測します)')
+                continue
+            results[name] = benchmark.measure_http(
+                url.rstrip('/') + paths[name], requests, concurrency, warmup, headers={'Cookie': cookie},
+            )
+            self._print(name, results[name])
+        return results
+
+    def _print(self, name, r):
+        line = f"{name:<22} p50 {r['p50_ms']:>8.2f}ms  p95 {r['p95_ms']:>8.2f}ms  p99 {r['p99_ms']:>8.2f}ms"
+        if r.get('rps') is not None:
+            line += f"  {r['rps']:>8.1f} req/s"
+        else:
+            line += f"  queries {r['queries']:>3}  peak {r['peak_memory_kb']:>9.1f}KB"
+        self.stdout.write(line)
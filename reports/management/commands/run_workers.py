@@ -0,0 +1,67 @@
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from reports import jobs
+
+
+class Command(BaseCommand):
+    """
+    ジョブキュー（reports/jobs.py）のジョブを実行し続けるワーカー。
+    キューが空なら --interval 秒ごとに確認する。--once を付けると、キューが空になった時点で終了する。
+
+    PostgreSQL では SELECT ... FOR UPDATE SKIP LOCKED で取り出すため、--concurrency でワーカーを増やしても
+    （別のプロセス・別のサーバーで起動しても）同じジョブを二重に実行しない。
+    SQLite は行ロックが無いため、ワーカーは1つだけにすること。
+
+        python manage.py run_workers
+        python manage.py run_workers --concurrency 4 --batch-size 100
+        python manage.py run_workers --once
+    """
+    help = 'ジョブキューのジョブを実行します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='並列に動かすワーカー（スレッド）の数')
+        parser.add_argument('--batch-size', type=int, default=jobs.BATCH_SIZE, help='1トランザクションで取り出す件数')
+        parser.add_argument('--interval', type=float, default=1.0, help='キューが空のときに待つ秒数')
+        parser.add_argument('--once', action='store_true', help='キューが空になったら終了する')
+
+    def handle(self, *args, concurrency, batch_size, interval, once, **options):
+        if concurrency <= 0 or batch_size <= 0:
+            raise CommandError('--concurrency と --batch-size は1以上を指定してください')
+        if concurrency > 1 and connection.vendor != 'postgresql':
+            raise CommandError('SKIP LOCKED の無いDBでは --concurrency 1 で実行してください')
+
+        stop = threading.Event()
+        processed = [0] * concurrency
+
+        def work(index):
+            # スレッドごとに別のDB接続を使い、終了時に閉じる
+            try:
+                while not stop.is_set():
+                    count = jobs.work_batch(batch_size)
+                    processed[index] += count
+                    if count == 0:
+                        if once:
+                            return
+                        stop.wait(interval)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=work, args=(index,), name=f'reports-worker-{index}')
+            for index in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            # 実行中のバッチが終わるのを待ってから終了する
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS(f'{sum(processed)} 件のジョブを実行しました'))
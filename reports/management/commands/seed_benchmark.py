@@ -0,0 +1,148 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from reports import facets, feed, partitions, rollups, search, stats, transfer
+from reports.models import Category, Comment, DailyReport, ReportSearchDocument, Tag
+
+DEPARTMENTS = ['開発部', '営業部', '人事部', 'インフラ部', 'デザイン部', '品質保証部', '経理部', '企画部']
+POSITIONS = ['メンバー', 'メンバー', 'メンバー', 'リーダー', 'PM']
+CATEGORIES = [
+    ('開発業務', 'dev'), ('雑談・趣味', 'chat'), ('SOS・相談', 'sos'),
+    ('技術共有', 'tech'), ('会議メモ', 'meeting'), ('顧客対応', 'customer'),
+]
+TAGS = [
+    'Python', 'Django', 'PostgreSQL', 'Docker', 'エラー解決', 'レビュー', '設計', 'テスト',
+    'インフラ', 'フロントエンド', '障害対応', '勉強会', '新人教育', 'リリース', 'ゲーム', 'ランチ',
+]
+CONDITIONS = ['excellent', 'good', 'good', 'normal', 'normal', 'normal', 'tired', 'bad']
+
+# 日本語の文章を組み立てる部品
+SUBJECTS = ['APIの実装', '画面デザインの修正', 'DBのマイグレーション', '顧客との打ち合わせ', 'テストコードの追加',
+            '障害の一次対応', 'コードレビュー', '要件定義の資料作成', 'CI環境の整備', 'パフォーマンス調査']
+RESULTS = ['が無事に完了しました。', 'を進めましたが、まだ半分ほど残っています。', 'で想定外のエラーが発生しました。',
+           'についてチームで議論しました。', 'の方針が固まりました。', 'に予想以上に時間がかかりました。']
+FOLLOWUPS = ['明日は残りの作業を片付ける予定です。', '詳しい方がいれば相談させてください。', 'ドキュメントにまとめておきます。',
+             '少し疲れ気味なので早めに休みます。', '引き続きよろしくお願いします。', 'ログを確認したところ原因が見えてきました。']
+COMMENTS = ['お疲れさまです！', '参考になりました。', '明日一緒に確認しましょう。', '無理しないでくださいね。',
+            'その件、前にも同じエラーが出ていました。', 'ナイスです！']
+
+
+def _sentence(rng):
+    return rng.choice(SUBJECTS) + rng.choice(RESULTS) + rng.choice(FOLLOWUPS)
+
+
+class Command(BaseCommand):
+    """
+    【ベンチマーク用の大量データ生成】
+    部署をまたいだユーザー・カテゴリー・タグと、日本語の日報・コメントを bulk_create で大量に投入する。
+    検索ドキュメント・コメント件数・集計テーブル・部署別ロールアップも合わせて作成するため、投入直後から全画面を計測できる。
+
+        python manage.py seed_benchmark --users 500 --reports 1000000 --comments 3
+    """
+    help = 'ベンチマーク用のユーザー・日報・コメントを大量に生成します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--reports', type=int, default=10000)
+        parser.add_argument('--comments', type=float, default=2.0, help='日報1件あたりの平均コメント数')
+        parser.add_argument('--days', type=int, default=730, help='作成日時をばらつかせる日数')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42, help='乱数のシード（同じ値なら同じデータ）')
+        parser.add_argument('--prefix', default='bench', help='生成するユーザー名の接頭辞')
+
+    def handle(self, *args, users, reports, comments, days, batch_size, seed, prefix, **options):
+        if users <= 0 or batch_size <= 0:
+            raise CommandError('--users と --batch-size は1以上を指定してください')
+        rng = random.Random(seed)
+
+        departments = self._seed_users(users, prefix)
+        user_ids = list(departments)
+        category_ids = self._seed_named(Category, [{'name': n, 'slug': s} for n, s in CATEGORIES], 'slug')
+        tag_ids = self._seed_named(Tag, [{'name': n} for n in TAGS], 'name')
+
+        now = timezone.now()
+        Through = DailyReport.tags.through
+        created = comment_total = 0
+        while created < reports:
+            size = min(batch_size, reports - created)
+            batch, tag_rows, comment_rows = [], [], []
+            for _ in range(size):
+                created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+                n_comments = min(int(rng.expovariate(1 / comments)) if comments > 0 else 0, 50)
+                author_id = rng.choice(user_ids)
+                batch.append(DailyReport(
+                    author_id=author_id,
+                    department=departments[author_id],
+                    category_id=rng.choice(category_ids),
+                    title=rng.choice(SUBJECTS) + rng.choice(['について', 'の進捗', 'で困っています', 'の振り返り']),
+                    content=''.join(_sentence(rng) for _ in range(rng.randint(1, 5))),
+                    condition=rng.choice(CONDITIONS),
+                    view_count=rng.randint(0, 500),
+                    created_at=created_at,
+                    updated_at=created_at,
+                    comment_count=n_comments,
+                ))
+                tag_rows.append(rng.sample(tag_ids, rng.randint(0, 3)))
+                comment_rows.append([
+                    (rng.choice(user_ids), rng.choice(COMMENTS),
+                     created_at + timedelta(minutes=rng.randint(1, 60 * 24)))
+                    for _ in range(n_comments)
+                ])
+
+            with transaction.atomic():
+                saved = transfer.bulk_create_keeping_timestamps(DailyReport, batch)
+                Through.objects.bulk_create([
+                    Through(dailyreport_id=report.pk, tag_id=tag_id)
+                    for report, tags in zip(saved, tag_rows) for tag_id in tags
+                ])
+                new_comments = [
+                    Comment(report_id=report.pk, author_id=author_id, text=text, created_at=created_at)
+                    for report, rows in zip(saved, comment_rows) for author_id, text, created_at in rows
+                ]
+                transfer.bulk_create_keeping_timestamps(Comment, new_comments, batch_size=batch_size)
+                ReportSearchDocument.objects.bulk_create([search.build_document(report) for report in saved])
+
+            created += size
+            comment_total += len(new_comments)
+            self.stdout.write(f'  {created}/{reports} 件の日報を作成')
+
+        stats.rebuild()
+        rollups.rebuild()
+        facets.rebuild()
+        feed.rebuild()
+        # 過去の日付の日報はデフォルトパーティションに入るため、月別パーティションへ移す（PostgreSQL）
+        partitions.ensure_partitions()
+        self.stdout.write(self.style.SUCCESS(
+            f'ユーザー {len(user_ids)} 人 / 日報 {created} 件 / コメント {comment_total} 件を生成しました'
+        ))
+
+    def _seed_users(self, count, prefix):
+        User = get_user_model()
+        existing = set(User.objects.filter(username__startswith=f'{prefix}_').values_list('username', flat=True))
+        # パスワードのハッシュ計算は重いので1回だけ行い、全員で共有する
+        password = make_password(prefix)
+        new_users = []
+        for i in range(count):
+            username = f'{prefix}_{i:06d}'
+            if username in existing:
+                continue
+            new_users.append(User(
+                username=username,
+                employee_id=f'{prefix.upper()}{i:06d}',
+                department=DEPARTMENTS[i % len(DEPARTMENTS)],
+                position=POSITIONS[i % len(POSITIONS)],
+                password=password,
+            ))
+        User.objects.bulk_create(new_users, batch_size=1000)
+        return dict(User.objects.filter(username__startswith=f'{prefix}_').values_list('id', 'department'))
+
+    def _seed_named(self, model, rows, key):
+        existing = set(model.objects.values_list(key, flat=True))
+        model.objects.bulk_create([model(**row) for row in rows if row[key] not in existing])
+        return list(model.objects.values_list('id', flat=True))
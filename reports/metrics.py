@@ -0,0 +1,282 @@
+"""
+【リクエストごとの計測（SQL・レイテンシ・テンプレート）】
+一覧画面が遅くなったとき、原因がタグの prefetch なのか、検索の絞り込みなのか、テンプレートなのかを
+切り分けられるよう、URL名（report_list, report_detail など）ごとに次の値を集計します。
+
+- リクエストの処理時間（ヒストグラム）
+- SQL の本数と合計時間（すべてのDB接続の execute_wrappers に record_query を登録してフック）
+- 接続名（default / replica1 ...）ごとの SQL の本数（レプリカへの振り分けの確認用）
+- 重複クエリ（同じ SQL・同じパラメータを1リクエスト中に2回以上実行 = N+1 の兆候）
+- テンプレートの描画時間（TEMPLATES の BACKEND を InstrumentedDjangoTemplates に差し替えて計測）
+
+集計値は /metrics で Prometheus のテキスト形式として公開します。
+記録するのは件数・合計・バケットごとの件数だけなので、本番で常時有効にしても負荷はわずかです。
+値はプロセスごとに保持されるため、複数ワーカー構成では Prometheus 側で合算してください。
+
+settings:
+    METRICS_SLOW_REQUEST_MS  この時間を超えたリクエストを SQL つきでログ出力（0 なら無効）
+    METRICS_TOKEN            設定すると /metrics に Authorization: Bearer <token> が必要
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+# 処理時間（秒）のバケット
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 1リクエストあたりの SQL 本数のバケット
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+# スローリクエストのログに残す SQL の最大本数（メモリ使用量の上限）
+MAX_RECORDED_STATEMENTS = 200
+
+# 実行中のリクエストの計測値（スレッド・非同期タスクごとに独立）
+current = ContextVar('reports_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    1リクエスト分の計測値。record_query から呼ばれる（connection.execute_wrapper() にもそのまま渡せる）。
+    """
+    __slots__ = ('queries', 'sql_time', 'duplicates', 'template_time', 'statements', 'by_alias', '_seen', '_depth', '_children')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.duplicates = 0
+        self.template_time = 0.0
+        self.statements = []
+        self.by_alias = {}
+        self._seen = set()
+        self._depth = 0
+        self._children = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += elapsed
+            alias = context['connection'].alias
+            self.by_alias[alias] = self.by_alias.get(alias, 0) + 1
+            key = (sql, repr(params))
+            if key in self._seen:
+                self.duplicates += 1
+            else:
+                self._seen.add(key)
+            if len(self.statements) < MAX_RECORDED_STATEMENTS:
+                self.statements.append((elapsed, sql, key[1]))
+
+    def adopt(self, other):
+        """
+        別スレッドで計測した値（asyncdb.run の実行分）を登録する。
+        計測中のこのオブジェクトを他スレッドと同時に書き換えないよう、足し込みは collect() で行う。
+        """
+        self._children.append(other)
+
+    def collect(self):
+        """
+        adopt() で登録された計測値を足し込む（リクエストの終了時に1回呼ぶ）。
+        """
+        for other in self._children:
+            self.queries += other.queries
+            self.sql_time += other.sql_time
+            self.duplicates += other.duplicates
+            self.template_time += other.template_time
+            for alias, count in other.by_alias.items():
+                self.by_alias[alias] = self.by_alias.get(alias, 0) + count
+            room = MAX_RECORDED_STATEMENTS - len(self.statements)
+            if room > 0:
+                self.statements.extend(other.statements[:room])
+        self._children = []
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    DB接続の execute_wrappers に常駐させるラッパー（signals.install_query_recorder が接続の作成時に登録）。
+    実行中のリクエストの RequestMetrics があればそこに記録する。
+    ContextVar は sync_to_async のスレッドにも引き継がれるため、非同期ビューの非同期ORMのクエリも数えられる。
+    """
+    recorded = current.get()
+    if recorded is None:
+        return execute(sql, params, many, context)
+    return recorded(execute, sql, params, many, context)
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最後は +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    プロセス全体の集計値。(メトリクス名, ラベル) → 値 をロック1つで守る。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()
+            }
+        return counters, histograms
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+registry = Registry()
+
+# メトリクス名 → (種類, 説明)
+METRICS = {
+    'reports_http_requests_total': ('counter', 'Total HTTP requests by view, method and status.'),
+    'reports_http_request_duration_seconds': ('histogram', 'Request latency by view.'),
+    'reports_db_queries_per_request': ('histogram', 'SQL statements executed per request.'),
+    'reports_db_query_duration_seconds': ('histogram', 'Total SQL time per request.'),
+    'reports_db_queries_total': ('counter', 'SQL statements executed by view and database alias.'),
+    'reports_db_duplicate_queries_total': ('counter', 'SQL statements repeated with identical parameters.'),
+    'reports_template_render_duration_seconds': ('histogram', 'Template render time per request.'),
+    'reports_slow_requests_total': ('counter', 'Requests slower than METRICS_SLOW_REQUEST_MS.'),
+    'reports_fragment_cache_hits_total': ('counter', 'Report card fragment cache hits.'),
+    'reports_fragment_cache_misses_total': ('counter', 'Report card fragment cache misses.'),
+    'reports_auth_cache_hits_total': ('counter', 'Session and user cache hits (each saves one auth SELECT).'),
+    'reports_auth_cache_misses_total': ('counter', 'Session and user cache misses (read from the database).'),
+}
+
+
+def record_request(view, method, status, elapsed, recorded, slow=False):
+    """
+    1リクエスト分の計測値を集計に加える。
+    """
+    recorded.collect()
+    labels = (('view', view),)
+    registry.inc('reports_http_requests_total', labels + (('method', method), ('status', str(status))))
+    registry.observe('reports_http_request_duration_seconds', labels, elapsed, LATENCY_BUCKETS)
+    registry.observe('reports_db_queries_per_request', labels, recorded.queries, QUERY_COUNT_BUCKETS)
+    registry.observe('reports_db_query_duration_seconds', labels, recorded.sql_time, LATENCY_BUCKETS)
+    registry.observe('reports_template_render_duration_seconds', labels, recorded.template_time, LATENCY_BUCKETS)
+    for alias, count in recorded.by_alias.items():
+        registry.inc('reports_db_queries_total', labels + (('alias', alias),), count)
+    if recorded.duplicates:
+        registry.inc('reports_db_duplicate_queries_total', labels, recorded.duplicates)
+    if slow:
+        registry.inc('reports_slow_requests_total', labels)
+
+
+# ---------------------------------------------------------------- テンプレートの描画時間
+
+class _TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        recorded = current.get()
+        if recorded is None:
+            return super().render(context, request)
+        # render_to_string の入れ子は外側の1回分だけを数える
+        recorded._depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            recorded._depth -= 1
+            if recorded._depth == 0:
+                recorded.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    描画時間を RequestMetrics に記録する DjangoTemplates。
+    settings.TEMPLATES の BACKEND に指定して使う。
+    """
+
+    def from_string(self, template_code):
+        return _TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return _TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+# ---------------------------------------------------------------- Prometheus 形式の出力
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """
+    集計値を Prometheus のテキスト形式（version 0.0.4）で返す。
+    """
+    from . import fragments
+
+    counters, histograms = registry.snapshot()
+    cache = fragments.stats()
+    counters[('reports_fragment_cache_hits_total', ())] = cache['hits']
+    counters[('reports_fragment_cache_misses_total', ())] = cache['misses']
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+            continue
+        for (metric, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                le = bound if bound == '+Inf' else _format_number(bound)
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(total)}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
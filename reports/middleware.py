@@ -0,0 +1,164 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics, routers, staticfiles
+
+logger = logging.getLogger('reports.metrics')
+
+# スローリクエストのログに出す SQL の本数（時間の長い順）
+SLOW_LOG_STATEMENTS = 10
+
+
+class StaticFilesMiddleware:
+    """
+    【静的ファイルの配信】
+    STATIC_URL 以下のリクエストに、collectstatic で作ったハッシュ付き・事前圧縮済みのファイルを返す（reports/staticfiles.py）。
+    - Accept-Encoding に応じて .br / .gz のファイルをそのまま返す（リクエストごとに圧縮しない）
+    - ハッシュ付きのファイルは Cache-Control: max-age=1年, immutable。再訪時はブラウザのキャッシュだけで済む
+    - DEBUG の設定や nginx などの Web サーバーに依存しない（gunicorn / uvicorn 単体でも配信できる）
+    セッション・認証・計測などの後続の処理を行わずに返すため、MIDDLEWARE の先頭に置く。
+    ファイルの内容はメモリに保持するため、非同期（ASGI）でもスレッドの切り替えなしに返せる。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server = staticfiles.StaticFileServer()
+        if self.server.prefix is None:
+            raise MiddlewareNotUsed
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.server.serve(request)
+        if response is not None:
+            return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        response = self.server.serve(request)
+        if response is not None:
+            return response
+        return await self.get_response(request)
+
+
+class MetricsMiddleware:
+    """
+    【リクエストごとの計測】
+    リクエストの処理中は metrics.current に RequestMetrics を設定しておき、
+    すべてのDB接続に常駐するラッパー（metrics.record_query）がそこへ SQL の本数・時間・重複を記録する。
+    集計は URL名（resolver_match.view_name）ごとに metrics.registry へ加える。
+    セッション・認証の SQL も数えるため、MIDDLEWARE の先頭に置く。
+
+    同期・非同期の両方に対応しているため、ASGI で非同期ビューを動かしても
+    このミドルウェアのためにスレッドの切り替え（sync_to_async）は発生しない。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorded = metrics.RequestMetrics()
+        token = metrics.current.set(recorded)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        self._record(request, response, time.perf_counter() - started, recorded)
+        return response
+
+    async def __acall__(self, request):
+        recorded = metrics.RequestMetrics()
+        token = metrics.current.set(recorded)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        self._record(request, response, time.perf_counter() - started, recorded)
+        return response
+
+    def _record(self, request, response, elapsed, recorded):
+        match = request.resolver_match
+        view = match.view_name if match else '<unmatched>'
+        threshold = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 0)
+        slow = threshold > 0 and elapsed * 1000 >= threshold
+        metrics.record_request(view, request.method, response.status_code, elapsed, recorded, slow=slow)
+        if slow:
+            self._log_slow(request, view, elapsed, recorded)
+
+    def _log_slow(self, request, view, elapsed, recorded):
+        statements = sorted(recorded.statements, key=lambda s: s[0], reverse=True)[:SLOW_LOG_STATEMENTS]
+        logger.warning(
+            'slow request %s %s (%s) %.1fms: %d queries %.1fms, %d duplicates, template %.1fms\n%s',
+            request.method, request.path, view, elapsed * 1000,
+            recorded.queries, recorded.sql_time * 1000, recorded.duplicates, recorded.template_time * 1000,
+            '\n'.join(f'  {t * 1000:8.2f}ms  {sql}  {params}' for t, sql, params in statements),
+        )
+
+
+class ReplicaRoutingMiddleware:
+    """
+    【読み取りレプリカへの振り分け】
+    閲覧リクエスト（GET / HEAD）の読み取りをレプリカへ送る（振り分けそのものは routers.PrimaryReplicaRouter）。
+    書き込みのリクエスト（POST など）のレスポンスには routers.PIN_COOKIE を付け、
+    settings.REPLICA_PIN_SECONDS 秒の間はそのブラウザの読み取りをプライマリで行う（read-your-writes）。
+    セッション・認証の読み取りも振り分けるため、SessionMiddleware より前に置く。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = self._begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                routers.reset(token)
+        return self._finish(request, response)
+
+    async def __acall__(self, request):
+        token = self._begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                routers.reset(token)
+        return self._finish(request, response)
+
+    def _begin(self, request):
+        if request.method in ('GET', 'HEAD', 'OPTIONS') and routers.PIN_COOKIE not in request.COOKIES:
+            return routers.read_from_replica()
+        return None
+
+    def _finish(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and routers.replicas():
+            response.set_cookie(
+                routers.PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
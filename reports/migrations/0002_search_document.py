@@ -0,0 +1,115 @@
+# Generated by Django 5.0.14 on 2026-10-18 00:48
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'reports_searchdocument_fts'
+DOC_TABLE = 'reports_reportsearchdocument'
+
+# reports.search.tokenize の作成時点の写し（後で search.py を変えても、このマイグレーションの結果は変わらない）
+_RUN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    tokens = []
+    for run in _RUN_RE.findall(unicodedata.normalize('NFKC', text or '').lower()):
+        tokens.extend([run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)])
+    return tokens
+
+
+def create_search_index(apps, schema_editor):
+    """
+    DBごとの全文検索インデックスを作成する。
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        # bi-gram 文字列から tsvector を自動生成する列 + GIN インデックス
+        schema_editor.execute(
+            f"ALTER TABLE {DOC_TABLE} ADD COLUMN search_vector tsvector "
+            f"GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('simple', title_terms), 'A') || "
+            f"setweight(to_tsvector('simple', content_terms), 'B')"
+            f") STORED"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX reports_searchdoc_vector_gin ON {DOC_TABLE} USING gin (search_vector)"
+        )
+    elif vendor == 'sqlite':
+        # 外部コンテンツ型の FTS5 テーブルと、元テーブルに追従させるトリガー
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"title_terms, content_terms, content='{DOC_TABLE}', content_rowid='report_id')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOC_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, title_terms, content_terms) "
+            f"VALUES (new.report_id, new.title_terms, new.content_terms); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOC_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title_terms, content_terms) "
+            f"VALUES ('delete', old.report_id, old.title_terms, old.content_terms); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOC_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title_terms, content_terms) "
+            f"VALUES ('delete', old.report_id, old.title_terms, old.content_terms); "
+            f"INSERT INTO {FTS_TABLE}(rowid, title_terms, content_terms) "
+            f"VALUES (new.report_id, new.title_terms, new.content_terms); END"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    # PostgreSQL の生成列・インデックスはテーブル削除と一緒に消える
+
+
+def backfill_documents(apps, schema_editor):
+    """
+    既存の日報の検索ドキュメントを作成する。
+    """
+    DailyReport = apps.get_model('reports', 'DailyReport')
+    ReportSearchDocument = apps.get_model('reports', 'ReportSearchDocument')
+    batch = []
+    for report in DailyReport.objects.only('id', 'title', 'content').iterator(chunk_size=2000):
+        batch.append(ReportSearchDocument(
+            report_id=report.pk,
+            title_terms=' '.join(tokenize(report.title)),
+            content_terms=' '.join(tokenize(report.content)),
+        ))
+        if len(batch) >= 2000:
+            ReportSearchDocument.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ReportSearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSearchDocument',
+            fields=[
+                ('report', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='reports.dailyreport')),
+                ('title_terms', models.TextField(blank=True, verbose_name='タイトル(n-gram)')),
+                ('content_terms', models.TextField(blank=True, verbose_name='本文(n-gram)')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='索引更新日時')),
+            ],
+            options={
+                'verbose_name': '検索ドキュメント',
+                'verbose_name_plural': '検索ドキュメント',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
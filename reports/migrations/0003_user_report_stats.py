@@ -0,0 +1,59 @@
+# Generated by Django 5.0.14 on 2026-10-18 00:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+CONDITION_COLUMNS = {
+    'excellent': 'excellent_count',
+    'good': 'good_count',
+    'normal': 'normal_count',
+    'tired': 'tired_count',
+    'bad': 'sos_count',
+}
+
+
+def backfill_stats(apps, schema_editor):
+    """
+    既存の日報から集計テーブルの初期値を作成する。
+    """
+    DailyReport = apps.get_model('reports', 'DailyReport')
+    UserReportStats = apps.get_model('reports', 'UserReportStats')
+    aggregates = {
+        column: Count('id', filter=Q(condition=condition))
+        for condition, column in CONDITION_COLUMNS.items()
+    }
+    rows = DailyReport.objects.order_by().values('author_id').annotate(report_count=Count('id'), **aggregates)
+    UserReportStats.objects.bulk_create([
+        UserReportStats(user_id=row.pop('author_id'), **row) for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('reports', '0002_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserReportStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='report_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('report_count', models.PositiveIntegerField(default=0, verbose_name='投稿数')),
+                ('excellent_count', models.PositiveIntegerField(default=0, verbose_name='絶好調の件数')),
+                ('good_count', models.PositiveIntegerField(default=0, verbose_name='良いの件数')),
+                ('normal_count', models.PositiveIntegerField(default=0, verbose_name='通常通りの件数')),
+                ('tired_count', models.PositiveIntegerField(default=0, verbose_name='疲れ気味の件数')),
+                ('sos_count', models.PositiveIntegerField(default=0, verbose_name='SOSの件数')),
+            ],
+            options={
+                'verbose_name': '投稿集計',
+                'verbose_name_plural': '投稿集計',
+                'indexes': [models.Index(fields=['-report_count', 'user'], name='reports_stats_report_count'), models.Index(fields=['-sos_count', 'user'], name='reports_stats_sos_count')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 00:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_count(apps, schema_editor):
+    """
+    既存の日報のコメント件数を1本の UPDATE（相関サブクエリ）で埋める。
+    """
+    DailyReport = apps.get_model('reports', 'DailyReport')
+    Comment = apps.get_model('reports', 'Comment')
+    counts = Comment.objects.filter(report=OuterRef('pk')).order_by().values('report') \
+                            .annotate(n=Count('id')).values('n')
+    DailyReport.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_user_report_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyreport',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='コメント数'),
+        ),
+        migrations.RunPython(backfill_comment_count, migrations.RunPython.noop),
+    ]
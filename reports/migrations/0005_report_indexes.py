@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-18 00:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_dailyreport_comment_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['report', '-created_at', '-id'], name='comment_report_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyreport',
+            index=models.Index(fields=['-created_at', '-id'], name='report_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyreport',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='report_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyreport',
+            index=models.Index(condition=models.Q(('condition', 'bad')), fields=['author'], name='report_sos_author_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-18 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0006_dailyreport_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FragmentVersion',
+            fields=[
+                ('name', models.CharField(max_length=30, primary_key=True, serialize=False, verbose_name='名前')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='世代')),
+            ],
+            options={
+                'verbose_name': 'キャッシュ世代',
+                'verbose_name_plural': 'キャッシュ世代',
+            },
+        ),
+    ]
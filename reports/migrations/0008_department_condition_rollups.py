@@ -0,0 +1,64 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    既存の日報に著者の現在の部署を埋め、ロールアップテーブルの初期値を作成する。
+    """
+    DailyReport = apps.get_model('reports', 'DailyReport')
+    DepartmentConditionDaily = apps.get_model('reports', 'DepartmentConditionDaily')
+    User = apps.get_model('accounts', 'CustomUser')
+    departments = User.objects.filter(pk=OuterRef('author_id')).values('department')[:1]
+    DailyReport.objects.update(department=Subquery(departments))
+
+    rows = DailyReport.objects.order_by() \
+        .values('department', 'category_id', 'condition', day=TruncDate('created_at')) \
+        .annotate(report_count=Count('id'))
+    DepartmentConditionDaily.objects.bulk_create([
+        DepartmentConditionDaily(
+            date=row['day'], department=row['department'], category_id=row['category_id'],
+            condition=row['condition'], report_count=row['report_count'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('reports', '0007_fragment_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyreport',
+            name='department',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='投稿時の部署'),
+        ),
+        migrations.CreateModel(
+            name='DepartmentConditionDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('department', models.CharField(max_length=100, verbose_name='部署')),
+                ('condition', models.CharField(choices=[('excellent', '絶好調！'), ('good', '良い'), ('normal', '通常通り'), ('tired', '少し疲れ気味'), ('bad', '不調/SOS')], max_length=10, verbose_name='調子')),
+                ('report_count', models.PositiveIntegerField(default=0, verbose_name='日報数')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reports.category', verbose_name='カテゴリー')),
+            ],
+            options={
+                'verbose_name': '部署別コンディション日次集計',
+                'verbose_name_plural': '部署別コンディション日次集計',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='departmentconditiondaily',
+            constraint=models.UniqueConstraint(fields=('date', 'department', 'category', 'condition'), name='reports_rollup_unique_key'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_facet_counts(apps, schema_editor):
+    """
+    既存の日報からファセット件数の初期値を作成する。
+    """
+    DailyReport = apps.get_model('reports', 'DailyReport')
+    ReportFacetCount = apps.get_model('reports', 'ReportFacetCount')
+    totals = DailyReport.objects.order_by().values('category_id', 'condition').annotate(report_count=Count('id'))
+    tagged = DailyReport.tags.through.objects.order_by() \
+        .values('tag_id', category_id=models.F('dailyreport__category_id'), condition=models.F('dailyreport__condition')) \
+        .annotate(report_count=Count('id'))
+    ReportFacetCount.objects.bulk_create([
+        ReportFacetCount(
+            category_id=row['category_id'], condition=row['condition'], tag_id=row.get('tag_id'),
+            report_count=row['report_count'],
+        )
+        for row in list(totals) + list(tagged)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0008_department_condition_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('condition', models.CharField(choices=[('excellent', '絶好調！'), ('good', '良い'), ('normal', '通常通り'), ('tired', '少し疲れ気味'), ('bad', '不調/SOS')], max_length=10, verbose_name='調子')),
+                ('report_count', models.PositiveIntegerField(default=0, verbose_name='日報数')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reports.category', verbose_name='カテゴリー')),
+                ('tag', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='reports.tag', verbose_name='タグ')),
+            ],
+            options={
+                'verbose_name': 'ファセット件数',
+                'verbose_name_plural': 'ファセット件数',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportfacetcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('tag__isnull', False)), fields=('category', 'condition', 'tag'), name='reports_facet_unique_tag'),
+        ),
+        migrations.AddConstraint(
+            model_name='reportfacetcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('tag__isnull', True)), fields=('category', 'condition'), name='reports_facet_unique_total'),
+        ),
+        migrations.RunPython(backfill_facet_counts, migrations.RunPython.noop),
+    ]
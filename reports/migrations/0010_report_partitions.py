@@ -0,0 +1,172 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:31
+
+from datetime import datetime, timezone as dt_timezone
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+TABLE = 'reports_dailyreport'
+OLD_TABLE = 'reports_dailyreport_unpartitioned'
+DEFAULT_PARTITION = 'reports_dailyreport_default'
+# 変換時に作成しておく、今月より先のパーティションの数（以降は create_report_partitions コマンドが作成する）
+FUTURE_MONTHS = 3
+
+
+def _month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _table_definition(cursor):
+    """
+    日報テーブルの主キー名・インデックス・外部キー（作り直したテーブルに同じ名前で付け直す）。
+    """
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE contype = 'p' AND conrelid = %s::regclass", [TABLE]
+    )
+    (pkey,) = cursor.fetchone()
+    # indexdef は "CREATE INDEX 名前 ON public.reports_dailyreport USING ..." の形なので、そのまま実行し直せる
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s",
+        [TABLE, pkey],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE contype = 'f' AND conrelid = %s::regclass",
+        [TABLE],
+    )
+    foreign_keys = cursor.fetchall()
+    return pkey, indexes, foreign_keys
+
+
+def _restore_definition(schema_editor, pkey, columns, indexes, foreign_keys):
+    schema_editor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {pkey} PRIMARY KEY ({columns})")
+    for definition in indexes:
+        # パーティションテーブルのインデックスは "ON ONLY テーブル" の形で返る
+        schema_editor.execute(definition.replace(' ON ONLY ', ' ON ', 1))
+    for name, definition in foreign_keys:
+        schema_editor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+
+
+def partition_reports(apps, schema_editor):
+    """
+    PostgreSQL の日報テーブルを created_at の月別の範囲パーティションに作り替える（reports/partitions.py）。
+    既存の行がある月から FUTURE_MONTHS か月先までのパーティションと、範囲外の行を受けるデフォルトパーティションを作り、
+    元のテーブルの行をコピーする。パーティションキーを含める必要があるため、主キーは (id, created_at) になる。
+    日報の行数に比例した時間がかかり、その間は日報テーブルへの書き込みが止まる。
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        pkey, indexes, foreign_keys = _table_definition(cursor)
+        # 日報を参照する外部キー制約（このマイグレーションの db_constraint=False で削除済みのはずだが、念のため）
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = 'f' AND confrelid = %s::regclass",
+            [TABLE],
+        )
+        incoming = cursor.fetchall()
+        cursor.execute(f"SELECT min(created_at) FROM {TABLE}")
+        oldest = cursor.fetchone()[0]
+
+    for table, name in incoming:
+        schema_editor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+    schema_editor.execute(f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}")
+    # IDENTITY は引き継がない（PostgreSQL 15 ではパーティションテーブルに IDENTITY 列を作れないため、シーケンスで採番する）
+    schema_editor.execute(
+        f"CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (created_at)"
+    )
+    current = _month_start(timezone.now())
+    month = _month_start(oldest) if oldest else current
+    while month <= _add_months(current, FUTURE_MONTHS):
+        end = _add_months(month, 1)
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{end:%Y-%m-%d} 00:00:00+00')"
+        )
+        month = end
+    schema_editor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+
+    schema_editor.execute(f"INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}")
+    # 元のテーブルと一緒に IDENTITY のシーケンスも削除される（インデックス名・主キー名が空くので同じ名前で付け直せる）
+    schema_editor.execute(f"DROP TABLE {OLD_TABLE}")
+    _restore_definition(schema_editor, pkey, 'id, created_at', indexes, foreign_keys)
+
+    schema_editor.execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+    schema_editor.execute(f"SELECT setval('{TABLE}_id_seq', (SELECT COALESCE(max(id), 0) + 1 FROM {TABLE}), false)")
+    schema_editor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+
+
+def unpartition_reports(apps, schema_editor):
+    """
+    partition_reports の逆。パーティションを1つの通常のテーブルに戻す（主キーは id、採番は IDENTITY）。
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        pkey, indexes, foreign_keys = _table_definition(cursor)
+
+    schema_editor.execute(f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}")
+    schema_editor.execute(f"CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    # コピーされた DEFAULT nextval(...) は元のテーブルのシーケンスを参照しているため外す
+    schema_editor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id DROP DEFAULT")
+    schema_editor.execute(f"INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}")
+    # パーティションとシーケンスも一緒に削除される
+    schema_editor.execute(f"DROP TABLE {OLD_TABLE}")
+    _restore_definition(schema_editor, pkey, 'id', indexes, foreign_keys)
+
+    schema_editor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), (SELECT COALESCE(max(id), 0) + 1 FROM {TABLE}), false)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0009_facet_counts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='report',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='reports.dailyreport'),
+        ),
+        migrations.AlterField(
+            model_name='dailyreport',
+            name='tags',
+            field=models.ManyToManyField(blank=True, db_constraint=False, to='reports.tag', verbose_name='タグ'),
+        ),
+        migrations.AlterField(
+            model_name='reportsearchdocument',
+            name='report',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='reports.dailyreport'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedReport',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='日報ID')),
+                ('title', models.CharField(max_length=200, verbose_name='タイトル')),
+                ('condition', models.CharField(choices=[('excellent', '絶好調！'), ('good', '良い'), ('normal', '通常通り'), ('tired', '少し疲れ気味'), ('bad', '不調/SOS')], max_length=10, verbose_name='本日の調子')),
+                ('created_at', models.DateTimeField(verbose_name='作成日時')),
+                ('archived_at', models.DateTimeField(verbose_name='アーカイブ日時')),
+                ('payload', models.BinaryField(verbose_name='圧縮したレコード')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reports', to=settings.AUTH_USER_MODEL)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='reports.category', verbose_name='カテゴリー')),
+            ],
+            options={
+                'verbose_name': 'アーカイブ済みの日報',
+                'verbose_name_plural': 'アーカイブ済みの日報',
+            },
+        ),
+        migrations.RunPython(partition_reports, unpartition_reports),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0010_report_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='種類')),
+                ('payload', models.JSONField(default=dict, verbose_name='引数')),
+                ('status', models.CharField(choices=[('pending', '待機中'), ('failed', '失敗')], default='pending', max_length=10, verbose_name='状態')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='実行予定日時')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='試行回数')),
+                ('last_error', models.TextField(blank=True, verbose_name='最後のエラー')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登録日時')),
+            ],
+            options={
+                'verbose_name': 'ジョブ',
+                'verbose_name_plural': 'ジョブ',
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['run_at', 'id'], name='reports_job_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_feed(apps, schema_editor):
+    """
+    既存の日報（論理削除したものを除く）を、著者の現在の部署の受信箱に入れる。
+    """
+    DailyReport = apps.get_model('reports', 'DailyReport')
+    DepartmentFeedEntry = apps.get_model('reports', 'DepartmentFeedEntry')
+    rows = DailyReport.objects.filter(deleted_at__isnull=True).order_by() \
+        .values_list('pk', 'author_id', 'author__department', 'created_at')
+    batch = []
+    for report_id, author_id, department, created_at in rows.iterator(chunk_size=1000):
+        batch.append(DepartmentFeedEntry(
+            department=department, report_id=report_id, author_id=author_id, created_at=created_at,
+        ))
+        if len(batch) == 1000:
+            DepartmentFeedEntry.objects.bulk_create(batch)
+            batch = []
+    DepartmentFeedEntry.objects.bulk_create(batch)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0012_report_deleted_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentFeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=100, verbose_name='部署')),
+                ('created_at', models.DateTimeField(verbose_name='日報の作成日時')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+                ('report', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='reports.dailyreport')),
+            ],
+            options={
+                'verbose_name': '部署フィード',
+                'verbose_name_plural': '部署フィード',
+                'indexes': [models.Index(fields=['department', '-created_at', '-id'], name='reports_feed_department_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='departmentfeedentry',
+            constraint=models.UniqueConstraint(fields=('department', 'report'), name='reports_feed_unique_entry'),
+        ),
+        migrations.RunPython(backfill_feed, migrations.RunPython.noop),
+    ]
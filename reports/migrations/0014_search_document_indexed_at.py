@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0013_department_feed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reportsearchdocument',
+            index=models.Index(fields=['indexed_at'], name='reports_searchdoc_indexed_idx'),
+        ),
+    ]
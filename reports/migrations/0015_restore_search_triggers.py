@@ -0,0 +1,44 @@
+# Generated by Django 5.0.14 on 2026-10-18 02:15
+
+from django.db import migrations
+
+FTS_TABLE = 'reports_searchdocument_fts'
+DOC_TABLE = 'reports_reportsearchdocument'
+
+
+def restore_search_triggers(apps, schema_editor):
+    """
+    SQLite のみ。0010 の AlterField（db_constraint=False）で検索ドキュメントのテーブルが作り直され、
+    FTS5 を追従させるトリガー（0002 で作成）が消えていたため、作り直して FTS5 の索引を元テーブルから再構築する。
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {DOC_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, title_terms, content_terms) "
+        f"VALUES (new.report_id, new.title_terms, new.content_terms); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {DOC_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title_terms, content_terms) "
+        f"VALUES ('delete', old.report_id, old.title_terms, old.content_terms); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {DOC_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title_terms, content_terms) "
+        f"VALUES ('delete', old.report_id, old.title_terms, old.content_terms); "
+        f"INSERT INTO {FTS_TABLE}(rowid, title_terms, content_terms) "
+        f"VALUES (new.report_id, new.title_terms, new.content_terms); END"
+    )
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0014_search_document_indexed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
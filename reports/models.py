@@ -1,5 +1,44 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db import models
 from django.conf import settings  # CustomUserを参照するため
+from django.utils import timezone
+
+# keep_timestamps() の中かどうか（ContextVar なので、同じプロセスの他のリクエスト・スレッドには影響しない）
+_keep_timestamps = ContextVar('reports_keep_timestamps', default=False)
+
+
+@contextmanager
+def keep_timestamps():
+    """
+    この中の保存（bulk_create を含む）では、TimestampField に代入済みの日時を現在時刻で上書きしない（一括取り込み用）。
+    """
+    token = _keep_timestamps.set(True)
+    try:
+        yield
+    finally:
+        _keep_timestamps.reset(token)
+
+
+class TimestampField(models.DateTimeField):
+    """
+    auto_now / auto_now_add の作成日時・更新日時。keep_timestamps() の中では、代入済みの値をそのまま INSERT する
+    （INSERT の後に UPDATE で書き戻さないので、月別パーティションでも1回で正しい月に入る）。
+    """
+
+    def pre_save(self, model_instance, add):
+        if _keep_timestamps.get():
+            value = getattr(model_instance, self.attname)
+            if value is not None:
+                return value
+        return super().pre_save(model_instance, add)
+
+    def deconstruct(self):
+        # DBの列は DateTimeField と同じなので、マイグレーションでも DateTimeField として扱う
+        name, path, args, kwargs = super().deconstruct()
+        return name, 'django.db.models.DateTimeField', args, kwargs
+
 
 class Category(models.Model):
     """
@@ -32,6 +71,17 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+class ReportManager(models.Manager):
+    """
+    論理削除した日報（deleted_at あり）を除く。DailyReport.objects はこのマネージャーで、
+    一覧・検索・API・集計の作り直しなど、すべての読み取りから削除済みの日報が消える。
+    削除済みの行も含めて扱う場合（パージなど）は DailyReport.all_objects を使う。
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class DailyReport(models.Model):
     """
     日報データ（トランザクションテーブル）
@@ -45,12 +95,17 @@ class DailyReport(models.Model):
     
     # 【多対多関係】
     # blank=True により、タグなしの投稿も許容する柔軟な設計。
-    tags = models.ManyToManyField(Tag, blank=True, verbose_name="タグ")
+    # PostgreSQL では日報テーブルを月別パーティションに分割しており（reports/partitions.py）、
+    # 主キーが (id, created_at) になるため、日報を参照する外部キーにはDBの制約を張らない（削除時の CASCADE は Django が行う）
+    tags = models.ManyToManyField(Tag, blank=True, verbose_name="タグ", db_constraint=False)
 
     # 日報の中身
     title = models.CharField("タイトル", max_length=200)
     content = models.TextField("本文")
     image = models.ImageField("画像", upload_to='uploads/', blank=True, null=True)
+    # 縮小版・WebP版など、アップロード画像から生成した派生ファイルの情報（reports/images.py が更新）
+    # 例: {"card": {"jpeg": "uploads/a.card.jpg", "webp": "uploads/a.card.webp", "width": 800, "height": 450}, ...}
+    image_derivatives = models.JSONField("画像の派生ファイル", default=dict, blank=True, editable=False)
     
     # 【SOS検知機能】
     # 集計関数で「部署ごとの平均コンディション」などを出すのに使用
@@ -70,13 +125,39 @@ class DailyReport(models.Model):
     
     # PVカウント（副問合せ・アトミック更新課題用）
     view_count = models.PositiveIntegerField("PV数", default=0)
+
+    # 【非正規化カラム】コメント件数
+    # 詳細画面のヘッダーで毎回 COUNT(*) を実行しないよう、コメントの作成・削除時に +1 / -1 で更新する
+    comment_count = models.PositiveIntegerField("コメント数", default=0)
+
+    # 【非正規化カラム】投稿時点の著者の所属部署
+    # 部署別の集計（DepartmentConditionDaily）を日報の行だけから計算できるようにする。
+    # 後から異動しても、過去の日報は投稿時の部署の実績として残る
+    department = models.CharField("投稿時の部署", max_length=100, blank=True, editable=False)
     
-    created_at = models.DateTimeField("作成日時", auto_now_add=True)
-    updated_at = models.DateTimeField("更新日時", auto_now=True)
+    created_at = TimestampField("作成日時", auto_now_add=True)
+    updated_at = TimestampField("更新日時", auto_now=True)
+
+    # 【論理削除】削除された日時。削除は deleted_at を設定して即座に非表示にするだけで、
+    # コメント・タグなどの関連行と日報の行はバックグラウンドで少しずつ削除する（reports/purge.py）
+    deleted_at = models.DateTimeField("削除日時", null=True, blank=True, editable=False)
+
+    objects = ReportManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = '日報'
         verbose_name_plural = '日報'
+        # 【インデックス設計】アクセスパスごとに対応する複合・部分インデックス
+        # （check_query_plans コマンドで、各画面のクエリがこれらを使っているか検査できます）
+        indexes = [
+            # 一覧の新着順 + キーセットページネーション: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['-created_at', '-id'], name='report_created_idx'),
+            # カテゴリー絞り込み + 新着順: WHERE category_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['category', '-created_at', '-id'], name='report_category_created_idx'),
+            # SOS集計: WHERE condition = 'bad' GROUP BY author_id（SOSの行だけを持つ部分インデックス）
+            models.Index(fields=['author'], condition=models.Q(condition='bad'), name='report_sos_author_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -86,10 +167,251 @@ class Comment(models.Model):
     【コミュニケーション機能】
     記事に対する1対多のリレーションを持つコメント機能。
     """
-    report = models.ForeignKey(DailyReport, on_delete=models.CASCADE, related_name='comments')
+    # 日報は月別パーティションのため、DBの外部キー制約は張らない（DailyReport.tags を参照）
+    report = models.ForeignKey(DailyReport, on_delete=models.CASCADE, related_name='comments', db_constraint=False)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     text = models.TextField("コメント内容")
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = TimestampField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # 詳細画面のコメント一覧: WHERE report_id = ? ORDER BY created_at DESC, id DESC LIMIT n
+            models.Index(fields=['report', '-created_at', '-id'], name='comment_report_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.author.username} -> {self.report.title}"
+
+class ReportSearchDocument(models.Model):
+    """
+    【全文検索用の検索ドキュメント】
+    日報のタイトル・本文を「2文字ずつ区切った語（bi-gram）」に分解して保持するテーブル。
+    日本語は単語の間にスペースが無いため、n-gram に分解することで部分一致検索を索引で実現します。
+    - PostgreSQL: このテーブルの tsvector 生成列に GIN インデックスを張る
+    - SQLite: FTS5 仮想テーブルがトリガーでこのテーブルと同期する
+    中身は reports/search.py が作成・更新します。
+    """
+    report = models.OneToOneField(
+        DailyReport, on_delete=models.CASCADE, primary_key=True, related_name='search_document',
+        db_constraint=False,
+    )
+    title_terms = models.TextField("タイトル(n-gram)", blank=True)
+    content_terms = models.TextField("本文(n-gram)", blank=True)
+    indexed_at = models.DateTimeField("索引更新日時", auto_now=True)
+
+    class Meta:
+        verbose_name = '検索ドキュメント'
+        verbose_name_plural = '検索ドキュメント'
+        indexes = [
+            # 似ている日報の差分（スナップショット後に作成・編集された日報）: WHERE indexed_at >= ?（reports/similar.py）
+            models.Index(fields=['indexed_at'], name='reports_searchdoc_indexed_idx'),
+        ]
+
+    def __str__(self):
+        return f"search document for report {self.report_id}"
+
+
+class UserReportStats(models.Model):
+    """
+    【集計テーブル（非正規化）】
+    ユーザーごとの投稿数・コンディション別件数をあらかじめ数えておくテーブル。
+    ランキング画面で毎回 JOIN + GROUP BY + COUNT を実行する代わりに、
+    日報の作成・編集・削除時に差分（+1 / -1）だけを反映し、画面はインデックス順に上位N件を読むだけにします。
+    中身は reports/stats.py が更新し、rebuild_report_stats コマンドで全件から作り直せます。
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='report_stats'
+    )
+    report_count = models.PositiveIntegerField("投稿数", default=0)
+
+    # コンディション別件数（DailyReport.CONDITION_CHOICES に対応）
+    excellent_count = models.PositiveIntegerField("絶好調の件数", default=0)
+    good_count = models.PositiveIntegerField("良いの件数", default=0)
+    normal_count = models.PositiveIntegerField("通常通りの件数", default=0)
+    tired_count = models.PositiveIntegerField("疲れ気味の件数", default=0)
+    sos_count = models.PositiveIntegerField("SOSの件数", default=0)  # condition='bad'
+
+    class Meta:
+        verbose_name = '投稿集計'
+        verbose_name_plural = '投稿集計'
+        indexes = [
+            # ランキングの ORDER BY ... DESC LIMIT 5 をインデックスだけで解決する
+            models.Index(fields=['-report_count', 'user'], name='reports_stats_report_count'),
+            models.Index(fields=['-sos_count', 'user'], name='reports_stats_sos_count'),
+        ]
+
+    def __str__(self):
+        return f"stats for user {self.user_id}"
+
+
+class DepartmentConditionDaily(models.Model):
+    """
+    【ロールアップテーブル】
+    (日付, 部署, カテゴリー, コンディション) ごとの日報件数。
+    部署別のSOS率の推移を、日報テーブルを GROUP BY せずにこのテーブルの期間分の行だけで求めます。
+    日報の作成・編集・削除時に reports/rollups.py が差分（+1 / -1）で更新し、
+    rebuild_condition_rollups コマンドで日報から作り直せます。
+    """
+    date = models.DateField("日付")
+    department = models.CharField("部署", max_length=100)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="カテゴリー")
+    condition = models.CharField("調子", max_length=10, choices=DailyReport.CONDITION_CHOICES)
+    report_count = models.PositiveIntegerField("日報数", default=0)
+
+    class Meta:
+        verbose_name = '部署別コンディション日次集計'
+        verbose_name_plural = '部署別コンディション日次集計'
+        constraints = [
+            # 先頭が date なので、ダッシュボードの期間指定（WHERE date BETWEEN ...）もこのインデックスで引ける
+            models.UniqueConstraint(
+                fields=['date', 'department', 'category', 'condition'], name='reports_rollup_unique_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.department} {self.category_id} {self.condition}: {self.report_count}"
+
+
+class ReportFacetCount(models.Model):
+    """
+    【ファセット件数テーブル】
+    (カテゴリー, コンディション, タグ) ごとの日報件数。tag が NULL の行は、タグに関係なく数えた件数です。
+    一覧画面の「カテゴリー別・調子別・タグ別の件数」を、日報テーブルを数えずにこの小さなテーブルの SUM で求めます
+    （行数は カテゴリー数 × 5 × (タグ数 + 1) 以下で、日報の件数には比例しません）。
+    日報の作成・編集・削除・タグの付け替え時に reports/facets.py が差分（+1 / -1）で更新し、
+    rebuild_facet_counts コマンドで日報から作り直せます。
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="カテゴリー")
+    condition = models.CharField("調子", max_length=10, choices=DailyReport.CONDITION_CHOICES)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, null=True, blank=True, verbose_name="タグ")
+    report_count = models.PositiveIntegerField("日報数", default=0)
+
+    class Meta:
+        verbose_name = 'ファセット件数'
+        verbose_name_plural = 'ファセット件数'
+        constraints = [
+            # NULL 同士は一意制約で重複と見なされないため、タグあり・なしの行で制約を分ける
+            models.UniqueConstraint(
+                fields=['category', 'condition', 'tag'], condition=models.Q(tag__isnull=False),
+                name='reports_facet_unique_tag',
+            ),
+            models.UniqueConstraint(
+                fields=['category', 'condition'], condition=models.Q(tag__isnull=True),
+                name='reports_facet_unique_total',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} {self.condition} {self.tag_id}: {self.report_count}"
+
+
+class DepartmentFeedEntry(models.Model):
+    """
+    【部署フィードの受信箱（ファンアウト・オン・ライト）】
+    「自分の部署の日報」画面（/feed/）用に、日報1件につき (著者の現在の部署, 日報) の1行を持つテーブル。
+    日報テーブルを著者と JOIN して部署で絞り、作成日時でソートする代わりに、
+    投稿時にこの行を書いておき、画面は (department, created_at DESC, id DESC) のインデックスを辿って1ページ分だけ読みます。
+    日報の作成・削除・著者の付け替え時に reports/feed.py が更新し、社員の異動（部署の変更）時は
+    ジョブキューで過去の日報の行を新しい部署へ移します。rebuild_department_feed コマンドで日報から作り直せます。
+    """
+    department = models.CharField("部署", max_length=100)
+    # 日報は月別パーティションのため、DBの外部キー制約は張らない（DailyReport.tags を参照）。
+    # 日報の削除・著者の付け替えでは、外部キーのインデックスで WHERE report_id = ? を引く
+    report = models.ForeignKey(DailyReport, on_delete=models.CASCADE, related_name='feed_entries', db_constraint=False)
+    # 異動時に「この社員の日報の行」を引くための列（外部キーのインデックスを使う）
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feed_entries')
+    # 日報の作成日時の写し（並び順とキーセットページネーションのキー）
+    created_at = models.DateTimeField("日報の作成日時")
+
+    class Meta:
+        verbose_name = '部署フィード'
+        verbose_name_plural = '部署フィード'
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'report'], name='reports_feed_unique_entry'),
+        ]
+        indexes = [
+            # 部署フィード: WHERE department = ? ORDER BY created_at DESC, id DESC LIMIT n
+            models.Index(fields=['department', '-created_at', '-id'], name='reports_feed_department_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.department}: report {self.report_id}"
+
+
+class ArchivedReport(models.Model):
+    """
+    【アーカイブ（コールドストレージ）】
+    作成から1年以上たった日報を、日報テーブルから移して保存するテーブル。
+    日報1件をコメント・タグごと1レコード（import_reports の入力と同じ形式）にまとめ、zlib で圧縮して payload に持ちます。
+    日報テーブルとそのインデックスを直近の日報だけの大きさに保ちつつ、詳細画面では ID から閲覧できます。
+    中身は reports/archive.py（archive_reports コマンド）が作成します。
+    """
+    # 元の日報の ID をそのまま使う（詳細画面の URL が変わらない）
+    id = models.BigIntegerField("日報ID", primary_key=True)
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_reports')
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, verbose_name="カテゴリー")
+    title = models.CharField("タイトル", max_length=200)
+    condition = models.CharField("本日の調子", max_length=10, choices=DailyReport.CONDITION_CHOICES)
+    created_at = models.DateTimeField("作成日時")
+    archived_at = models.DateTimeField("アーカイブ日時")
+    payload = models.BinaryField("圧縮したレコード")
+
+    class Meta:
+        verbose_name = 'アーカイブ済みの日報'
+        verbose_name_plural = 'アーカイブ済みの日報'
+
+    def __str__(self):
+        return self.title
+
+
+class FragmentVersion(models.Model):
+    """
+    【キャッシュの世代番号】
+    一覧カードのHTMLキャッシュ（reports/fragments.py）のキーに含める世代番号。
+    タグ名・カテゴリー名・ユーザー名が変わると対応する番号を +1 し、古いキャッシュを一斉に無効化します。
+    複数プロセスで同じ番号を参照できるよう、キャッシュ本体ではなくDBに保持しています。
+    """
+    name = models.CharField("名前", max_length=30, primary_key=True)
+    version = models.PositiveBigIntegerField("世代", default=0)
+
+    class Meta:
+        verbose_name = 'キャッシュ世代'
+        verbose_name_plural = 'キャッシュ世代'
+
+    def __str__(self):
+        return f"{self.name}@{self.version}"
+
+
+class Job(models.Model):
+    """
+    【ジョブキュー】
+    コミット後に実行したい処理（SOS の通知・ロールアップの作り直しなど）を積んでおくテーブル。
+    リクエストはこの行を INSERT するだけで、run_workers コマンドが SELECT ... FOR UPDATE SKIP LOCKED で取り出して実行します。
+    成功したジョブは削除し、MAX_ATTEMPTS 回失敗したジョブは status='failed' で残します（reports/jobs.py）。
+    """
+    PENDING = 'pending'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, '待機中'),
+        (FAILED, '失敗'),
+    ]
+
+    kind = models.CharField("種類", max_length=50)
+    payload = models.JSONField("引数", default=dict)
+    status = models.CharField("状態", max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    run_at = models.DateTimeField("実行予定日時", default=timezone.now)
+    attempts = models.PositiveSmallIntegerField("試行回数", default=0)
+    last_error = models.TextField("最後のエラー", blank=True)
+    created_at = models.DateTimeField("登録日時", auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'ジョブ'
+        verbose_name_plural = 'ジョブ'
+        indexes = [
+            # ワーカーの取り出し: WHERE status = 'pending' AND run_at <= now ORDER BY run_at, id LIMIT n
+            # （待機中の行だけを持つ部分インデックス。失敗して残った行は含めない）
+            models.Index(fields=['run_at', 'id'], condition=models.Q(status='pending'), name='reports_job_pending_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.author.username} -> {self.report.title}"
\ No newline at end of file
+        return f"{self.kind}#{self.pk} ({self.status})"
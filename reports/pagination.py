@@ -0,0 +1,160 @@
+"""
+【キーセット（カーソル）ページネーション】
+OFFSET方式（LIMIT 20 OFFSET 100000）は、読み飛ばす行もDBが全て数えるため、
+ページが後ろになるほど遅くなります。
+ここでは並び順のキー (created_at, id) そのものを「カーソル」として受け渡し、
+WHERE (created_at, id) < (カーソル値) ORDER BY created_at DESC, id DESC LIMIT n
+という形のクエリにすることで、何ページ目でもインデックスを辿るだけの一定コストで取得します。
+"""
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import DateTimeField, Q
+
+# 1ページあたりの表示件数
+PAGE_SIZE = 20
+
+# カーソルの向き: 'n' = 次のページ（古い方へ）, 'p' = 前のページ（新しい方へ）
+NEXT = 'n'
+PREV = 'p'
+
+# 並び順キーの型: 'd' = 日時（created_at など）, 'f' = 数値（検索スコア search_rank などの注釈）
+DATETIME = 'd'
+FLOAT = 'f'
+
+
+def _encode_value(value):
+    # 並び順キーの型を1文字で添えておき、復元時に元の型へ戻す
+    if isinstance(value, datetime):
+        return DATETIME + value.isoformat()
+    return FLOAT + repr(float(value))
+
+
+def _decode_value(raw, kind=None):
+    if kind is not None and raw[:1] != kind:
+        raise ValueError(raw)
+    if raw[:1] == DATETIME:
+        return datetime.fromisoformat(raw[1:])
+    if raw[:1] == FLOAT:
+        return float(raw[1:])
+    raise ValueError(raw)
+
+
+def value_kind(queryset, order_field):
+    """
+    queryset を order_field で並べたときの並び順キーの型（DATETIME / FLOAT）。モデルに無い列は注釈（数値）とみなす。
+    """
+    try:
+        model_field = queryset.model._meta.get_field(order_field)
+    except FieldDoesNotExist:
+        return FLOAT
+    return DATETIME if isinstance(model_field, DateTimeField) else FLOAT
+
+
+def encode_cursor(direction, value, pk):
+    """
+    (向き, 並び順キーの値, id) を URL に載せられる不透明な文字列に変換する。
+    """
+    raw = f"{direction}|{_encode_value(value)}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, kind=None):
+    """
+    encode_cursor の逆変換。改ざん・破損したカーソルは None を返し、先頭ページ扱いにする。
+    kind を指定すると、並び順キーの型が違うカーソル（検索結果のカーソルを通常の一覧で使った場合など）も None を返す。
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, value, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        if direction not in (NEXT, PREV):
+            return None
+        return direction, _decode_value(value, kind), int(pk)
+    except (ValueError, IndexError, UnicodeDecodeError):
+        return None
+
+
+@dataclass
+class KeysetPage:
+    """
+    テンプレートに渡す1ページ分の結果。
+    """
+    object_list: list = field(default_factory=list)
+    next_cursor: str = None
+    prev_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate(queryset, cursor=None, page_size=PAGE_SIZE, order_field='created_at'):
+    """
+    (order_field DESC, id DESC) の順に並ぶ queryset を、カーソル位置から page_size 件だけ取得する。
+    検索・絞り込みの filter は事前に queryset に適用しておくこと。
+    order_field には通常 created_at を、キーワード検索時は検索スコア（search_rank）などの注釈を指定する。
+
+    「次があるか」を判定するため、COUNT(*) ではなく page_size + 1 件取得して余りの有無で判断する。
+    並び順キーの型が order_field と合わないカーソル（検索と通常の一覧の間で使い回した場合など）は先頭ページとして扱う。
+    """
+    decoded = decode_cursor(cursor, value_kind(queryset, order_field))
+    desc = ('-' + order_field, '-id')
+    asc = (order_field, 'id')
+
+    if decoded is None:
+        direction = None
+        rows = list(queryset.order_by(*desc)[:page_size + 1])
+    else:
+        direction, value, pk = decoded
+        if direction == NEXT:
+            # カーソルより後ろ（並び順で下位）のもの
+            rows = list(
+                queryset.filter(Q(**{f'{order_field}__lt': value}) | Q(**{order_field: value, 'id__lt': pk}))
+                        .order_by(*desc)[:page_size + 1]
+            )
+        else:
+            # カーソルより前のものを逆順で取り、表示用に反転する
+            rows = list(
+                queryset.filter(Q(**{f'{order_field}__gt': value}) | Q(**{order_field: value, 'id__gt': pk}))
+                        .order_by(*asc)[:page_size + 1]
+            )
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == PREV:
+        rows.reverse()
+
+    page = KeysetPage(object_list=rows)
+    if not rows:
+        return page
+
+    first, last = rows[0], rows[-1]
+
+    def cursor_for(direction, obj):
+        return encode_cursor(direction, getattr(obj, order_field), obj.pk)
+
+    if direction == PREV:
+        # 前に戻ってきた場合、次のページは必ず存在する
+        page.next_cursor = cursor_for(NEXT, last)
+        if has_more:
+            page.prev_cursor = cursor_for(PREV, first)
+    else:
+        if has_more:
+            page.next_cursor = cursor_for(NEXT, last)
+        if direction == NEXT:
+            page.prev_cursor = cursor_for(PREV, first)
+    return page
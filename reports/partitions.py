@@ -0,0 +1,154 @@
+"""
+【日報テーブルの月別パーティション（PostgreSQL）】
+PostgreSQL では日報テーブル（reports_dailyreport）を created_at の月ごとの範囲パーティションに分割しています
+（マイグレーション 0010 で変換）。
+
+- パーティション名は reports_dailyreport_pYYYY_MM（UTC の月初から翌月初まで）
+- 今月から FUTURE_MONTHS か月先までのパーティションを事前に作る（create_report_partitions コマンドを毎日実行する）。
+  作り忘れた月や、それより古い日付で取り込んだ日報はデフォルトパーティション（reports_dailyreport_default）に入り、
+  次に create_report_partitions を実行したときにその月のパーティションへ移される
+- 古い月のパーティションは、archive_reports コマンドがアーカイブへ移したあと DETACH して DROP する（reports/archive.py）。
+  DELETE と違って不要行（dead tuple）が残らないため、VACUUM の手間もインデックスの肥大化も発生しない
+- 一覧の新着順（ORDER BY created_at DESC, id DESC）は、各パーティションのインデックスを新しい月から順に辿る
+
+SQLite など PostgreSQL 以外では分割しないため、ここの関数は何もしない（アーカイブは行単位で移す）。
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import DailyReport
+
+TABLE = DailyReport._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+# 今月より先に作成しておくパーティションの数
+FUTURE_MONTHS = 3
+
+_PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def month_start(value):
+    """
+    value を含む月の月初（UTC）。
+    """
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def table_of(relation):
+    """
+    EXPLAIN に出るパーティション名を日報テーブルの名前に読み替える（パーティションでなければそのまま返す）。
+    """
+    if relation == DEFAULT_PARTITION or (relation and _PARTITION_NAME.match(relation)):
+        return TABLE
+    return relation
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def months():
+    """
+    作成済みの月別パーティションの月初（古い順）。
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    found = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            found.append(datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc))
+    return sorted(found)
+
+
+def _bounds(month):
+    end = add_months(month, 1)
+    return f"FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{end:%Y-%m-%d} 00:00:00+00')"
+
+
+def _create(cursor, month):
+    """
+    1か月分のパーティションを作る。デフォルトパーティションにその月の行があれば、新しいパーティションへ移す。
+    """
+    name = partition_name(month)
+    start, end = month, add_months(month, 1)
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s)", [start, end]
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES {_bounds(month)}")
+        return
+    # デフォルトパーティションに範囲の重なる行があるとパーティションを作れないため、いったん外して行を移す
+    cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+    cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES {_bounds(month)}")
+    cursor.execute(
+        f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s", [start, end]
+    )
+    cursor.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s", [start, end])
+    cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+
+
+def ensure_partitions(future_months=FUTURE_MONTHS, now=None):
+    """
+    今月から future_months か月先までと、デフォルトパーティションに行がある月のパーティションを作る。
+    作成したパーティション名のリストを返す（分割していなければ空）。
+    """
+    if not is_partitioned():
+        return []
+    existing = set(months())
+    current = month_start(now or timezone.now())
+    wanted = {add_months(current, offset) for offset in range(future_months + 1)}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION}"
+        )
+        wanted.update(row[0].replace(tzinfo=dt_timezone.utc) for row in cursor.fetchall())
+
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for month in sorted(wanted - existing):
+            _create(cursor, month)
+            created.append(partition_name(month))
+    return created
+
+
+def partitions_before(cutoff):
+    """
+    cutoff より前の月だけを含むパーティションの (名前, 月初, 翌月初) のリスト（古い順）。
+    """
+    if not is_partitioned():
+        return []
+    return [
+        (partition_name(month), month, add_months(month, 1))
+        for month in months() if add_months(month, 1) <= cutoff
+    ]
+
+
+def drop_partition(name):
+    """
+    パーティションを日報テーブルから外して削除する。行は1件ずつ削除しないため、不要行も残らない。
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+        cursor.execute(f"DROP TABLE {name}")
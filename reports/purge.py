@@ -0,0 +1,230 @@
+"""
+【論理削除とバックグラウンドのパージ】
+日報やユーザーを delete() すると、Django は関連するコメント・タグの中間テーブル・日報などを
+すべて Python に読み込んでから1トランザクションで削除します（Collector）。
+コメントの多い日報や、長く在籍したユーザーの削除では、その間ロックを持ち続けてサイト全体が止まります。
+
+ここでは削除を2段階に分けます。
+1. 論理削除（delete_report / delete_user）: deleted_at を設定するだけ。
+   - 日報は DailyReport.objects（ReportManager）から即座に消える
+   - ユーザーはログインできなくなり（is_active=False）、その日報も論理削除され、コメントも表示されなくなる
+   - 集計テーブル（ランキング・ダッシュボード・ファセット件数）からは、このとき GROUP BY でまとめて差し引く
+   - 部署フィード（reports/feed.py）の行もこのとき消す
+   - 最後にパージのジョブ（purge_deleted）をジョブキューへ積む
+2. パージ（purge_step）: 論理削除した行と、それに依存する行を BATCH_SIZE 件ずつ DELETE する。
+   Collector を使わない直接の DELETE なので、行を Python に読み込まず、削除のシグナルも送らない。
+   1回の実行（1トランザクション）で消す行数に上限があるため、ロックは短時間で済む。
+   残りがあればジョブを積み直し、run_workers が続きを実行する（purge_deleted コマンドでも実行できる）
+
+パージの順序:
+- 論理削除した日報: コメント → タグの中間テーブル・検索ドキュメント・部署フィードの行 → 日報
+- 論理削除したユーザー: 他人の日報へのコメント（日報のコメント件数も減らす）→ アーカイブ済みの日報
+  → 日報が残っていなければユーザー（残る関連行は集計行・管理画面のログ程度なので delete() で消す）
+"""
+from dataclasses import dataclass, field
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import facets, feed, jobs, rollups, stats
+from .models import ArchivedReport, Comment, DailyReport, DepartmentFeedEntry, ReportSearchDocument
+
+Through = DailyReport.tags.through
+
+# パージの1回（1トランザクション）で削除する行数の上限（テーブルごと）
+BATCH_SIZE = 1000
+
+
+# ---------------------------------------------------------------- 論理削除
+
+def subtract(reports):
+    """
+    reports（DailyReport の queryset）を集計テーブルから差し引く。
+    日報の削除時のシグナル（signals.update_stats_on_delete）と同じ差分を、1行ずつではなく GROUP BY でまとめて反映する。
+    """
+    reports = reports.order_by()
+    for row in reports.values('author_id', 'condition').annotate(total=Count('id')):
+        stats.add(row['author_id'], row['condition'], -row['total'])
+    rows = reports.values('department', 'category_id', 'condition', day=TruncDate('created_at')) \
+                  .annotate(total=Count('id'))
+    for row in rows:
+        rollups.add(row['day'], row['department'], row['category_id'], row['condition'], -row['total'])
+    for row in reports.values('category_id', 'condition').annotate(total=Count('id')):
+        facets.add(row['category_id'], row['condition'], None, -row['total'])
+    tagged = Through.objects.filter(dailyreport_id__in=reports.values('id')).order_by() \
+        .values('tag_id', category_id=F('dailyreport__category_id'), condition=F('dailyreport__condition')) \
+        .annotate(total=Count('id'))
+    for row in tagged:
+        facets.add(row['category_id'], row['condition'], row['tag_id'], -row['total'])
+
+
+def _soft_delete_reports(stamp, **filters):
+    """
+    filters に一致する未削除の日報を論理削除し、集計テーブルから差し引いて部署フィードからも消す。論理削除した件数を返す。
+    """
+    count = DailyReport.objects.filter(**filters).update(deleted_at=stamp)
+    if count:
+        # UPDATE で行ロックを取ったあとに、この操作で削除した行（deleted_at が同じ日時）だけを数える
+        deleted = DailyReport.all_objects.filter(deleted_at=stamp, **filters)
+        subtract(deleted)
+        feed.remove(deleted)
+    return count
+
+
+def delete_report(report):
+    """
+    日報を論理削除する（画面から即座に消え、関連行はパージで削除される）。
+    """
+    with transaction.atomic():
+        deleted = _soft_delete_reports(timezone.now(), pk=report.pk)
+        if deleted:
+            jobs.enqueue('purge_deleted', {})
+    return deleted
+
+
+def delete_user(user):
+    """
+    ユーザーを論理削除する。ログインできなくし、日報をまとめて論理削除する（UPDATE 1回 + 集計の GROUP BY）。
+    """
+    stamp = timezone.now()
+    with transaction.atomic():
+        deleted = get_user_model().objects.filter(pk=user.pk, deleted_at__isnull=True) \
+                                          .update(deleted_at=stamp, is_active=False)
+        if deleted:
+            _soft_delete_reports(stamp, author_id=user.pk)
+            jobs.enqueue('purge_deleted', {})
+    # ログインユーザーのキャッシュは社員の QuerySet.update() が消す（コミット後にも消すため、ログインは即座に止まる）
+    return deleted
+
+
+# ---------------------------------------------------------------- パージ
+
+@dataclass
+class PurgeProgress:
+    """
+    パージ1回分（または合計）の削除件数。
+    """
+    deleted: dict = field(default_factory=dict)
+    done: bool = True
+
+    def add(self, name, count):
+        if count:
+            self.deleted[name] = self.deleted.get(name, 0) + count
+
+    def merge(self, other):
+        for name, count in other.deleted.items():
+            self.add(name, count)
+        self.done = other.done
+
+
+def _delete(model, column, values, limit=None):
+    """
+    model の column が values のいずれかである行を直接 DELETE する（limit 件まで）。削除した件数を返す。
+    """
+    if not values:
+        return 0
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(values))
+    where = f'{connection.ops.quote_name(column)} IN ({placeholders})'
+    params = list(values)
+    if limit is not None:
+        # DELETE ... LIMIT は PostgreSQL に無いため、主キーのサブクエリで件数を絞る
+        where = f'{pk} IN (SELECT {pk} FROM {table} WHERE {where} LIMIT %s)'
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {where}', params)
+        return cursor.rowcount
+
+
+def _purge_reports(progress, batch_size):
+    ids = list(
+        DailyReport.all_objects.filter(deleted_at__isnull=False).order_by('pk').values_list('pk', flat=True)[:batch_size]
+    )
+    if not ids:
+        return
+    comments = _delete(Comment, 'report_id', ids, limit=batch_size)
+    progress.add('comments', comments)
+    if comments == batch_size:
+        # コメントが残っている可能性がある。日報の行は次の回に削除する
+        progress.done = False
+        return
+    progress.add('report_tags', _delete(Through, 'dailyreport_id', ids))
+    progress.add('search_documents', _delete(ReportSearchDocument, 'report_id', ids))
+    progress.add('feed_entries', _delete(DepartmentFeedEntry, 'report_id', ids))
+    progress.add('reports', _delete(DailyReport, 'id', ids))
+    if len(ids) == batch_size:
+        progress.done = False
+
+
+def _purge_users(progress, batch_size):
+    User = get_user_model()
+    comment_budget = archived_budget = batch_size
+    for user in User.objects.filter(deleted_at__isnull=False).order_by('pk')[:batch_size]:
+        # 他人の日報へのコメント。消した分だけ日報のコメント件数を減らす
+        comments = list(Comment.objects.filter(author_id=user.pk).values_list('pk', 'report_id')[:comment_budget])
+        per_report = {}
+        for _, report_id in comments:
+            per_report[report_id] = per_report.get(report_id, 0) + 1
+        progress.add('comments', _delete(Comment, 'id', [pk for pk, _ in comments]))
+        for report_id, count in per_report.items():
+            DailyReport.all_objects.filter(pk=report_id, comment_count__gte=count) \
+                                   .update(comment_count=F('comment_count') - count)
+        comment_budget -= len(comments)
+        archived = _delete(ArchivedReport, 'author_id', [user.pk], limit=archived_budget)
+        progress.add('archived_reports', archived)
+        archived_budget -= archived
+        if not comment_budget or not archived_budget:
+            # 上限に達した。残りがあるかどうかは次の回に確かめる
+            progress.done = False
+            return
+        if DailyReport.all_objects.filter(author_id=user.pk).exists():
+            # 削除と同時に投稿された日報があれば論理削除し、日報のパージ（_purge_reports）が終わってからユーザーを削除する
+            _soft_delete_reports(user.deleted_at, author_id=user.pk)
+            progress.done = False
+            continue
+        # 大きな関連行は削除済みなので、残り（集計行・管理画面のログなど）は Collector に任せる
+        user.delete()
+        progress.add('users', 1)
+
+
+def purge_step(batch_size=BATCH_SIZE):
+    """
+    論理削除した日報・ユーザーの行を、テーブルごとに最大 batch_size 件ずつ1トランザクションで削除する。
+    戻り値の done が False なら、まだ削除する行が残っている。
+    """
+    progress = PurgeProgress()
+    with transaction.atomic():
+        _purge_reports(progress, batch_size)
+        if progress.done:
+            _purge_users(progress, batch_size)
+    return progress
+
+
+def pending():
+    """
+    パージを待っている行の件数（purge_deleted --dry-run 用）。
+    """
+    User = get_user_model()
+    reports = DailyReport.all_objects.filter(deleted_at__isnull=False)
+    users = User.objects.filter(deleted_at__isnull=False)
+    return {
+        'reports': reports.count(),
+        'comments': Comment.objects.filter(report__in=reports.values('id')).count()
+                    + Comment.objects.filter(author__in=users.values('id')).exclude(report__in=reports.values('id')).count(),
+        'report_tags': Through.objects.filter(dailyreport_id__in=reports.values('id')).count(),
+        'archived_reports': ArchivedReport.objects.filter(author__in=users.values('id')).count(),
+        'users': users.count(),
+    }
+
+
+@jobs.handler('purge_deleted')
+def purge_deleted(payloads):
+    """
+    パージを1回分実行し、残りがあればジョブを積み直す（まとめて積まれた複数のジョブも1回として扱う）。
+    """
+    if not purge_step().done:
+        jobs.enqueue('purge_deleted', {})
@@ -0,0 +1,149 @@
+"""
+【部署別コンディションのロールアップ】
+DepartmentConditionDaily を日報の作成・編集・削除に合わせて +1 / -1 で更新し、
+ダッシュボード用に「期間 × 部署」の SOS 率をロールアップだけから集計します。
+
+ダッシュボードが読むのは指定期間の日数 × 部署数 × カテゴリー数 × 調子 の行だけなので、
+日報が何百万件に増えても表示コストは変わりません。
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import DailyReport, DepartmentConditionDaily
+
+SOS_CONDITION = 'bad'
+
+# ダッシュボードの集計単位 → 日付の切り捨て関数
+PERIODS = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def _day(created_at):
+    # 集計日は settings.TIME_ZONE での日付（TruncDate と同じ基準）
+    return timezone.localdate(created_at) if timezone.is_aware(created_at) else created_at.date()
+
+
+def add(day, department, category_id, condition, delta):
+    """
+    1日・1部署・1カテゴリー・1コンディションの件数に delta を加える。行が無ければ作成する。
+    """
+    rows = DepartmentConditionDaily.objects.filter(
+        date=day, department=department, category_id=category_id, condition=condition,
+    )
+    # 減算は 0 で止める（件数がずれていても、PositiveIntegerField の CHECK 制約で保存・削除ごと失敗させない）
+    count = Greatest(F('report_count') + delta, 0) if delta < 0 else F('report_count') + delta
+    if rows.update(report_count=count):
+        return
+    if delta < 0:
+        # 行が無い状態での減算は集計漏れ。rebuild_condition_rollups で補正する
+        return
+    try:
+        with transaction.atomic():
+            DepartmentConditionDaily.objects.create(
+                date=day, department=department, category_id=category_id, condition=condition,
+                report_count=delta,
+            )
+    except IntegrityError:
+        # 同時に別リクエストが行を作成した場合は UPDATE でやり直す
+        rows.update(report_count=count)
+
+
+def report_saved(old, new):
+    """
+    日報の保存による差分を反映する。
+    old / new はそれぞれ保存前後の (created_at, department, category_id, condition)。新規作成時は old=None。
+    """
+    if old == new:
+        return
+    if old is not None:
+        report_deleted(old)
+    created_at, department, category_id, condition = new
+    add(_day(created_at), department, category_id, condition, +1)
+
+
+def report_deleted(old):
+    created_at, department, category_id, condition = old
+    add(_day(created_at), department, category_id, condition, -1)
+
+
+def add_reports(reports, delta=1):
+    """
+    bulk_create した日報をまとめて加算する（bulk_create はシグナルを送らないため）。
+    delta=-1 ならまとめて減算する（アーカイブへ移した日報）。
+    """
+    deltas = {}
+    for report in reports:
+        key = (_day(report.created_at), report.department, report.category_id, report.condition)
+        deltas[key] = deltas.get(key, 0) + delta
+    for key, total in deltas.items():
+        add(*key, total)
+
+
+def rebuild(date_from=None, date_to=None):
+    """
+    日報からロールアップを作り直す（GROUP BY 1回 + bulk_create）。作り直した行数を返す。
+    期間を指定した場合はその範囲の日付だけを置き換える。
+
+    作り直しの間に保存された日報の差分更新（add）を失わないよう、集計の読み取りと置き換えを1つのトランザクションで行い、
+    PostgreSQL ではその間ロールアップのテーブルをロックする（add はコミットまで待ち、作り直した行に加算する）。
+    """
+    reports = DailyReport.objects.order_by()
+    rollups = DepartmentConditionDaily.objects.all()
+    tz = timezone.get_current_timezone()
+    if date_from:
+        reports = reports.filter(created_at__gte=datetime.combine(date_from, time.min, tzinfo=tz))
+        rollups = rollups.filter(date__gte=date_from)
+    if date_to:
+        end = date_to + timedelta(days=1)
+        reports = reports.filter(created_at__lt=datetime.combine(end, time.min, tzinfo=tz))
+        rollups = rollups.filter(date__lte=date_to)
+
+    rows = reports.values('department', 'category_id', 'condition', day=TruncDate('created_at')) \
+                  .annotate(report_count=Count('id'))
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # 読み取りは許し、add の UPDATE / INSERT だけを待たせる
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {DepartmentConditionDaily._meta.db_table} IN EXCLUSIVE MODE')
+        objects = [
+            DepartmentConditionDaily(
+                date=row['day'], department=row['department'], category_id=row['category_id'],
+                condition=row['condition'], report_count=row['report_count'],
+            )
+            for row in rows
+        ]
+        rollups.delete()
+        DepartmentConditionDaily.objects.bulk_create(objects, batch_size=1000)
+    return len(objects)
+
+
+def sos_trend(date_from, date_to, period='week', category_id=None):
+    """
+    期間 × 部署ごとの日報数・SOS件数・SOS率をロールアップから集計する。
+    戻り値: (期間の開始日のリスト, 部署名のリスト, {(期間, 部署): {'total', 'sos', 'rate'}})
+    """
+    trunc = PERIODS[period]
+    rollups = DepartmentConditionDaily.objects.filter(date__gte=date_from, date__lte=date_to)
+    if category_id:
+        rollups = rollups.filter(category_id=category_id)
+    rows = rollups.order_by() \
+        .values('department', bucket=trunc('date')) \
+        .annotate(total=Sum('report_count'), sos=Sum('report_count', filter=Q(condition=SOS_CONDITION)))
+
+    cells = {}
+    for row in rows:
+        total, sos = row['total'] or 0, row['sos'] or 0
+        cells[(row['bucket'], row['department'])] = {
+            'total': total,
+            'sos': sos,
+            'rate': sos / total if total else 0.0,
+        }
+    buckets = sorted({bucket for bucket, _ in cells})
+    departments = sorted({department for _, department in cells})
+    return buckets, departments, cells
@@ -0,0 +1,88 @@
+"""
+【読み取りレプリカへの振り分け（read-your-writes つき）】
+settings.REPLICA_DATABASES に読み取り専用レプリカの接続名を並べると、
+閲覧リクエスト（GET / HEAD）の読み取りをレプリカへ、それ以外はすべてプライマリ（default）へ送ります。
+
+- レプリカはリクエストの開始時に1つ選び、そのリクエストの読み取りはすべて同じレプリカで行う
+  （件数と1ページ分の取得で別々のレプリカを読み、遅延の差で表示が食い違うのを防ぐ）
+- 書き込み（POST など）をしたブラウザには PIN_COOKIE を REPLICA_PIN_SECONDS 秒だけ付け、
+  その間の読み取りはプライマリで行う（投稿直後の画面に自分の投稿が出ない、ログイン直後にセッションが見つからない、を防ぐ）
+- トランザクションの中の読み取りはプライマリで行う（そのトランザクションの書き込みが見える接続）
+- 管理コマンド・シグナル・バックグラウンドのスレッドなど、リクエストの外の読み取りはプライマリで行う
+
+振り分けの状態は ContextVar に持つため、非同期ビュー（sync_to_async, asyncdb.run）にもそのまま引き継がれる。
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+# 書き込み後にプライマリへ固定する期間を示す Cookie
+PIN_COOKIE = 'reports_read_primary'
+
+# 実行中のリクエストが読み取りに使う接続名（None ならプライマリ）
+_read_alias = ContextVar('reports_read_alias', default=None)
+
+
+def replicas():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def read_from_replica():
+    """
+    レプリカを1つ選んで読み取り先に設定し、元に戻すためのトークンを返す。
+    レプリカが無い場合・すでに読み取り先が決まっている場合（use_primary() の中など）は None。
+    """
+    aliases = replicas()
+    if not aliases or _read_alias.get() is not None:
+        return None
+    return _read_alias.set(random.choice(aliases))
+
+
+def reset(token):
+    _read_alias.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """
+    この中の読み取りをすべてプライマリで行う（クエリプランの確認など、同じ接続で続けて実行したい場合）。
+    """
+    token = _read_alias.set(PRIMARY)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    settings.DATABASE_ROUTERS に登録するルーター。
+    """
+
+    def db_for_read(self, model, **hints):
+        # 関連オブジェクト・prefetch の読み取りは、元のオブジェクトを読んだ接続で行う
+        # （ストリーミング出力のようにリクエストの外で評価される場合も同じレプリカを読む）
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        alias = _read_alias.get()
+        if alias is None or alias == PRIMARY:
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # レプリカはプライマリの複製なので、どの接続から読んだオブジェクト同士でも関連づけてよい
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # マイグレーションはプライマリにだけ適用する（レプリカには複製で反映される）
+        return db == PRIMARY
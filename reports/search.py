@@ -0,0 +1,214 @@
+"""
+【全文検索サブシステム】
+`icontains`（= LIKE '%keyword%'）は先頭が % のためインデックスが使えず、毎回全件スキャンになります。
+ここではタイトル・本文を bi-gram（2文字ずつの重なり）に分解した検索ドキュメントを
+ReportSearchDocument に保存し、DBごとの全文検索インデックスで引きます。
+
+- PostgreSQL: to_tsvector('simple', ...) の生成列 + GIN インデックス、ts_rank で順位付け
+- SQLite: FTS5 仮想テーブル（ローカル開発・テスト用）、bm25 で順位付け
+- その他のDB: 従来どおり icontains にフォールバック
+
+キーワード「日報アプリ」は「日報 報ア アプ プリ」の連続（フレーズ）として検索します。
+1文字の語（「報」など）は語末の文字が bi-gram の先頭に現れないため索引では引けず、従来どおり部分一致
+（icontains）で絞り込みます（2文字以上の語があれば、その全文検索で絞った行だけを調べる）。
+
+一覧画面・一括出力・JSON API で共通の絞り込み条件（キーワード・カテゴリー・調子・タグ）も
+ここで組み立てます（parse_filters / apply_filters）。
+"""
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from . import facets
+from .models import DailyReport, ReportSearchDocument
+
+# FTS5 仮想テーブル名（SQLite のみ。migrations/0002 で作成）
+FTS_TABLE = 'reports_searchdocument_fts'
+
+# 語の区切り: 文字・数字以外（アンダースコアも区切りとして扱う）
+_RUN_RE = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """
+    全角英数→半角、大文字→小文字にそろえる（NFKC正規化）。
+    """
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def _bigrams(run):
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text):
+    """
+    テキストを bi-gram のリストに分解する。
+    例: 'Python入門' -> ['py', 'yt', 'th', 'ho', 'on', 'n入', '入門']
+    """
+    tokens = []
+    for run in _RUN_RE.findall(normalize(text)):
+        tokens.extend(_bigrams(run))
+    return tokens
+
+
+def build_document(report):
+    """
+    日報1件分の検索ドキュメント（保存前のインスタンス）を作る。
+    """
+    return ReportSearchDocument(
+        report_id=report.pk,
+        title_terms=' '.join(tokenize(report.title)),
+        content_terms=' '.join(tokenize(report.content)),
+    )
+
+
+def index_report(report):
+    """
+    日報1件の検索ドキュメントを作成・更新する（UPSERT）。
+    SQLite の FTS5 テーブルはトリガーで追従する。
+    """
+    doc = build_document(report)
+    ReportSearchDocument.objects.update_or_create(
+        report_id=report.pk,
+        defaults={'title_terms': doc.title_terms, 'content_terms': doc.content_terms},
+    )
+
+
+def _query_words(query):
+    """
+    検索語を語に区切り、(2文字以上の語の bi-gram のリスト, 1文字の語のリスト) を返す（語どうしは AND 条件）。
+    """
+    terms, chars = [], []
+    for run in _RUN_RE.findall(normalize(query)):
+        if len(run) == 1:
+            chars.append(run)
+        else:
+            terms.append(_bigrams(run))
+    return terms, chars
+
+
+def _contains_all(words):
+    # すべての語がタイトルか本文に含まれる（部分一致）
+    condition = Q()
+    for word in words:
+        condition &= Q(title__icontains=word) | Q(content__icontains=word)
+    return condition
+
+
+def _pg_tsquery(terms):
+    # bi-gram のフレーズ ('ab' <-> 'bc')
+    return ' & '.join('(' + ' <-> '.join(f"'{g}'" for g in grams) + ')' for grams in terms)
+
+
+def _fts5_query(terms):
+    # bi-gram のフレーズ ("ab bc")
+    return ' AND '.join('"' + ' '.join(grams) + '"' for grams in terms)
+
+
+def _fts5_rank(table):
+    """
+    日報ごとの FTS5 の bm25 スコアを返す相関サブクエリ（パラメータは MATCH の式1つ）。
+    bm25 を日報ごとに MATCH し直すと、行ごとに全文検索をやり直すため件数の2乗で遅くなる。
+    MATERIALIZED の CTE にして全文検索は文ごとに1回だけ実行し、結果は自動インデックスで引く
+    （書き込みは発生しない。MATERIALIZED は SQLite 3.35 以降）。
+    """
+    # bm25 は小さいほど上位なので符号を反転する（タイトル列の重みを10倍）
+    return (
+        f"WITH hits AS MATERIALIZED ("
+        f"SELECT rowid AS report_id, -bm25({FTS_TABLE}, 10.0, 1.0) AS rank "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s) "
+        f"SELECT rank FROM hits WHERE hits.report_id = {table}.id"
+    )
+
+
+def filter_reports(queryset, query):
+    """
+    DailyReport の queryset をキーワードで絞り込み、関連度スコア `search_rank`（大きいほど上位）を注釈する。
+    タイトルに含まれる語は本文より重く評価される。
+    """
+    terms, chars = _query_words(query)
+    if chars:
+        # 1文字の語は索引で引けないので部分一致で絞り込む
+        queryset = queryset.filter(_contains_all(chars))
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    table = queryset.model._meta.db_table
+    doc_table = ReportSearchDocument._meta.db_table
+    # 読み取り先（レプリカの場合あり）の DB の種類で検索方法を選ぶ
+    connection = connections[queryset.db]
+
+    if connection.vendor == 'postgresql':
+        tsquery = _pg_tsquery(terms)
+        matched = RawSQL(
+            f"SELECT report_id FROM {doc_table} "
+            f"WHERE search_vector @@ to_tsquery('simple', %s)",
+            [tsquery],
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(search_vector, to_tsquery('simple', %s)) FROM {doc_table} "
+            f"WHERE report_id = {table}.id",
+            [tsquery],
+            output_field=FloatField(),
+        )
+    elif connection.vendor == 'sqlite':
+        match = _fts5_query(terms)
+        matched = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        rank = RawSQL(_fts5_rank(table), [match], output_field=FloatField())
+    else:
+        # 全文検索インデックスの無いDBでは従来の部分一致検索
+        return queryset.filter(_contains_all(normalize(query).split())) \
+                       .annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    return queryset.filter(id__in=matched).annotate(search_rank=rank)
+
+
+def parse_filters(params):
+    """
+    一覧画面の絞り込み条件を GET パラメータから取り出す（不正な値は無視する）。
+        query=キーワード  category=カテゴリーID  condition=調子  tag=タグID（複数可）  tag_mode=any（OR。既定は AND）
+    戻り値は apply_filters のキーワード引数。
+    """
+    category = params.get('category') or ''
+    condition = params.get('condition')
+    return {
+        'query': params.get('query'),
+        'category_id': int(category) if category.isdigit() else None,
+        'condition': condition if condition in dict(DailyReport.CONDITION_CHOICES) else None,
+        'tag_ids': sorted({int(value) for value in params.getlist('tag') if value.isdigit()}),
+        'match_all': params.get('tag_mode') != 'any',
+    }
+
+
+def apply_filters(reports, query, category_id, condition=None, tag_ids=(), match_all=True):
+    """
+    一覧画面・一括出力・JSON API で共通の検索条件を適用し、(queryset, 並び順の列) を返す。
+    """
+    order_field = 'created_at'
+
+    # --- ここから検索ロジック ---
+
+    # 1. キーワード検索（タイトル または 本文 に含まれるか）
+    if query:
+        # 【全文検索インデックス】
+        # LIKE '%keyword%' の全件スキャンではなく、bi-gram の全文検索インデックスで絞り込み、
+        # 関連度スコア（search_rank）の高い順に並べる
+        reports = filter_reports(reports, query)
+        order_field = 'search_rank'
+
+    # 2. カテゴリー・調子の絞り込み
+    if category_id:
+        reports = reports.filter(category_id=category_id)
+    if condition:
+        reports = reports.filter(condition=condition)
+
+    # 3. タグ絞り込み（AND / OR。中間テーブルのサブクエリ1つ。詳細は reports/facets.py）
+    reports = facets.filter_tags(reports, tag_ids, match_all)
+
+    # --- ここまで ---
+    return reports, order_field
@@ -0,0 +1,257 @@
+"""
+【シグナルによる派生データの同期】
+日報の保存・削除に合わせて、検索ドキュメントや集計テーブルなどの派生テーブルを更新します。
+ビュー（report_create / report_update）だけでなく管理画面からの編集にも追従させるため、
+モデルのシグナルで一元的に処理しています。
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import facets, feed, fragments, metrics, rollups, search, stats
+from .models import Category, Comment, DailyReport, Tag
+
+# 検索ドキュメントの再作成が必要な項目
+SEARCH_FIELDS = {'title', 'content'}
+
+# 集計テーブルの更新が必要な項目
+STATS_FIELDS = {'author', 'author_id', 'condition'}
+
+# 部署別ロールアップ・ファセット件数の更新が必要な項目
+ROLLUP_FIELDS = {'created_at', 'department', 'category', 'category_id', 'condition'}
+ROLLUP_KEY = ('created_at', 'department', 'category_id', 'condition')
+
+# 部署フィードの行を移す必要がある項目（著者の付け替え）
+FEED_FIELDS = {'author', 'author_id', 'department'}
+
+
+def _stats_key(instance):
+    """
+    集計に関わる値 (author_id, condition)。遅延読み込み（only/defer）の項目があれば None。
+    """
+    values = instance.__dict__
+    if 'author_id' not in values or 'condition' not in values:
+        return None
+    return values['author_id'], values['condition']
+
+
+def _rollup_key(instance):
+    """
+    部署別ロールアップに関わる値 (created_at, department, category_id, condition)。遅延読み込みの項目があれば None。
+    """
+    values = instance.__dict__
+    if any(name not in values for name in ROLLUP_KEY):
+        return None
+    return tuple(values[name] for name in ROLLUP_KEY)
+
+
+@receiver(post_init, sender=DailyReport, dispatch_uid='reports.remember_stats_key')
+def remember_stats_key(sender, instance, **kwargs):
+    """
+    DBから読み込んだ時点の集計キーを覚えておき、編集時の差分計算に使う。
+    """
+    instance._stats_key = _stats_key(instance) if instance.pk else None
+    instance._rollup_key = _rollup_key(instance) if instance.pk else None
+
+
+@receiver(pre_save, sender=DailyReport, dispatch_uid='reports.load_stats_key')
+def load_stats_key(sender, instance, raw=False, **kwargs):
+    # 読み込み時に値が無かった（defer されていた等）場合だけ、保存前の値をDBから取得する
+    if raw or instance._state.adding:
+        return
+    if instance._stats_key is None:
+        instance._stats_key = DailyReport.objects.filter(pk=instance.pk) \
+                                                 .values_list('author_id', 'condition').first()
+    if instance._rollup_key is None:
+        instance._rollup_key = DailyReport.objects.filter(pk=instance.pk).values_list(*ROLLUP_KEY).first()
+
+
+@receiver(pre_save, sender=DailyReport, dispatch_uid='reports.set_report_department')
+def set_report_department(sender, instance, raw=False, **kwargs):
+    """
+    新規投稿時（と著者の付け替え時）に、著者の現在の部署を日報に写す。
+    """
+    if raw:
+        return
+    author_changed = instance._stats_key is not None and instance._stats_key[0] != instance.author_id
+    if instance._state.adding or author_changed:
+        instance.department = instance.author.department
+
+
+@receiver(post_save, sender=DailyReport, dispatch_uid='reports.index_report')
+def index_report_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    日報の作成・編集時に検索ドキュメントを更新する。
+    同じトランザクション内で実行されるため、保存が失敗すれば索引もロールバックされる。
+    """
+    if raw:
+        # loaddata 中はスキップ（rebuild_search_index で作り直す）
+        return
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    search.index_report(instance)
+
+
+@receiver(post_save, sender=DailyReport, dispatch_uid='reports.update_feed_on_save')
+def update_feed_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    新規作成時に日報を部署フィードの受信箱に入れる。著者を付け替えた場合は、新しい著者の部署へ移す。
+    保存前の著者（instance._stats_key）を使うため、update_stats_on_save より前に登録している。
+    """
+    if raw:
+        # loaddata 中はスキップ（rebuild_department_feed で作り直す）
+        return
+    if created:
+        feed.add_reports([instance])
+        return
+    if update_fields is not None and not FEED_FIELDS & set(update_fields):
+        return
+    if instance._stats_key is not None and instance._stats_key[0] != instance.author_id:
+        feed.author_changed(instance)
+
+
+@receiver(post_save, sender=DailyReport, dispatch_uid='reports.update_stats_on_save')
+def update_stats_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    投稿数・コンディション別件数を差分更新する（編集でコンディションが変わった場合も含む）。
+    """
+    if raw:
+        # loaddata 中はスキップ（rebuild_report_stats で作り直す）
+        return
+    if update_fields is not None and not STATS_FIELDS & set(update_fields):
+        return
+    new = (instance.author_id, instance.condition)
+    stats.report_saved(None if created else instance._stats_key, new)
+    instance._stats_key = new
+
+
+@receiver(post_save, sender=DailyReport, dispatch_uid='reports.update_rollups_on_save')
+def update_rollups_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    部署別コンディションのロールアップとファセット件数を差分更新する（編集でカテゴリー・調子が変わった場合も含む）。
+    ファセット件数のキー (category_id, condition) はロールアップのキーの後ろ2つ。
+    """
+    if raw:
+        # loaddata 中はスキップ（rebuild_condition_rollups / rebuild_facet_counts で作り直す）
+        return
+    if update_fields is not None and not ROLLUP_FIELDS & set(update_fields):
+        return
+    old = None if created else instance._rollup_key
+    new = _rollup_key(instance)
+    rollups.report_saved(old, new)
+    facets.report_saved(instance.pk, old[2:] if old else None, new[2:])
+    instance._rollup_key = new
+
+
+@receiver(pre_delete, sender=DailyReport, dispatch_uid='reports.remember_report_tags')
+def remember_report_tags(sender, instance, **kwargs):
+    # タグの中間テーブルの行は日報と一緒に（シグナル無しで）削除されるため、ファセット件数用に先に読んでおく
+    instance._facet_tag_ids = facets.tag_ids_of(instance.pk)
+
+
+@receiver(post_delete, sender=DailyReport, dispatch_uid='reports.update_stats_on_delete')
+def update_stats_on_delete(sender, instance, **kwargs):
+    key = instance._stats_key or _stats_key(instance)
+    if key is not None:
+        stats.report_deleted(key)
+    key = instance._rollup_key or _rollup_key(instance)
+    if key is not None:
+        rollups.report_deleted(key)
+        facets.report_deleted(key[2:], getattr(instance, '_facet_tag_ids', ()))
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='reports.increment_comment_count')
+def increment_comment_count(sender, instance, created, raw=False, **kwargs):
+    """
+    コメント投稿時に日報のコメント件数を +1 する（アトミック更新）。
+    """
+    if created and not raw:
+        DailyReport.objects.filter(pk=instance.report_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment, dispatch_uid='reports.decrement_comment_count')
+def decrement_comment_count(sender, instance, **kwargs):
+    DailyReport.objects.filter(pk=instance.report_id, comment_count__gt=0) \
+                       .update(comment_count=F('comment_count') - 1)
+
+
+@receiver(m2m_changed, sender=DailyReport.tags.through, dispatch_uid='reports.touch_report_on_tags_changed')
+def touch_report_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    タグの付け替えで日報の updated_at を更新し、一覧カードのキャッシュを作り直させる。
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # tag.dailyreport_set.add(...) のようにタグ側から操作された場合
+        if not pk_set:
+            return
+        reports = DailyReport.objects.filter(pk__in=pk_set)
+    else:
+        reports = DailyReport.objects.filter(pk=instance.pk)
+    reports.update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=DailyReport.tags.through, dispatch_uid='reports.update_facets_on_tags_changed')
+def update_facets_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    タグの付け替えをファセット件数に反映する。
+    削除は、実際に付いていたタグだけを数えるため、削除前（pre_remove / pre_clear）に対象を読んでおく。
+    """
+    if action in ('pre_remove', 'pre_clear'):
+        instance._facet_removed_links = facets.tag_links(instance, reverse, pk_set)
+    elif action in ('post_remove', 'post_clear'):
+        facets.tags_changed(getattr(instance, '_facet_removed_links', ()), -1)
+        instance._facet_removed_links = ()
+    elif action == 'post_add' and pk_set:
+        facets.tags_changed(facets.tag_links(instance, reverse, pk_set), +1)
+
+
+@receiver(post_save, sender=Tag, dispatch_uid='reports.bump_tags_on_save')
+@receiver(post_delete, sender=Tag, dispatch_uid='reports.bump_tags_on_delete')
+def bump_tags_version(sender, **kwargs):
+    fragments.bump_version('tags')
+
+
+@receiver(post_save, sender=Category, dispatch_uid='reports.bump_categories_on_save')
+@receiver(post_delete, sender=Category, dispatch_uid='reports.bump_categories_on_delete')
+def bump_categories_version(sender, **kwargs):
+    fragments.bump_version('categories')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='reports.bump_users_on_save')
+def bump_users_version(sender, update_fields=None, raw=False, **kwargs):
+    # ログインのたびに last_login だけが保存されるので、ユーザー名が変わりうる保存だけを対象にする
+    if raw or (update_fields is not None and 'username' not in update_fields):
+        return
+    fragments.bump_version('users')
+
+
+@receiver(post_init, sender=settings.AUTH_USER_MODEL, dispatch_uid='reports.remember_user_department')
+def remember_user_department(sender, instance, **kwargs):
+    # 読み込み時の部署を覚えておき、異動（部署の変更）を保存時に検出する（defer されていれば None）
+    instance._feed_department = instance.__dict__.get('department') if instance.pk else None
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='reports.move_feed_on_department_change')
+def move_feed_on_department_change(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    社員の部署が変わったら、過去の日報の部署フィードの行を新しい部署へ移すジョブを積む（reports/feed.py）。
+    """
+    if raw or (update_fields is not None and 'department' not in update_fields):
+        return
+    if not created and instance._feed_department is not None and instance._feed_department != instance.department:
+        feed.user_moved(instance.pk)
+    # 作成直後のインスタンスも、続けて異動させたときに検出できるよう保存した部署を覚える
+    instance._feed_department = instance.department
+
+
+@receiver(connection_created, dispatch_uid='reports.install_query_recorder')
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    新しいDB接続にSQL計測用のラッパーを登録する（reports/metrics.py）。
+    """
+    metrics.install(connection)
@@ -0,0 +1,470 @@
+"""
+【似ている日報（TF-IDF のコサイン類似度）】
+詳細画面（report_detail）に、内容の近い日報を表示します。SOS（調子: 不調）の日報では
+「同じ問題に直面した人の日報」として、過去の解決の手がかりを探せるようにします。
+
+- ベクトル: 検索ドキュメント（ReportSearchDocument）の bi-gram をそのまま語として使う（日本語も分かち書き不要）。
+  語は crc32 で N_FEATURES 次元に振り分け（ハッシュトリック）、語彙表を持たない。
+  重みは (1 + log 出現回数) × idf で、タイトルの語は TITLE_WEIGHT 回出現したものとして数える。
+  日報ごとに重みの大きい MAX_TERMS 語だけを残して長さ 1 に正規化する（内積 = コサイン類似度）
+- 保存: ベクトルを CSR 形式（行 = 日報）と、語ごとの転置リスト（列 = 語）の NumPy 配列（.npy）で
+  settings.SIMILAR_INDEX_DIR に書き出す（スナップショット）。各プロセスは np.load(mmap_mode='r') で
+  メモリマップして読むため、起動時に全体を読み込まず、同じサーバーの複数プロセスで OS のページキャッシュを共有する
+- 検索: 表示中の日報の語のうち重みの大きいものから転置リストを引いて候補を数え（POSTING_BUDGET 件まで）、
+  上位 CANDIDATES 件だけを正確なコサイン類似度で並べ直す。全件との内積は計算しない
+- 差分: スナップショットより後に作成・編集された日報は、検索ドキュメントの indexed_at で見つけて
+  プロセスのメモリ上でベクトル化し（REFRESH_SECONDS 秒に1回）、全件と内積を取ってスナップショットの結果に混ぜる
+- 圧縮: 差分が COMPACT_THRESHOLD 件を超えたら build_similar_index ジョブを積み、スナップショットに差分を取り込む
+  （idf は作成時のまま。build_similar_index --full で全件から作り直すと idf も更新される）
+
+削除した日報は表示時に DailyReport.objects で読み込めないものとして除く（スナップショットからは次の圧縮で消える）。
+NumPy が無い環境では何も表示しない。
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # numpy が無ければ「似ている日報」は表示しない
+    np = None
+
+from . import jobs
+from .models import DailyReport, ReportSearchDocument
+
+logger = logging.getLogger(__name__)
+
+# ハッシュトリックの次元数（2の累乗）
+N_FEATURES = 1 << 20
+# タイトルの語の重み（本文の何回分として数えるか）
+TITLE_WEIGHT = 2
+# 日報ごとに残す語の数
+MAX_TERMS = 64
+# 転置リストから数える候補の上限と、正確な類似度で並べ直す件数
+POSTING_BUDGET = 200_000
+CANDIDATES = 100
+# これより類似度の低い日報は表示しない
+MIN_SCORE = 0.1
+# 詳細画面に表示する件数
+SIMILAR_LIMIT = 5
+
+# 差分（スナップショット後に作成・編集された日報）を読み直す間隔（秒）と、indexed_at の読み落としを防ぐ重なり
+REFRESH_SECONDS = 5
+DELTA_OVERLAP = timedelta(minutes=5)
+# 差分がこの件数を超えたらスナップショットに取り込む。ジョブを積み直すまでの間隔（秒。プロセスごと）
+COMPACT_THRESHOLD = 5000
+BUILD_RETRY_SECONDS = 600
+# 作成時に1回の SELECT で読む検索ドキュメントの件数
+BUILD_CHUNK_SIZE = 2000
+
+# スナップショットの配列（.npy）と、現在のスナップショット名を書いたファイル
+ARRAYS = ('ids', 'indptr', 'indices', 'data', 'post_indptr', 'post_rows', 'post_data', 'idf')
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'build.lock'
+
+
+def available():
+    return np is not None
+
+
+def index_dir():
+    return getattr(settings, 'SIMILAR_INDEX_DIR', os.path.join(settings.BASE_DIR, 'similar_index'))
+
+
+# ---------------------------------------------------------------- ベクトル化
+
+def _hash(terms):
+    return np.fromiter((zlib.crc32(term.encode()) & (N_FEATURES - 1) for term in terms), dtype=np.int32, count=len(terms))
+
+
+def term_frequencies(title_terms, content_terms):
+    """
+    検索ドキュメントの bi-gram（空白区切り）から (語の番号の配列（昇順）, 出現回数の配列) を作る。
+    """
+    title, content = title_terms.split(), content_terms.split()
+    features = np.concatenate([_hash(title), _hash(content)])
+    counts = np.concatenate([np.full(len(title), TITLE_WEIGHT, np.float32), np.ones(len(content), np.float32)])
+    features, inverse = np.unique(features, return_inverse=True)
+    return features, np.bincount(inverse, weights=counts).astype(np.float32)
+
+
+def weigh(features, tf, idf):
+    """
+    出現回数を TF-IDF の重みにし、重みの大きい MAX_TERMS 語だけを残して長さ 1 に正規化する（語の番号は昇順のまま）。
+    """
+    weights = (1 + np.log(tf)) * idf[features]
+    if len(weights) > MAX_TERMS:
+        keep = np.sort(np.argpartition(weights, -MAX_TERMS)[-MAX_TERMS:])
+        features, weights = features[keep], weights[keep]
+    norm = np.linalg.norm(weights)
+    if norm:
+        weights = weights / norm
+    return features, weights.astype(np.float32)
+
+
+def _idf(df, n_docs):
+    return (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+
+
+def _documents(since=None):
+    docs = ReportSearchDocument.objects.filter(report__deleted_at__isnull=True)
+    if since is not None:
+        docs = docs.filter(indexed_at__gte=since)
+    return docs.order_by('report_id').values_list('report_id', 'title_terms', 'content_terms')
+
+
+def _dot(indptr, indices, data, rows, features, weights):
+    """
+    CSR の行 rows と、ベクトル (features, weights) の内積をまとめて計算する。features は昇順であること。
+    """
+    starts = np.asarray(indptr[rows], dtype=np.int64)
+    lengths = np.asarray(indptr[rows + 1], dtype=np.int64) - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(len(rows), dtype=np.float32)
+    # 各行の要素の位置を並べる（行ごとの arange を1回の演算で作る）
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+    row_features = np.asarray(indices[offsets])
+    row_weights = np.asarray(data[offsets], dtype=np.float32)
+    positions = np.minimum(np.searchsorted(features, row_features), len(features) - 1)
+    products = np.where(features[positions] == row_features, row_weights * weights[positions], 0)
+    return np.bincount(np.repeat(np.arange(len(rows)), lengths), weights=products, minlength=len(rows))
+
+
+# ---------------------------------------------------------------- スナップショット
+
+class Snapshot:
+    """
+    書き出したスナップショット1つ（配列はメモリマップで読む）。
+    行 i の日報IDは ids[i]（昇順）、ベクトルは indices / data の indptr[i]:indptr[i + 1]。
+    語 f を含む行は post_rows の post_indptr[f]:post_indptr[f + 1]（重みは post_data）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.watermark = datetime.fromisoformat(self.meta['watermark'])
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+
+    def vector(self, report_id):
+        row = int(np.searchsorted(self.ids, report_id))
+        if row == len(self.ids) or self.ids[row] != report_id:
+            return None
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return np.array(self.indices[start:end]), np.array(self.data[start:end], dtype=np.float32)
+
+    def candidates(self, features, weights):
+        """
+        重みの大きい語から転置リストを POSTING_BUDGET 件まで足し合わせ、部分的な類似度の上位 CANDIDATES 行を返す。
+        """
+        order = np.argsort(-weights)
+        starts = np.asarray(self.post_indptr[features[order]])
+        lengths = np.asarray(self.post_indptr[features[order] + 1]) - starts
+        # 1語だけで上限を超える（ほとんどの日報に出てくる）語は候補探しに使わない
+        usable = (lengths > 0) & (lengths <= POSTING_BUDGET)
+        usable &= np.cumsum(np.where(usable, lengths, 0)) <= POSTING_BUDGET
+        rows, scores = [], []
+        for term, start, length in zip(order[usable], starts[usable], lengths[usable]):
+            rows.append(self.post_rows[start:start + length])
+            scores.append(np.asarray(self.post_data[start:start + length], dtype=np.float32) * weights[term])
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+        # 行ごとの部分スコアは bincount で足し合わせ、拾った行はソートして重複を除く
+        # （部分スコアが 0 でない行を全行から探すより、拾った行だけを扱うほうが速い）
+        rows = np.concatenate(rows)
+        partial = np.bincount(rows, weights=np.concatenate(scores), minlength=len(self.ids))
+        rows.sort()
+        rows = rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+        if len(rows) > CANDIDATES:
+            rows = rows[np.argpartition(-partial[rows], CANDIDATES)[:CANDIDATES]]
+        return rows.astype(np.int64)
+
+    def search(self, features, weights):
+        rows = self.candidates(features, weights)
+        return self.ids[rows], _dot(self.indptr, self.indices, self.data, rows, features, weights)
+
+
+def _current_name(directory):
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_snapshot(directory, ids, indptr, indices, data, idf, watermark, meta):
+    """
+    CSR の配列から転置リストを作り、新しいスナップショットとして書き出して CURRENT を差し替える。
+    読み込み中のプロセスは次の更新（REFRESH_SECONDS 秒以内）で新しいスナップショットに切り替える。
+    """
+    order = np.argsort(indices, kind='stable')
+    rows = np.repeat(np.arange(len(ids), dtype=np.int32), np.diff(indptr))
+    post_indptr = np.zeros(N_FEATURES + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=N_FEATURES), out=post_indptr[1:])
+    arrays = {
+        'ids': ids.astype(np.int64), 'indptr': indptr.astype(np.int64),
+        'indices': indices.astype(np.int32), 'data': data.astype(np.float16),
+        'post_indptr': post_indptr, 'post_rows': rows[order], 'post_data': data[order].astype(np.float16),
+        'idf': idf.astype(np.float32),
+    }
+    name = f"snapshot-{timezone.now():%Y%m%d%H%M%S%f}"
+    path = os.path.join(directory, name)
+    os.makedirs(path)
+    for key, array in arrays.items():
+        np.save(os.path.join(path, f'{key}.npy'), array)
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({**meta, 'watermark': watermark.isoformat(), 'reports': len(ids), 'nnz': len(indices)}, f)
+
+    tmp = os.path.join(directory, CURRENT_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        f.write(name)
+    os.replace(tmp, os.path.join(directory, CURRENT_FILE))
+    # 古いスナップショットを消す（メモリマップ中のプロセスは、ファイルを消しても切り替えまで読み続けられる）
+    for entry in os.listdir(directory):
+        if entry.startswith('snapshot-') and entry != name:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+    return len(ids)
+
+
+def _assemble(ids, vectors):
+    """
+    (日報ID, (語の番号, 重み)) の並びから CSR の配列 (ids, indptr, indices, data) を作る。
+    """
+    lengths = np.fromiter((len(features) for features, _ in vectors), dtype=np.int64, count=len(vectors))
+    indptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    if vectors:
+        indices = np.concatenate([features for features, _ in vectors]).astype(np.int32)
+        data = np.concatenate([weights for _, weights in vectors]).astype(np.float32)
+    else:
+        indices, data = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    return np.asarray(ids, dtype=np.int64), indptr, indices, data
+
+
+def _build_full(directory, watermark):
+    """
+    全件から作り直す。1回目の走査で語ごとの文書頻度（idf）を数え、2回目で重みを付けて書き出す。
+    """
+    df = np.zeros(N_FEATURES, dtype=np.int64)
+    n_docs, chunk = 0, []
+    for _, title_terms, content_terms in _documents().iterator(chunk_size=BUILD_CHUNK_SIZE):
+        chunk.append(term_frequencies(title_terms, content_terms)[0])
+        n_docs += 1
+        if len(chunk) == BUILD_CHUNK_SIZE:
+            df += np.bincount(np.concatenate(chunk), minlength=N_FEATURES)
+            chunk = []
+    if chunk:
+        df += np.bincount(np.concatenate(chunk), minlength=N_FEATURES)
+    idf = _idf(df, n_docs)
+
+    ids, vectors = [], []
+    for report_id, title_terms, content_terms in _documents().iterator(chunk_size=BUILD_CHUNK_SIZE):
+        ids.append(report_id)
+        vectors.append(weigh(*term_frequencies(title_terms, content_terms), idf))
+    return _write_snapshot(directory, *_assemble(ids, vectors), idf, watermark, {'idf_reports': n_docs})
+
+
+def _compact(directory, base, watermark):
+    """
+    スナップショットに差分を取り込む。削除した日報の行を除き、編集された日報の行を差し替える（idf はそのまま）。
+    """
+    delta_ids, vectors = [], []
+    for report_id, title_terms, content_terms in \
+            _documents(since=base.watermark - DELTA_OVERLAP).iterator(chunk_size=BUILD_CHUNK_SIZE):
+        delta_ids.append(report_id)
+        vectors.append(weigh(*term_frequencies(title_terms, content_terms), base.idf))
+    delta = _assemble(delta_ids, vectors)
+
+    live = np.fromiter(DailyReport.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=10000),
+                       dtype=np.int64)
+    base_ids = np.asarray(base.ids)
+    keep = np.isin(base_ids, live, assume_unique=True) & ~np.isin(base_ids, delta[0])
+    base_lengths = np.diff(base.indptr)
+    nnz_keep = np.repeat(keep, base_lengths)
+
+    ids = np.concatenate([base_ids[keep], delta[0]])
+    lengths = np.concatenate([base_lengths[keep], np.diff(delta[1])])
+    indices = np.concatenate([np.asarray(base.indices)[nnz_keep], delta[2]])
+    data = np.concatenate([np.asarray(base.data, dtype=np.float32)[nnz_keep], delta[3]])
+
+    # 日報ID順に並べ直す（Snapshot.vector は ids の二分探索で行を探す）
+    order = np.argsort(ids, kind='stable')
+    starts = np.zeros(len(lengths), dtype=np.int64)
+    starts[1:] = np.cumsum(lengths)[:-1]
+    starts, lengths = starts[order], lengths[order]
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(int(lengths.sum()))
+    indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    return _write_snapshot(directory, ids[order], indptr, indices[offsets], data[offsets], np.asarray(base.idf),
+                           watermark, {'idf_reports': base.meta.get('idf_reports', len(base_ids))})
+
+
+def build(full=False):
+    """
+    スナップショットを作る。スナップショットがまだ無いか full=True なら全件から、そうでなければ差分を取り込む。
+    スナップショットに含めた日報の件数を返す。同時に実行された場合は、ファイルロックで1つずつ実行する。
+    """
+    directory = index_dir()
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # これ以降に保存された日報は次の差分になる（DELTA_OVERLAP だけ重ねて読む）
+        watermark = timezone.now()
+        name = _current_name(directory)
+        if full or name is None:
+            return _build_full(directory, watermark)
+        return _compact(directory, Snapshot(os.path.join(directory, name)), watermark)
+
+
+@jobs.handler('build_similar_index')
+def build_similar_index(payloads):
+    """
+    スナップショットを作る（まとめて積まれた複数のジョブも1回として扱う）。
+    """
+    build(full=any(payload.get('full') for payload in payloads))
+
+
+# ---------------------------------------------------------------- 検索
+
+class SimilarIndex:
+    """
+    プロセスごとの検索の状態。スナップショット（メモリマップ）と、その後に作成・編集された日報のベクトル（差分）を持つ。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.name = None
+        self.snapshot = None
+        self.delta = {}           # 日報ID → (indexed_at, 語の番号, 重み)
+        self.delta_arrays = None  # 差分の CSR (ids, indptr, indices, data)
+        self.since = None
+        self.checked_at = 0.0
+        self.build_requested_at = None
+
+    def _request_build(self):
+        now = time.monotonic()
+        if self.build_requested_at is None or now - self.build_requested_at > BUILD_RETRY_SECONDS:
+            self.build_requested_at = now
+            jobs.enqueue('build_similar_index', {})
+
+    def refresh(self):
+        """
+        REFRESH_SECONDS 秒に1回、スナップショットの差し替えと、差分（indexed_at が新しい検索ドキュメント）を確認する。
+        差分は (日報ID, indexed_at) を読み、変わったものだけ本文を読んでベクトル化する。
+        """
+        if time.monotonic() - self.checked_at < REFRESH_SECONDS:
+            return
+        with self.lock:
+            if time.monotonic() - self.checked_at < REFRESH_SECONDS:
+                return
+            self.checked_at = time.monotonic()
+            name = _current_name(index_dir())
+            if name != self.name:
+                self.snapshot = Snapshot(os.path.join(index_dir(), name)) if name else None
+                self.name, self.delta, self.delta_arrays, self.since = name, {}, None, None
+            if self.snapshot is None:
+                # まだ作られていない。ワーカーに作らせる
+                self._request_build()
+                return
+
+            started = timezone.now()
+            since = (self.since or self.snapshot.watermark) - DELTA_OVERLAP
+            seen = ReportSearchDocument.objects.filter(indexed_at__gte=since).values_list('report_id', 'indexed_at')
+            changed = [report_id for report_id, indexed_at in seen
+                       if self.delta.get(report_id, (None,))[0] != indexed_at]
+            if changed:
+                for report_id, indexed_at, title_terms, content_terms in \
+                        ReportSearchDocument.objects.filter(report_id__in=changed) \
+                                                    .values_list('report_id', 'indexed_at', 'title_terms', 'content_terms'):
+                    features, weights = weigh(*term_frequencies(title_terms, content_terms), self.snapshot.idf)
+                    self.delta[report_id] = (indexed_at, features, weights)
+                ids = sorted(self.delta)
+                self.delta_arrays = _assemble(ids, [self.delta[report_id][1:] for report_id in ids])
+            self.since = started
+            if len(self.delta) > COMPACT_THRESHOLD:
+                self._request_build()
+
+    def _vector(self, snapshot, delta, report_id):
+        if report_id in delta:
+            return delta[report_id][1:]
+        vector = snapshot.vector(report_id)
+        if vector is not None:
+            return vector
+        # 差分の読み直し前に表示された日報は、その場でベクトル化する
+        row = ReportSearchDocument.objects.filter(report_id=report_id) \
+                                          .values_list('title_terms', 'content_terms').first()
+        return weigh(*term_frequencies(*row), snapshot.idf) if row else None
+
+    def query(self, report_id, limit):
+        """
+        report_id の日報に似ている日報の [(日報ID, 類似度), ...] を類似度の高い順に最大 limit 件返す。
+        """
+        self.refresh()
+        with self.lock:
+            snapshot, delta, delta_arrays = self.snapshot, self.delta, self.delta_arrays
+        if snapshot is None:
+            return []
+        vector = self._vector(snapshot, delta, report_id)
+        if vector is None or not len(vector[0]):
+            return []
+        features, weights = vector
+
+        scores = {}
+        ids, similarity = snapshot.search(features, weights)
+        for pk, score in zip(ids.tolist(), similarity.tolist()):
+            # 編集された日報はスナップショットの古いベクトルではなく差分で数える
+            if pk not in delta:
+                scores[pk] = score
+        if delta_arrays is not None:
+            delta_ids, indptr, indices, data = delta_arrays
+            similarity = _dot(indptr, indices, data, np.arange(len(delta_ids)), features, weights)
+            scores.update(zip(delta_ids.tolist(), similarity.tolist()))
+        scores.pop(report_id, None)
+        ranked = sorted(((pk, score) for pk, score in scores.items() if score >= MIN_SCORE), key=lambda item: -item[1])
+        return ranked[:limit]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarIndex()
+        return _index
+
+
+def similar_reports(report_id, limit=SIMILAR_LIMIT):
+    """
+    詳細画面用に、report_id の日報に似ている日報（著者・カテゴリーを JOIN 済み）を最大 limit 件返す。
+    各日報の similarity に類似度（0〜1）を持たせる。削除・アーカイブ済みの日報は除く。
+    """
+    if np is None:
+        return []
+    try:
+        # 削除済みの日報を除いても limit 件残るよう、多めに候補を取る
+        ranked = get_index().query(report_id, limit * 2)
+    except (OSError, ValueError):
+        # スナップショットの作成途中・破損など。詳細画面の表示は止めない
+        logger.exception('similar reports lookup failed for report %s', report_id)
+        return []
+    reports = DailyReport.objects.select_related('author', 'category').in_bulk([pk for pk, _ in ranked])
+    similar = []
+    for pk, score in ranked:
+        if pk in reports:
+            reports[pk].similarity = score
+            similar.append(reports[pk])
+    return similar[:limit]
@@ -0,0 +1,205 @@
+"""
+【静的ファイルの配信（ハッシュ付きファイル名・事前圧縮・長期キャッシュ）】
+CSS をテンプレートの <style> に書くと、どの画面を開いても同じ数KBを毎回送ることになります。
+共通の CSS は static ファイル（reports/static/reports/css/app.css）にまとめ、次のように配信します。
+
+- collectstatic でファイル名に内容のハッシュを付ける（app.3f2a9c1b.css。ManifestStaticFilesStorage）。
+  内容が変われば名前も変わるため、ブラウザには1年間・immutable でキャッシュさせてよい
+- 同時に gzip / brotli（brotli パッケージがあれば）で圧縮したファイル（.gz / .br）を作っておき、
+  リクエストごとに圧縮しない
+- 配信は StaticFilesMiddleware（reports/middleware.py）が行う。DEBUG や nginx などの Web サーバーに依存しない
+
+    python manage.py collectstatic --noinput
+"""
+import gzip
+import mimetypes
+import os
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # brotli が無ければ gzip だけを作る
+    brotli = None
+
+# 事前に圧縮するファイルの拡張子（画像やフォントはすでに圧縮されている）
+COMPRESS_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.map', '.html', '.xml'}
+# これより小さいファイルは圧縮しない（ヘッダーのほうが大きくなる）
+COMPRESS_MIN_SIZE = 256
+
+# Accept-Encoding の名前 → 圧縮ファイルの拡張子（優先する順）
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# ハッシュ付きのファイルのキャッシュ期間（1年）。ハッシュ無しのファイル（collectstatic 前の開発環境など）は短くする
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+DEFAULT_MAX_AGE = 60
+
+
+def compress_file(path):
+    """
+    path の .gz（と .br）を作る。元より小さくならない形式は作らない。作ったファイルのパスのリストを返す。
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return []
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ハッシュ付きのファイル名で collectstatic し、テキストのファイルは圧縮版も書き出す。
+    マニフェスト（collectstatic の結果）があれば、DEBUG でも {% static %} はハッシュ付きの URL を返す。
+    """
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in list(paths) + list(self.hashed_files.values()):
+            if os.path.splitext(name)[1].lower() in COMPRESS_EXTENSIONS and self.exists(name):
+                compress_file(self.path(name))
+
+    def url(self, name, force=False):
+        if not force and self.hashed_files:
+            try:
+                return super().url(name, force=True)
+            except ValueError:
+                # collectstatic の後に追加したファイル。ハッシュ無しの名前で返す
+                pass
+        if not force:
+            # マニフェストに無い（collectstatic 前のテストなど）ファイルは、DEBUG でなくてもハッシュ無しの名前で返す
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force=force)
+
+
+@dataclass(frozen=True)
+class StaticFile:
+    """
+    配信する1ファイル（圧縮版ならその内容）とレスポンスヘッダー。
+    """
+    body: bytes
+    headers: dict
+    etag: str
+
+
+def _accepted(request):
+    accept = request.headers.get('Accept-Encoding', '')
+    return {part.split(';')[0].strip().lower() for part in accept.split(',')}
+
+
+class StaticFileServer:
+    """
+    STATIC_URL 以下のパスを STATIC_ROOT（collectstatic の出力先）のファイルで返す。
+    STATIC_ROOT に無ければ、開発用に各アプリの static ディレクトリ（staticfiles の finders）から探す。
+    ハッシュ付きのファイルは内容が変わらないため、読み込んだ内容を (名前, 圧縮形式) ごとにメモリに保持する。
+    """
+
+    def __init__(self):
+        url = urlsplit(settings.STATIC_URL or '')
+        # 別ホスト（CDN など）から配信する設定なら、このプロセスでは配信しない
+        self.prefix = None if url.netloc else '/' + url.path.strip('/') + '/'
+        self.root = settings.STATIC_ROOT
+        hashed = getattr(staticfiles_storage, 'hashed_files', None) or {}
+        self.immutable = set(hashed.values())
+        self.cache = {}
+
+    def _locate(self, name):
+        if self.root:
+            try:
+                path = safe_join(self.root, name)
+            except SuspiciousFileOperation:
+                return None
+            if os.path.isfile(path):
+                return path
+        found = finders.find(name)
+        return found if isinstance(found, str) else None
+
+    def _load(self, name, encodings):
+        path = self._locate(name)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        served, encoding = path, None
+        for candidate, suffix in ENCODINGS:
+            if candidate in encodings and os.path.isfile(path + suffix):
+                served, encoding = path + suffix, candidate
+                break
+        with open(served, 'rb') as f:
+            body = f.read()
+
+        content_type, _ = mimetypes.guess_type(name)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        immutable = name in self.immutable
+        headers = {
+            'Content-Type': content_type,
+            'Content-Length': str(len(body)),
+            'Last-Modified': http_date(stat.st_mtime),
+            'Cache-Control': f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if immutable
+                             else f'public, max-age={DEFAULT_MAX_AGE}',
+            'X-Content-Type-Options': 'nosniff',
+        }
+        if os.path.splitext(name)[1].lower() in COMPRESS_EXTENSIONS:
+            headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}{"-" + encoding if encoding else ""}"'
+        headers['ETag'] = etag
+        return StaticFile(body, headers, etag), immutable
+
+    def lookup(self, name, encodings):
+        """
+        配信する StaticFile を返す（無ければ None）。encodings はクライアントが受け取れる圧縮形式の集合。
+        """
+        key = (name, frozenset(e for e, _ in ENCODINGS if e in encodings))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        loaded = self._load(name, encodings)
+        if loaded is None:
+            return None
+        static_file, immutable = loaded
+        if immutable:
+            self.cache[key] = static_file
+        return static_file
+
+    def serve(self, request):
+        """
+        静的ファイルへの GET / HEAD ならレスポンスを返す。それ以外（静的ファイル以外のパス）は None。
+        """
+        if self.prefix is None or request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        name = request.path[len(self.prefix):]
+        static_file = self.lookup(name, _accepted(request)) if name else None
+        if static_file is None:
+            return None
+        if request.headers.get('If-None-Match') == static_file.etag:
+            response = HttpResponseNotModified()
+            for header in ('ETag', 'Cache-Control', 'Vary'):
+                if header in static_file.headers:
+                    response[header] = static_file.headers[header]
+            return response
+        response = HttpResponse(b'' if request.method == 'HEAD' else static_file.body)
+        for header, value in static_file.headers.items():
+            response[header] = value
+        return response
@@ -0,0 +1,130 @@
+"""
+【集計テーブルの差分更新】
+UserReportStats を日報の作成・編集・削除に合わせて +1 / -1 で更新します。
+更新は UPDATE ... SET col = col + 1 のアトミック更新で行うため、同時投稿でも数がずれません。
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+from .models import DailyReport, UserReportStats
+
+# コンディション → 集計テーブルの列名
+CONDITION_COLUMNS = {
+    'excellent': 'excellent_count',
+    'good': 'good_count',
+    'normal': 'normal_count',
+    'tired': 'tired_count',
+    'bad': 'sos_count',
+}
+
+
+def _shifted(column, delta):
+    # 減算は 0 で止める（集計がずれていても、PositiveIntegerField の CHECK 制約で保存・削除ごと失敗させない）
+    if delta < 0:
+        return Greatest(F(column) + delta, 0)
+    return F(column) + delta
+
+
+def add(user_id, condition, delta):
+    """
+    指定ユーザーの投稿数とコンディション別件数に delta を加える。行が無ければ作成する。
+    """
+    updates = {'report_count': _shifted('report_count', delta)}
+    column = CONDITION_COLUMNS.get(condition)
+    if column:
+        updates[column] = _shifted(column, delta)
+
+    if UserReportStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    if delta < 0:
+        # 行が無い状態での減算は集計漏れ。rebuild_report_stats で補正する
+        return
+    try:
+        with transaction.atomic():
+            UserReportStats.objects.create(
+                user_id=user_id, report_count=delta, **({column: delta} if column else {})
+            )
+    except IntegrityError:
+        # 同時に別リクエストが行を作成した場合は UPDATE でやり直す
+        UserReportStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def report_saved(old, new):
+    """
+    日報の保存による差分を反映する。
+    old / new はそれぞれ保存前後の (author_id, condition)。新規作成時は old=None。
+    """
+    if old == new:
+        return
+    if old is not None:
+        add(old[0], old[1], -1)
+    add(new[0], new[1], +1)
+
+
+def report_deleted(old):
+    add(old[0], old[1], -1)
+
+
+def effort_ranking(limit=5):
+    """
+    投稿数ランキングの上位 limit 名（UserReportStats のリスト。画面の同期版・非同期版で共通）。
+    (report_count DESC) のインデックスを先頭から辿る。集計テーブルに行が無い社員（まだ投稿していない社員）は
+    投稿数0として下位に並べる（論理削除した社員は含めない）。
+    """
+    ranked = list(
+        UserReportStats.objects.select_related('user').filter(user__deleted_at__isnull=True)
+                               .order_by('-report_count', 'user_id')[:limit]
+    )
+    if len(ranked) < limit:
+        others = get_user_model().objects.filter(deleted_at__isnull=True) \
+                                         .exclude(pk__in=[row.user_id for row in ranked]) \
+                                         .order_by('pk')[:limit - len(ranked)]
+        ranked += [UserReportStats(user=user, report_count=0) for user in others]
+    return ranked
+
+
+def sos_ranking(limit=5):
+    """
+    SOS発信（condition='bad'）の回数の上位 limit 名。0回の社員と論理削除した社員は含めない。
+    """
+    return list(
+        UserReportStats.objects.select_related('user').filter(sos_count__gt=0, user__deleted_at__isnull=True)
+                               .order_by('-sos_count', 'user_id')[:limit]
+    )
+
+
+def rebuild():
+    """
+    DailyReport 全件から集計テーブルを作り直す（GROUP BY 1回 + bulk_create）。
+    差分更新のずれを補正する照合（リコンサイル）用。作り直した行数を返す。
+
+    作り直しの間に保存された日報の差分更新（add）を失わないよう、集計の読み取りと置き換えを1つのトランザクションで行い、
+    PostgreSQL ではその間集計テーブルをロックする（rollups.rebuild と同じ）。
+    """
+    aggregates = {
+        column: Count('id', filter=Q(condition=condition))
+        for condition, column in CONDITION_COLUMNS.items()
+    }
+    rows = (
+        DailyReport.objects.order_by()
+        .values('author_id')
+        .annotate(report_count=Count('id'), **aggregates)
+    )
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # 読み取りは許し、add の UPDATE / INSERT だけを待たせる
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {UserReportStats._meta.db_table} IN EXCLUSIVE MODE')
+        stats = [
+            UserReportStats(
+                user_id=row['author_id'],
+                report_count=row['report_count'],
+                **{column: row[column] for column in CONDITION_COLUMNS.values()},
+            )
+            for row in rows
+        ]
+        UserReportStats.objects.all().delete()
+        UserReportStats.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
@@ -0,0 +1,47 @@
+"""
+日報画像を <picture> + srcset で出力するテンプレートタグ。
+
+    {% load report_images %}
+    {% report_picture report 'card' sizes='(max-width: 600px) 100vw, 760px' %}
+
+派生ファイル（reports/images.py）が生成済みなら WebP / JPEG の縮小版を srcset で並べ、
+ブラウザが画面幅に合ったものだけを取得します。未生成の場合は元画像をそのまま表示します。
+"""
+from django import template
+from django.utils.html import format_html
+
+from reports.images import VARIANTS
+
+register = template.Library()
+
+
+def _srcset(report, fmt):
+    storage = report.image.storage
+    return ', '.join(
+        f"{storage.url(entry[fmt])} {entry['width']}w"
+        for entry in (report.image_derivatives.get(variant) for variant in VARIANTS)
+        if entry and fmt in entry
+    )
+
+
+@register.simple_tag
+def report_picture(report, variant, sizes='100vw', alt='投稿画像', style='', loading='lazy'):
+    if not report.image:
+        return ''
+
+    entry = report.image_derivatives.get(variant)
+    if not entry:
+        # 派生ファイルの生成待ち（または生成前の古いデータ）
+        return format_html(
+            '<img src="{}" alt="{}" style="{}" loading="{}" decoding="async">',
+            report.image.url, alt, style, loading,
+        )
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" style="{}" loading="{}" decoding="async"></picture>',
+        _srcset(report, 'webp'), sizes,
+        report.image.storage.url(entry['jpeg']), _srcset(report, 'jpeg'), sizes,
+        entry['width'], entry['height'], alt, style, loading,
+    )
@@ -1,3 +1,1110 @@
-from django.test import TestCase
+import gzip
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles import finders
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, connections, router
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.tests import TEST_CACHES
+
+from . import routers, similar
+from .models import (
+    ArchivedReport, Category, Comment, DailyReport, DepartmentConditionDaily, Job, ReportFacetCount, Tag,
+    UserReportStats,
+)
+from .pagination import DATETIME, FLOAT, NEXT, decode_cursor, encode_cursor
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReportTestCase(TestCase):
+    """
+    社員1人・カテゴリー1つと、日報を作るヘルパー。キャッシュはテストごとに空にする。
+    """
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='tester', password='pass12345', employee_id='T0001', department='開発部',
+        )
+        self.category = Category.objects.create(name='開発', slug='dev')
+
+    def tearDown(self):
+        from . import viewcounter
+
+        # 未反映のPVをテスト用DBの削除後に書き出さないよう捨てる
+        viewcounter.buffer.clear()
+
+    def make_report(self, title='テスト', content='本文', condition='normal', author=None):
+        return DailyReport.objects.create(
+            author=author or self.user, category=self.category, title=title, content=content, condition=condition,
+        )
+
+
+class CursorTests(ReportTestCase):
+    """
+    【キーセットページネーション】並び順キーの型が違うカーソルは先頭ページとして扱う。
+    """
+
+    def test_decode_rejects_other_kind(self):
+        now = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(NEXT, now, 1), DATETIME), (NEXT, now, 1))
+        self.assertIsNone(decode_cursor(encode_cursor(NEXT, now, 1), FLOAT))
+        self.assertIsNone(decode_cursor(encode_cursor(NEXT, 1.5, 1), DATETIME))
+        self.assertIsNone(decode_cursor('garbage', DATETIME))
+
+    def test_search_cursor_on_plain_list(self):
+        reports = [self.make_report(title=f'日報アプリ {i}') for i in range(3)]
+        url = reverse('report_list')
+
+        # 検索結果（search_rank: 数値）のカーソルを通常の一覧（created_at: 日時）で使う
+        response = self.client.get(url, {'cursor': encode_cursor(NEXT, 0.5, reports[1].pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r.pk for r in response.context['page']], [r.pk for r in reversed(reports)])
+
+        # 逆に、通常の一覧のカーソルを検索で使う
+        response = self.client.get(url, {'query': '日報', 'cursor': encode_cursor(NEXT, timezone.now(), 1)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 3)
+
+
+class DetailTests(ReportTestCase):
+    """
+    【詳細画面】コメントが何件あってもクエリ数は変わらず、古いコメントはカーソルで読み込む。
+    """
+
+    def queries_for(self, report):
+        url = reverse('report_detail', args=[report.pk])
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured.captured_queries)
+
+    def test_query_count_does_not_grow_with_comments(self):
+        report = self.make_report()
+        Comment.objects.create(report=report, author=self.user, text='確認しました')
+        # 似ている日報の索引は最初の閲覧で作られるので、先に1回開いておく
+        self.queries_for(report)
+        expected = self.queries_for(report)
+        for i in range(25):
+            Comment.objects.create(report=report, author=self.user, text=f'コメント {i}')
+        self.assertEqual(self.queries_for(report), expected)
+
+    def test_comments_are_paginated_by_cursor(self):
+        report = self.make_report()
+        comments = [Comment.objects.create(report=report, author=self.user, text=f'コメント {i}') for i in range(25)]
+        url = reverse('report_detail', args=[report.pk])
+
+        first = self.client.get(url).context['comments']
+        # 新しい20件を、画面では古い順に並べる
+        self.assertEqual(list(first), comments[5:])
+        self.assertTrue(first.has_next)
+
+        second = self.client.get(url, {'comments': first.next_cursor}).context['comments']
+        self.assertEqual(list(second), comments[:5])
+        self.assertFalse(second.has_next)
+
+    def test_hides_comments_of_deleted_users(self):
+        report = self.make_report()
+        other = get_user_model().objects.create_user(username='other', password='pass12345', employee_id='T0002')
+        kept = Comment.objects.create(report=report, author=self.user, text='確認しました')
+        Comment.objects.create(report=report, author=other, text='了解です')
+        other.deleted_at = timezone.now()
+        other.save(update_fields=['deleted_at'])
+        response = self.client.get(reverse('report_detail', args=[report.pk]))
+        self.assertEqual(list(response.context['comments']), [kept])
+
+
+class SearchTests(ReportTestCase):
+    """
+    【全文検索】部分一致と同じ結果を、タイトル優先の関連度順で返す。
+    """
+
+    def test_filter_reports_ranks_title_first(self):
+        from . import search
+
+        in_content = self.make_report(title='週報', content='日報アプリの改修')
+        in_title = self.make_report(title='日報アプリの改修', content='作業メモ')
+        self.make_report(title='無関係', content='会議')
+
+        reports = search.filter_reports(DailyReport.objects.all(), '日報アプリ').order_by('-search_rank', '-id')
+        self.assertEqual([r.pk for r in reports], [in_title.pk, in_content.pk])
+
+    def test_single_character_matches_anywhere_in_word(self):
+        from . import search
+
+        tired = self.make_report(title='今日は疲れた', content='作業メモ')
+        daily = self.make_report(title='週報', content='日報アプリ')
+
+        def found(query):
+            return sorted(r.pk for r in search.filter_reports(DailyReport.objects.all(), query))
+
+        # 語頭・語中・語末の1文字
+        self.assertEqual(found('今'), [tired.pk])
+        self.assertEqual(found('日'), [tired.pk, daily.pk])
+        self.assertEqual(found('た'), [tired.pk])
+        self.assertEqual(found('報'), [daily.pk])
+        # 2文字以上の語と組み合わせた場合は両方を含む日報だけ
+        self.assertEqual(found('アプリ 報'), [daily.pk])
+        self.assertEqual(found('アプリ た'), [])
+
+
+class RankingTests(ReportTestCase):
+    """
+    【集計テーブル】ランキングは UserReportStats から読み、投稿していない社員も投稿数0で並べる。
+    """
+
+    def test_users_without_reports_are_ranked(self):
+        idle = get_user_model().objects.create_user(username='idle', password='pass12345', employee_id='T0002')
+        self.make_report()
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('report_ranking'))
+        ranking = [(stats.user.username, stats.report_count) for stats in response.context['effort_ranking']]
+        self.assertEqual(ranking, [('tester', 1), (idle.username, 0)])
+
+    def test_decrement_stops_at_zero(self):
+        from . import stats
+
+        report = self.make_report(condition='bad')
+        # 集計がずれて 0 になっている状態で削除しても、保存・削除は失敗しない
+        UserReportStats.objects.filter(user=self.user).update(report_count=0, sos_count=0)
+        stats.report_deleted((report.author_id, report.condition))
+        row = UserReportStats.objects.get(user=self.user)
+        self.assertEqual((row.report_count, row.sos_count), (0, 0))
+
+    def test_rebuild_corrects_drift(self):
+        from . import stats
+
+        self.make_report(condition='bad')
+        self.make_report()
+        UserReportStats.objects.filter(user=self.user).update(report_count=7, sos_count=0)
+        self.assertEqual(stats.rebuild(), 1)
+        row = UserReportStats.objects.get(user=self.user)
+        self.assertEqual((row.report_count, row.sos_count, row.normal_count), (2, 1, 1))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AsyncRankingTests(TransactionTestCase):
+    """
+    【非同期ビュー】ランキングの非同期版は同期版と同じ内容を返す（別スレッドの接続から読むためコミットする）。
+    """
+
+    def tearDown(self):
+        from . import asyncdb
+
+        asyncdb.shutdown()
+
+    def test_same_content_as_sync_view(self):
+        from asgiref.sync import async_to_sync
+
+        from . import async_views, purge, views
+
+        User = get_user_model()
+        category = Category.objects.create(name='開発', slug='dev')
+        users = [
+            User.objects.create_user(username=f'user{i}', password='pass12345', employee_id=f'T000{i}')
+            for i in range(4)
+        ]
+        for user, conditions in zip(users, (['bad', 'normal'], ['bad'], [])):
+            for condition in conditions:
+                DailyReport.objects.create(author=user, category=category, title='日報', content='本文', condition=condition)
+        purge.delete_user(users[1])
+
+        request = RequestFactory().get(reverse('report_ranking'))
+        request.user = users[0]
+
+        async def auser():
+            return users[0]
+
+        request.auser = auser
+        expected = views.report_ranking(request).content
+        self.assertIn('user3'.encode(), expected)
+        self.assertNotIn('user1'.encode(), expected)
+        self.assertEqual(async_to_sync(async_views.report_ranking)(request).content, expected)
+
+
+# バックグラウンドスレッドがテストの途中で書き出さないよう、間隔を長くする
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600)
+class ViewCountTests(ReportTestCase):
+    """
+    【PVカウントの書き込み遅延】閲覧はバッファに貯め、flush でまとめて view_count に反映する。
+    """
+
+    def view(self, report):
+        return self.client.get(reverse('report_detail', args=[report.pk])).context['report'].view_count
+
+    def test_views_reach_view_count(self):
+        from . import viewcounter
+
+        report = self.make_report()
+        self.client.force_login(self.user)
+        self.assertEqual([self.view(report), self.view(report)], [1, 2])
+        report.refresh_from_db()
+        self.assertEqual(report.view_count, 0)
+
+        self.assertEqual(viewcounter.flush(), 1)
+        report.refresh_from_db()
+        self.assertEqual(report.view_count, 2)
+        self.assertEqual(self.view(report), 3)
+
+    def test_immediate_when_interval_is_zero(self):
+        report = self.make_report()
+        self.client.force_login(self.user)
+        with self.settings(VIEW_COUNT_FLUSH_INTERVAL=0):
+            self.assertEqual(self.view(report), 1)
+        report.refresh_from_db()
+        self.assertEqual(report.view_count, 1)
+
+    def test_failed_flush_is_retried_then_dropped(self):
+        from unittest import mock
+
+        from django.db import DatabaseError
+
+        from . import viewcounter
+
+        report = self.make_report()
+        viewcounter.record_view(report.pk)
+        with mock.patch.object(viewcounter, '_apply', side_effect=DatabaseError('down')), \
+                self.assertLogs('reports.viewcounter') as logs:
+            for _ in range(viewcounter.FLUSH_MAX_ATTEMPTS - 1):
+                viewcounter.flush()
+                self.assertEqual(viewcounter.pending_views(report.pk), 1)
+            viewcounter.flush()
+        self.assertEqual(viewcounter.pending_views(report.pk), 0)
+        self.assertEqual(len(logs.records), 2)
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    【読み取りレプリカへの振り分け】閲覧の読み取りはレプリカ、書き込みと書き込み直後の読み取りはプライマリ。
+    （接続名の選択だけを確かめる。実際のクエリは ReplicaQueryTests）
+    """
+
+    def route(self, request):
+        from .middleware import ReplicaRoutingMiddleware
+
+        seen = {}
+
+        def get_response(request):
+            seen['read'] = DailyReport.objects.all().db
+            seen['write'] = router.db_for_write(DailyReport)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return seen, response
+
+    def test_get_reads_from_replica(self):
+        seen, response = self.route(RequestFactory().get('/'))
+        self.assertEqual(seen, {'read': 'replica1', 'write': 'default'})
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        # リクエストの外の読み取りはプライマリ
+        self.assertEqual(DailyReport.objects.all().db, 'default')
+
+    def test_write_pins_reads_to_primary(self):
+        seen, response = self.route(RequestFactory().post('/'))
+        self.assertEqual(seen['read'], 'default')
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        seen, _ = self.route(request)
+        self.assertEqual(seen['read'], 'default')
+
+    def test_without_replicas_uses_default(self):
+        with self.settings(REPLICA_DATABASES=[]):
+            seen, response = self.route(RequestFactory().get('/'))
+            self.assertEqual(seen['read'], 'default')
+            _, response = self.route(RequestFactory().post('/'))
+            self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+
+@skipUnless(settings.REPLICA_DATABASES, 'DB_REPLICA_HOSTS でレプリカの接続名を設定したときだけ実行する')
+@override_settings(CACHES=TEST_CACHES)
+class ReplicaQueryTests(TransactionTestCase):
+    """
+    【読み取りレプリカへの振り分け】2つ目の接続名（テストでは default の MIRROR）で実際に読み取る。
+    """
+    databases = '__all__'
+
+    def test_list_reads_from_replica(self):
+        replica = settings.REPLICA_DATABASES[0]
+        user = get_user_model().objects.create_user(username='tester', password='pass12345', employee_id='T0001')
+        category = Category.objects.create(name='開発', slug='dev')
+        self.client.force_login(user)
+        with CaptureQueriesContext(connections[replica]) as replica_queries, \
+                CaptureQueriesContext(connections['default']) as primary_queries:
+            response = self.client.post(reverse('report_create'), {
+                'category': category.pk, 'condition': 'normal', 'title': 'レプリカ', 'content': '本文',
+            })
+            self.assertEqual(response.status_code, 302)
+            self.client.cookies.pop(routers.PIN_COOKIE)
+            self.assertContains(self.client.get(reverse('report_list')), 'レプリカ')
+        table = DailyReport._meta.db_table
+        self.assertTrue(any('INSERT' in q['sql'] and table in q['sql'] for q in primary_queries))
+        self.assertTrue(any(q['sql'].startswith('SELECT') and table in q['sql'] for q in replica_queries))
+        self.assertFalse(any(q['sql'].startswith(('INSERT', 'UPDATE')) for q in replica_queries))
+
+
+@skipUnless(similar.available(), 'NumPy が無い環境では似ている日報を表示しない')
+class SimilarTests(ReportTestCase):
+    """
+    【似ている日報】スナップショットと、その後に保存された日報（差分）から似ている日報を返す。
+    """
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.enterContext(self.settings(SIMILAR_INDEX_DIR=directory))
+        # 差分の重なりを無くし、スナップショットに入れた日報は差分から読まないようにする
+        self.enterContext(mock.patch.object(similar, 'DELTA_OVERLAP', timedelta(0)))
+        similar._index = None
+        self.addCleanup(setattr, similar, '_index', None)
+
+        self.server = self.make_report(title='サーバー障害', content='本番サーバーが停止したので再起動して復旧した')
+        self.restart = self.make_report(title='サーバー再起動', content='本番サーバーが停止したため再起動した')
+        self.make_report(title='営業', content='お客様と打ち合わせ')
+
+    def similar_ids(self, report):
+        similar.get_index().checked_at = 0  # REFRESH_SECONDS を待たずに差分を読み直す
+        return [r.pk for r in similar.similar_reports(report.pk)]
+
+    def test_build_then_query(self):
+        self.assertEqual(similar.build(), 3)
+        self.assertEqual(self.similar_ids(self.server), [self.restart.pk])
+        self.assertEqual(similar.get_index().delta, {})
+
+    def test_report_saved_after_snapshot_comes_from_delta(self):
+        similar.build()
+        self.similar_ids(self.server)
+        outage = self.make_report(title='サーバー障害の続報', content='本番サーバーが再び停止したので再起動した')
+        self.assertEqual(set(self.similar_ids(self.server)), {self.restart.pk, outage.pk})
+        self.assertIsNone(similar.get_index().snapshot.vector(outage.pk))
+        self.assertIn(outage.pk, similar.get_index().delta)
+
+        # 差分を取り込んだスナップショットからも見つかる
+        self.assertEqual(similar.build(), 4)
+        similar._index = None
+        self.assertEqual(set(self.similar_ids(self.server)), {self.restart.pk, outage.pk})
+        self.assertIsNotNone(similar.get_index().snapshot.vector(outage.pk))
+
+    def test_deleted_and_archived_reports_are_excluded(self):
+        from . import archive, purge
+
+        outage = self.make_report(title='サーバー障害の続報', content='本番サーバーが再び停止したので再起動した')
+        similar.build()
+        self.assertEqual(set(self.similar_ids(self.server)), {self.restart.pk, outage.pk})
+        purge.delete_report(self.restart)
+        archive.archive_batch([outage.pk])
+        self.assertEqual(self.similar_ids(self.server), [])
+
+
+class QueryPlanTests(ReportTestCase):
+    """
+    【クエリプランの回帰テスト】check_query_plans を実行し、各画面のクエリがインデックスで解決されることを確かめる。
+    PostgreSQL では小さなテーブルだとプランナが全件スキャンを選ぶため、enable_seqscan を切って
+    「使えるインデックスがあるか」を検査する（インデックスが無ければ Seq Scan のままになる）。
+    """
+
+    def setUp(self):
+        super().setUp()
+        tag = Tag.objects.create(name='調査')
+        for i in range(30):
+            report = self.make_report(title=f'日報アプリ {i}', condition='bad' if i % 5 == 0 else 'good')
+            report.tags.add(tag)
+        Comment.objects.create(report=report, author=self.user, text='確認しました')
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_views_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out, stderr=StringIO())
+        output = out.getvalue()
+        for name in ('report_list', 'report_detail', 'report_feed', 'report_ranking', 'report_dashboard',
+                     'api_report_list'):
+            self.assertIn(f'{name}: ', output)
+        self.assertIn('すべてのクエリがインデックスで解決されています', output)
+
+    def test_full_scan_is_reported(self):
+        from .management.commands.check_query_plans import Command
+
+        # 本文の完全一致にはインデックスが無い
+        with CaptureQueriesContext(connection) as captured:
+            list(DailyReport.objects.filter(content='本文'))
+        plan, problems = Command()._explain(captured.captured_queries[-1]['sql'], allow_sort=False)
+        self.assertTrue(plan)
+        self.assertTrue(problems, plan)
+
+        # 新着順の一覧は (created_at, id) のインデックスを辿る
+        with CaptureQueriesContext(connection) as captured:
+            list(DailyReport.objects.order_by('-created_at', '-id')[:20])
+        plan, problems = Command()._explain(captured.captured_queries[-1]['sql'], allow_sort=False)
+        self.assertEqual(problems, [], plan)
+
+
+class ArchiveTests(ReportTestCase):
+    """
+    【古い日報のアーカイブ】日報テーブルから外し、詳細画面は閲覧専用で表示し、import_reports で取り込み直せる。
+    """
+
+    def test_archive_old_report(self):
+        import json
+
+        from . import archive
+
+        tag = Tag.objects.create(name='定例')
+        old = self.make_report(title='昔の日報', condition='bad')
+        old.tags.add(tag)
+        Comment.objects.create(report=old, author=self.user, text='確認しました')
+        created_at = timezone.now() - timedelta(days=800)
+        # 作成日時は自動設定なので、アーカイブの対象になるよう直接書き換える（ロールアップは作り直す）
+        DailyReport.objects.filter(pk=old.pk).update(created_at=created_at)
+        call_command('rebuild_condition_rollups', stdout=StringIO())
+        recent = self.make_report(title='最近の日報')
+
+        self.assertEqual(archive.archive_before(archive.cutoff()), (1, []))
+
+        self.client.force_login(self.user)
+        page = self.client.get(reverse('report_list')).context['page']
+        self.assertEqual([r.pk for r in page], [recent.pk])
+        self.assertEqual(UserReportStats.objects.get(user=self.user).sos_count, 0)
+        self.assertFalse(DepartmentConditionDaily.objects.filter(condition='bad', report_count__gt=0).exists())
+        self.assertFalse(ReportFacetCount.objects.filter(tag=tag, report_count__gt=0).exists())
+        self.assertFalse(Comment.objects.exists())
+
+        response = self.client.get(reverse('report_detail', args=[old.pk]))
+        self.assertTemplateUsed(response, 'reports/report_archived.html')
+        self.assertContains(response, '昔の日報')
+        self.assertContains(response, '確認しました')
+        self.assertNotContains(response, 'name="text"')
+
+        # アーカイブのレコードは import_reports の入力形式のまま取り込み直せる
+        record = archive.unpack(ArchivedReport.objects.get(pk=old.pk).payload)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'archived.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        call_command('import_reports', path, stdout=StringIO())
+        restored = DailyReport.objects.get(title='昔の日報')
+        self.assertEqual(restored.created_at, created_at)
+        self.assertEqual(list(restored.tags.all()), [tag])
+        self.assertEqual([c.text for c in restored.comments.all()], ['確認しました'])
+
+
+class FragmentCacheTests(ReportTestCase):
+    """
+    【一覧カードのフラグメントキャッシュ】日報の保存と、タグ・カテゴリー・ユーザー名の変更でカードを描画し直す。
+    """
+
+    def render(self, report):
+        from . import fragments
+
+        cards, hits, misses = fragments.render_cards(
+            DailyReport.objects.select_related('author', 'category').filter(pk=report.pk)
+        )
+        return str(cards[0]), hits
+
+    def test_cards_are_invalidated(self):
+        tag = Tag.objects.create(name='定例')
+        report = self.make_report(title='最初のタイトル')
+        report.tags.add(tag)
+
+        html, hits = self.render(report)
+        self.assertEqual(hits, 0)
+        self.assertIn('最初のタイトル', html)
+        self.assertEqual(self.render(report), (html, 1))
+
+        report.title = '直したタイトル'
+        report.save()
+        html, hits = self.render(report)
+        self.assertEqual(hits, 0)
+        self.assertIn('直したタイトル', html)
+
+        for obj, field, value in ((tag, 'name', '週次定例'), (self.category, 'name', '開発部門'),
+                                  (self.user, 'username', 'renamed')):
+            setattr(obj, field, value)
+            obj.save()
+            html, hits = self.render(report)
+            self.assertEqual(hits, 0)
+            self.assertIn(value, html)
+            self.assertEqual(self.render(report)[1], 1)
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False)
+class ImageDerivativeTests(ReportTestCase):
+    """
+    【画像の派生ファイル】コミット後に縮小版・WebP版を作り、画像を差し替えたら古い派生ファイルを消す。
+    """
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=media))
+        self.client.force_login(self.user)
+
+    def upload(self, name, size):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 80, 40)).save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def post(self, url, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {
+                'category': self.category.pk, 'condition': 'normal', 'title': '写真つき', 'content': '本文', 'image': image,
+            })
+        self.assertEqual(response.status_code, 302)
+
+    def test_derivatives_follow_image(self):
+        from django.core.files.storage import default_storage
+
+        self.post(reverse('report_create'), self.upload('photo.png', (2000, 1000)))
+        report = DailyReport.objects.get()
+        card = report.image_derivatives['card']
+        self.assertEqual((card['width'], card['height']), (800, 400))
+        first = [entry[fmt] for entry in report.image_derivatives.values() for fmt in ('jpeg', 'webp')]
+        self.assertEqual(len(first), 4)
+        self.assertTrue(all(default_storage.exists(name) for name in first))
+
+        response = self.client.get(reverse('report_list'))
+        self.assertContains(response, card['webp'])
+
+        # 画像を差し替えると、古い画像の派生ファイルは消えて新しい画像の派生ファイルができる
+        self.post(reverse('report_update', args=[report.pk]), self.upload('photo.png', (600, 600)))
+        report.refresh_from_db()
+        self.assertFalse(any(default_storage.exists(name) for name in first))
+        self.assertEqual(report.image_derivatives['card']['height'], 500)
+        self.assertTrue(default_storage.exists(report.image_derivatives['card']['jpeg']))
+
+
+class StaticFilesTests(SimpleTestCase):
+    """
+    【静的ファイルの配信】collectstatic のハッシュ付き・事前圧縮済みのファイルを長期キャッシュのヘッダーで返す。
+    """
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.enterContext(self.settings(STATIC_ROOT=root))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(finders.find('reports/css/app.css'), 'rb') as f:
+            self.original = f.read()
+
+    def test_serves_hashed_precompressed_file(self):
+        url = static('reports/css/app.css')
+        self.assertRegex(url, r'/app\.[0-9a-f]{12}\.css$')
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(gzip.decompress(response.content), self.original)
+
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(plain.content, self.original)
+
+        cached = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_unhashed_and_missing_files(self):
+        response = self.client.get(settings.STATIC_URL.rstrip('/') + '/reports/css/app.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(settings.STATIC_URL.rstrip('/') + '/reports/missing.css').status_code, 404)
+
+
+class MetricsTests(ReportTestCase):
+    """
+    【計測】/metrics は画面ごとのリクエスト数・SQL本数を Prometheus 形式で返し、トークンが設定されていれば要求する。
+    """
+
+    def setUp(self):
+        from . import metrics
+
+        super().setUp()
+        # 集計値はプロセス全体で共有されるため、テストごとに空の集計を使う
+        self.enterContext(mock.patch.object(metrics, 'registry', metrics.Registry()))
+
+    def test_metrics_output(self):
+        self.make_report()
+        self.client.force_login(self.user)
+        self.client.get(reverse('report_list'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE reports_http_requests_total counter', body)
+        self.assertRegex(body, r'reports_http_requests_total\{[^}]*view="report_list"[^}]*\} 1')
+        self.assertRegex(body, r'reports_db_queries_per_request_count\{[^}]*view="report_list"[^}]*\} 1')
+
+    @override_settings(METRICS_TOKEN='secret-token')
+    def test_token_required(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+class ImportTests(ReportTestCase):
+    """
+    【一括取り込み】入力の作成日時・更新日時をそのまま保存し、他の保存の auto_now には影響しない。
+    """
+
+    def test_import_keeps_timestamps(self):
+        from datetime import datetime, timezone as dt_timezone
+        from .transfer import ReportImporter
+
+        created_at = datetime(2024, 4, 1, 9, 0, tzinfo=dt_timezone.utc)
+        record = {
+            'author': 'T0001', 'category': 'dev', 'title': '移行した日報', 'content': '本文',
+            'created_at': created_at.isoformat(), 'updated_at': '2024-04-02T09:00:00+00:00', 'tags': ['移行'],
+            'comments': [{'author': 'T0001', 'text': '了解です', 'created_at': '2024-04-01T10:00:00+00:00'}],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(ReportImporter().import_batch([(1, record)]), 1)
+        # 日報・コメントは INSERT 1回ずつで、作成日時を UPDATE で書き戻さない（パーティション間の移動が起きない）
+        writes = [re.match(r'(INSERT INTO|UPDATE) "?(\w+)', q['sql']) for q in queries]
+        for table in (DailyReport._meta.db_table, Comment._meta.db_table):
+            self.assertEqual([m[1] for m in writes if m and m[2] == table], ['INSERT INTO'], table)
+
+        report = DailyReport.objects.get(title='移行した日報')
+        self.assertEqual(report.created_at, created_at)
+        self.assertEqual(report.updated_at, datetime(2024, 4, 2, 9, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(report.comments.get().created_at, datetime(2024, 4, 1, 10, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(report.feed_entries.get().created_at, created_at)
+
+        # フィールドの auto_now / auto_now_add は書き換えない（並行する保存は現在時刻になる）
+        self.assertTrue(DailyReport._meta.get_field('created_at').auto_now_add)
+        self.assertTrue(DailyReport._meta.get_field('updated_at').auto_now)
+        self.assertGreater(self.make_report().created_at, created_at)
+
+
+class ExportTests(ReportTestCase):
+    """
+    【一括出力】条件で絞り込んだ日報を、チャンクごとに読みながら CSV / JSONL でストリーミング出力する。
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.url = reverse('report_export')
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8'), response
+
+    def test_csv_has_bom_and_filters_rows(self):
+        from . import views
+
+        other = get_user_model().objects.create_user(
+            username='other', password='pass12345', employee_id='S0001', department='営業部',
+        )
+        for i in range(5):
+            self.make_report(title=f'開発の日報 {i}')
+        self.make_report(title='営業の日報', author=other)
+        old = self.make_report(title='古い日報')
+        DailyReport.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+        # チャンクの境目をまたいでも全件が出力される
+        with mock.patch.object(views, 'EXPORT_CHUNK_SIZE', 2):
+            body, response = self.export(
+                department='開発部', date_from=(timezone.localdate() - timedelta(days=7)).isoformat(),
+            )
+        self.assertTrue(body.startswith('\ufeffauthor,category,title,'))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(
+            response['Content-Disposition'], f'attachment; filename="reports-{timezone.localdate():%Y%m%d}.csv"',
+        )
+        titles = sorted(line.split(',')[2] for line in body.splitlines()[1:])
+        self.assertEqual(titles, [f'開発の日報 {i}' for i in range(5)])
+
+    def test_jsonl_includes_comments(self):
+        import json
+
+        report = self.make_report(title='現場作業')
+        report.tags.add(Tag.objects.create(name='調査'))
+        Comment.objects.create(report=report, author=self.user, text='確認しました')
+        body, response = self.export(format='jsonl')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['title'], '現場作業')
+        self.assertEqual(records[0]['tags'], ['調査'])
+        self.assertEqual([c['text'] for c in records[0]['comments']], ['確認しました'])
+
+    def test_rejects_invalid_conditions(self):
+        self.assertEqual(self.client.get(self.url, {'format': 'xlsx'}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class ApiTests(ReportTestCase):
+    """
+    【JSON API】一覧画面と同じ絞り込み条件で返し、内容が変わらなければ 304 を返す。
+    """
+
+    def test_list_filters_like_report_list(self):
+        self.make_report(title='日報アプリの改修')
+        self.make_report(title='週報')
+        response = self.client.get(reverse('api_report_list'), {'query': '日報', 'fields': 'title'})
+        self.assertEqual([row['title'] for row in response.json()['results']], ['日報アプリの改修'])
+
+    def test_etag_covers_next_cursor(self):
+        from datetime import timedelta
+
+        self.make_report(title='1')
+        self.make_report(title='2')
+        url = reverse('api_report_list')
+        first = self.client.get(url, {'limit': 2})
+        self.assertIsNone(first.json()['next_cursor'])
+        etag = first['ETag']
+        self.assertEqual(self.client.get(url, {'limit': 2}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # ページの後ろ（古い側）に日報が増えると、ページに並ぶ日報は同じでも next_cursor が変わる
+        older = self.make_report(title='0')
+        DailyReport.objects.filter(pk=older.pk).update(created_at=older.created_at - timedelta(days=1))
+        response = self.client.get(url, {'limit': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['next_cursor'])
+
+    def test_sparse_fields(self):
+        self.make_report(title='日報')
+        url = reverse('api_report_list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'title,condition'})
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'title', 'condition'])
+        # 著者・カテゴリーの JOIN も、タグの prefetch も実行しない
+        user_table = get_user_model()._meta.db_table
+        self.assertFalse(any(user_table in q['sql'] or 'reports_category' in q['sql'] or 'reports_tag' in q['sql']
+                             for q in queries))
+
+        response = self.client.get(url, {'fields': 'author,tags'})
+        row = response.json()['results'][0]
+        self.assertEqual(row['author']['employee_id'], 'T0001')
+        self.assertEqual(row['tags'], [])
+
+        response = self.client.get(url, {'fields': 'title,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_cursor_round_trip(self):
+        reports = [self.make_report(title=str(i)) for i in range(5)]
+        url = reverse('api_report_list')
+        pages, cursor = [], None
+        while True:
+            body = self.client.get(url, {'limit': 2, 'fields': 'title', **({'cursor': cursor} if cursor else {})}).json()
+            pages.append([row['id'] for row in body['results']])
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        newest_first = [r.pk for r in reversed(reports)]
+        self.assertEqual(pages, [newest_first[0:2], newest_first[2:4], newest_first[4:]])
+
+        # 2ページ目の prev_cursor で1ページ目に戻る
+        second = self.client.get(url, {'limit': 2, 'cursor': self.client.get(url, {'limit': 2}).json()['next_cursor']})
+        back = self.client.get(url, {'limit': 2, 'cursor': second.json()['prev_cursor']}).json()
+        self.assertEqual([row['id'] for row in back['results']], newest_first[0:2])
+
+    def test_detail_etag(self):
+        report = self.make_report(title='日報')
+        url = reverse('api_report_detail', args=[report.pk])
+
+        def etag(fields):
+            response = self.client.get(url, {'fields': fields})
+            self.assertEqual(response.status_code, 200)
+            return response['ETag']
+
+        first = etag('title,author')
+        response = self.client.get(url, {'fields': 'title,author'}, HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        Comment.objects.create(report=report, author=self.user, text='確認しました')
+        after_comment = etag('title,author')
+        self.assertNotEqual(after_comment, first)
+
+        report.refresh_from_db()
+        report.title = '直した日報'
+        report.save()
+        after_edit = etag('title,author')
+        self.assertNotEqual(after_edit, after_comment)
+
+        # ユーザー名の変更（世代番号）は、著者を返す場合だけ ETag を変える
+        title_only = etag('title')
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertNotEqual(etag('title,author'), after_edit)
+        self.assertEqual(etag('title'), title_only)
+
+        self.assertEqual(self.client.get(reverse('api_report_detail', args=[report.pk + 100])).status_code, 404)
+
+
+class RollupTests(ReportTestCase):
+    """
+    【ロールアップ】差分更新で保ち、SOS が出た日はジョブで日報から作り直す。
+    """
+
+    def sos_count(self):
+        return DepartmentConditionDaily.objects.filter(condition='bad').values_list('report_count', flat=True).first()
+
+    def test_sos_report_refreshes_rollups(self):
+        from . import alerts, jobs
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = self.make_report(condition='bad')
+            alerts.report_saved(report)
+        self.assertEqual(sorted(Job.objects.values_list('kind', flat=True)), ['notify_sos', 'refresh_rollups'])
+
+        # シグナルを経由しない変更でずれていても、ジョブの実行で日報の件数に戻る
+        Job.objects.filter(kind='notify_sos').delete()
+        DepartmentConditionDaily.objects.update(report_count=5)
+        self.assertEqual(jobs.work_batch(), 1)
+        self.assertEqual(self.sos_count(), 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_rebuild_and_clamped_decrement(self):
+        from . import rollups
+
+        report = self.make_report(condition='bad')
+        day = timezone.localdate(report.created_at)
+        self.assertEqual(rollups.rebuild(day, day), 1)
+        self.assertEqual(self.sos_count(), 1)
+
+        # 件数がずれて 0 になっていても、日報の削除は失敗しない
+        DepartmentConditionDaily.objects.update(report_count=0)
+        rollups.report_deleted((report.created_at, report.department, report.category_id, report.condition))
+        self.assertEqual(self.sos_count(), 0)
+
+
+class FacetTests(ReportTestCase):
+    """
+    【ファセット件数】タグの付け外し・削除に合わせて件数テーブルを差分更新する。
+    """
+
+    def test_counts_follow_tags(self):
+        python, django = Tag.objects.create(name='Python'), Tag.objects.create(name='Django')
+        report = self.make_report(condition='bad')
+        report.tags.add(python, django)
+        self.make_report().tags.add(python)
+
+        response = self.client.get(reverse('report_list'), {'tag': [python.pk, django.pk]})
+        self.assertEqual([r.pk for r in response.context['page']], [report.pk])
+        response = self.client.get(reverse('report_list'), {'tag': [python.pk, django.pk], 'tag_mode': 'any'})
+        self.assertEqual(len(response.context['page']), 2)
+
+        report.tags.remove(django)
+        rows = ReportFacetCount.objects.filter(tag__isnull=False).values_list('tag__name')
+        counts = dict(rows.annotate(n=Sum('report_count')))
+        self.assertEqual(counts, {'Python': 2, 'Django': 0})
+
+    def test_decrement_stops_at_zero(self):
+        tag = Tag.objects.create(name='Python')
+        report = self.make_report()
+        report.tags.add(tag)
+        ReportFacetCount.objects.update(report_count=0)
+        report.tags.remove(tag)
+        self.assertEqual(ReportFacetCount.objects.get(tag=tag).report_count, 0)
+
+    def test_rebuild_matches_reports(self):
+        from . import facets
+
+        tag = Tag.objects.create(name='Python')
+        self.make_report().tags.add(tag)
+        self.make_report(condition='bad')
+        ReportFacetCount.objects.update(report_count=9)
+        facets.rebuild()
+        rows = sorted(ReportFacetCount.objects.values_list('condition', 'tag__name', 'report_count'), key=str)
+        self.assertEqual(rows, sorted([('normal', None, 1), ('bad', None, 1), ('normal', 'Python', 1)], key=str))
+
+
+class FeedTests(ReportTestCase):
+    """
+    【部署フィード】投稿時に部署の受信箱へ入れ、異動・削除に追従する。
+    """
+
+    def feed_ids(self, user):
+        self.client.force_login(user)
+        return [r.pk for r in self.client.get(reverse('report_feed')).context['page']]
+
+    def test_feed_follows_department_and_deletion(self):
+        from . import jobs, purge
+
+        colleague = get_user_model().objects.create_user(
+            username='colleague', password='pass12345', employee_id='T0002', department='開発部',
+        )
+        outsider = get_user_model().objects.create_user(
+            username='outsider', password='pass12345', employee_id='T0003', department='営業部',
+        )
+        mine, deleted = self.make_report(), self.make_report(title='消す日報')
+        self.assertEqual(self.feed_ids(colleague), [deleted.pk, mine.pk])
+        self.assertEqual(self.feed_ids(outsider), [])
+
+        purge.delete_report(deleted)
+        self.assertEqual(self.feed_ids(colleague), [mine.pk])
+
+        # 異動すると、過去の日報の行もジョブで新しい部署へ移る
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.department = '営業部'
+            self.user.save()
+        jobs.work_batch()
+        self.assertEqual(self.feed_ids(outsider), [mine.pk])
+        self.assertEqual(self.feed_ids(colleague), [])
+
+
+class PurgeTests(ReportTestCase):
+    """
+    【論理削除とパージ】削除は即座に画面・集計から消え、関連行はパージで少しずつ消える。
+    """
+
+    def test_delete_user_then_purge_in_batches(self):
+        from . import purge
+
+        other = get_user_model().objects.create_user(
+            username='other', password='pass12345', employee_id='T0002', department='開発部',
+        )
+        tag = Tag.objects.create(name='定例')
+        report = self.make_report()
+        report.tags.add(tag)
+        others_report = self.make_report(author=other)
+        for target in (report, report, others_report):
+            Comment.objects.create(report=target, author=self.user, text='確認しました')
+        Comment.objects.create(report=report, author=other, text='了解です')
+        others_report.refresh_from_db()
+        self.assertEqual(others_report.comment_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(purge.delete_user(self.user), 1)
+        self.assertFalse(self.client.login(username='tester', password='pass12345'))
+        self.assertFalse(DailyReport.objects.filter(pk=report.pk).exists())
+        self.assertEqual(UserReportStats.objects.get(user=self.user).report_count, 0)
+        self.assertTrue(Job.objects.filter(kind='purge_deleted').exists())
+
+        # 1回に1行ずつ削除しても、最後には関連行ごと消える
+        steps = 0
+        while not purge.purge_step(batch_size=1).done:
+            steps += 1
+            self.assertLess(steps, 20)
+        self.assertGreater(steps, 1)
+        self.assertFalse(DailyReport.all_objects.filter(pk=report.pk).exists())
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(DailyReport.tags.through.objects.filter(tag=tag).exists())
+        self.assertFalse(Comment.objects.filter(author__username='tester').exists())
+        others_report.refresh_from_db()
+        self.assertEqual(others_report.comment_count, 0)
+        self.assertEqual(purge.pending()['users'], 0)
+
+
+class BatchTests(ReportTestCase):
+    """
+    【日報の一括投稿】全行を同じ選択肢で検証し、1行でもエラーがあれば何も保存しない。
+    """
+
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.leader = User.objects.create_user(
+            username='leader', password='pass12345', employee_id='L0001', department='開発部', position='リーダー',
+        )
+        User.objects.create_user(username='sales', password='pass12345', employee_id='S0001', department='営業部')
+        self.tag = Tag.objects.create(name='現場')
+        self.url = reverse('api_report_batch')
+
+    def post(self, rows):
+        return self.client.post(self.url, {'reports': rows}, content_type='application/json')
+
+    def row(self, author='T0001', **values):
+        return {
+            'author': author, 'category': self.category.pk, 'tags': [self.tag.pk],
+            'condition': 'normal', 'title': '現場作業', 'content': '配線工事', **values,
+        }
+
+    def test_saves_all_rows(self):
+        self.client.force_login(self.leader)
+        response = self.post([self.row(), self.row(author='L0001', title='巡回')])
+        self.assertEqual(response.status_code, 201)
+        reports = DailyReport.objects.filter(pk__in=response.json()['ids']).order_by('pk')
+        self.assertEqual([(r.author_id, r.department) for r in reports],
+                         [(self.user.pk, '開発部'), (self.leader.pk, '開発部')])
+        self.assertEqual([list(r.tags.all()) for r in reports], [[self.tag], [self.tag]])
+        self.assertEqual(UserReportStats.objects.get(user=self.user).report_count, 1)
+
+    def test_rejects_batch_with_invalid_row(self):
+        self.client.force_login(self.leader)
+        # 他の部署の社員の日報は投稿できない
+        response = self.post([self.row(), self.row(author='S0001')])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.json()['errors']], [1])
+        self.assertFalse(DailyReport.objects.exists())
+
+    def test_requires_batch_position(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.post([self.row()]).status_code, 403)
+        self.assertFalse(DailyReport.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BenchmarkTests(TransactionTestCase):
+    """
+    【ベンチマーク】seed_benchmark で作ったデータで run_benchmark が全画面を計測でき、書き込みは残さない。
+    計測はレプリカを含む全接続のクエリを数えるため、レプリカからも見えるようコミットする。
+    """
+    databases = '__all__'
+
+    def tearDown(self):
+        from . import viewcounter
+
+        viewcounter.buffer.clear()
+
+    def test_seed_and_run(self):
+        import json
+
+        call_command('seed_benchmark', users=4, reports=12, comments=1, batch_size=5, stdout=StringIO())
+        self.assertEqual(DailyReport.objects.count(), 12)
+        self.assertEqual(Comment.objects.count(), sum(DailyReport.objects.values_list('comment_count', flat=True)))
+        # 集計テーブルも投入した日報と一致している
+        self.assertEqual(UserReportStats.objects.aggregate(total=Sum('report_count'))['total'], 12)
+        self.assertEqual(DepartmentConditionDaily.objects.aggregate(total=Sum('report_count'))['total'], 12)
+
+        output = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'bench.json')
+        call_command('run_benchmark', requests=2, warmup=0, output=output, stdout=StringIO())
+        with open(output, encoding='utf-8') as f:
+            result = json.load(f)
+        self.assertEqual(result['meta']['reports'], 12)
+        endpoints = result['endpoints']
+        self.assertEqual(endpoints['report_create']['status_codes'], [302])
+        for name, measured in endpoints.items():
+            self.assertEqual(measured['requests'], 2, name)
+            if name != 'report_create':
+                self.assertEqual(measured['status_codes'], [200], name)
+        # report_create の計測はロールバックされる
+        self.assertEqual(DailyReport.objects.count(), 12)
+
+        out = StringIO()
+        call_command('run_benchmark', requests=2, warmup=0, only=['report_detail'], compare=output, stdout=out)
+        self.assertIn('report_detail: p50_ms', out.getvalue())
@@ -0,0 +1,307 @@
+"""
+【日報データの一括入出力（ストリーミング）】
+loaddata は fixture 全体をメモリに読み込み1行ずつ save() するため、大量データの移行に向きません。
+ここでは JSONL（1行1日報）または CSV を1レコードずつ読み書きし、
+
+- 入力: batch_size 件ごとに bulk_create（日報・タグ中間テーブル・コメント）して1トランザクションでコミット
+- 出力: .iterator(chunk_size=...) でチャンクごとに取得し、その場で書き出す（画面からの出力は views.report_export）
+
+ことで、件数に関係なくメモリ使用量を一定に保ちます。
+
+レコード形式（JSONL）:
+    {"author": "<社員番号>", "category": "<カテゴリーのslug>", "title": "...", "content": "...",
+     "condition": "normal", "created_at": "2025-01-01T09:00:00+00:00", "updated_at": "...",
+     "view_count": 0, "image": "uploads/a.jpg", "tags": ["Python", "エラー解決"],
+     "comments": [{"author": "<社員番号>", "text": "...", "created_at": "..."}]}
+CSV ではタグを "|" 区切りの1列で表し、コメントは扱いません。
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from . import facets, feed, rollups, search, stats
+from .models import Category, Comment, DailyReport, ReportSearchDocument, Tag, keep_timestamps
+
+CSV_FIELDS = [
+    'author', 'category', 'title', 'content', 'condition',
+    'created_at', 'updated_at', 'view_count', 'image', 'tags',
+]
+TAG_SEPARATOR = '|'
+CONDITIONS = {value for value, _ in DailyReport.CONDITION_CHOICES}
+
+
+class RecordError(ValueError):
+    """1レコード分の入力エラー（その行だけスキップする）"""
+
+
+# ---------------------------------------------------------------- 出力
+
+def export_queryset(queryset=None, with_comments=True):
+    """
+    出力用の queryset。タグ・コメントは iterator のチャンクごとに prefetch される。
+    queryset を渡すと、その絞り込み条件のまま ID 順に出力する。
+    """
+    if queryset is None:
+        queryset = DailyReport.objects.all()
+    # 出力しない列（ユーザーのパスワード・自己紹介など）は読み込まない
+    queryset = queryset.select_related('author', 'category').prefetch_related('tags').only(
+        'author__employee_id', 'category__slug', 'title', 'content', 'condition',
+        'created_at', 'updated_at', 'view_count', 'image',
+    )
+    if with_comments:
+        # 削除済みのユーザーのコメントは出力しない（パージで削除される）
+        comments = Comment.objects.select_related('author').only('report_id', 'author__employee_id', 'text', 'created_at') \
+                                  .filter(author__deleted_at__isnull=True).order_by('created_at', 'id')
+        queryset = queryset.prefetch_related(Prefetch('comments', queryset=comments))
+    return queryset.order_by('id')
+
+
+def report_to_record(report, with_comments=True):
+    record = {
+        'author': report.author.employee_id,
+        'category': report.category.slug,
+        'title': report.title,
+        'content': report.content,
+        'condition': report.condition,
+        'created_at': report.created_at.isoformat(),
+        'updated_at': report.updated_at.isoformat(),
+        'view_count': report.view_count,
+        'image': report.image.name if report.image else '',
+        'tags': [tag.name for tag in report.tags.all()],
+    }
+    if with_comments:
+        record['comments'] = [
+            {'author': c.author.employee_id, 'text': c.text, 'created_at': c.created_at.isoformat()}
+            for c in report.comments.all()
+        ]
+    return record
+
+
+class _Echo:
+    """csv.writer の書き込み先。書いた文字列をそのまま返す"""
+
+    def write(self, value):
+        return value
+
+
+def iter_jsonl(reports):
+    """
+    日報を1件ずつ JSONL の行にして返すジェネレーター（StreamingHttpResponse 用）。
+    """
+    for report in reports:
+        yield json.dumps(report_to_record(report), ensure_ascii=False) + '\n'
+
+
+def iter_csv(reports):
+    """
+    日報を1件ずつ CSV の行にして返すジェネレーター。最初にヘッダー行を返す。
+    """
+    writer = csv.DictWriter(_Echo(), fieldnames=CSV_FIELDS)
+    yield writer.writeheader()
+    for report in reports:
+        record = report_to_record(report, with_comments=False)
+        record['tags'] = TAG_SEPARATOR.join(record['tags'])
+        yield writer.writerow(record)
+
+
+def write_jsonl(stream, reports):
+    count = 0
+    for line in iter_jsonl(reports):
+        stream.write(line)
+        count += 1
+    return count
+
+
+def write_csv(stream, reports):
+    lines = iter_csv(reports)
+    stream.write(next(lines))
+    count = 0
+    for line in lines:
+        stream.write(line)
+        count += 1
+    return count
+
+
+# ---------------------------------------------------------------- 入力
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        tags = row.get('tags') or ''
+        row['tags'] = [name for name in tags.split(TAG_SEPARATOR) if name]
+        yield row
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise RecordError(f'日時の形式が不正です: {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_default_timezone())
+    return parsed
+
+
+def bulk_create_keeping_timestamps(model, objs, batch_size=None):
+    """
+    objs の作成日時・更新日時を入力のまま保存する bulk_create（INSERT のみ。models.keep_timestamps を参照）。
+    保存したインスタンスのリストを返す。
+    """
+    with keep_timestamps():
+        return model.objects.bulk_create(objs, batch_size=batch_size)
+
+
+class ReportImporter:
+    """
+    レコードを batch_size 件ずつまとめて取り込む。
+    社員番号・slug・タグ名 → ID の対応はバッチ単位で IN 句1回ずつ引き、結果をキャッシュする。
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.users = {}
+        self.categories = {}
+        self.tags = {}
+        self.errors = []
+
+    def _resolve(self, cache, model, field, keys):
+        missing = {key for key in keys if key not in cache}
+        if missing:
+            cache.update(model.objects.filter(**{f'{field}__in': missing}).values_list(field, 'id'))
+        return cache
+
+    def _resolve_tags(self, names):
+        self._resolve(self.tags, Tag, 'name', names)
+        new = sorted({name for name in names if name not in self.tags})
+        if new:
+            # 未登録のタグはまとめて作成する
+            Tag.objects.bulk_create([Tag(name=name) for name in new])
+            self.tags.update(Tag.objects.filter(name__in=new).values_list('name', 'id'))
+
+    def _build(self, record, now):
+        users, categories = self.users, self.categories
+        author_id = users.get(str(record.get('author', '')))
+        if author_id is None:
+            raise RecordError(f"社員番号 {record.get('author')!r} のユーザーが存在しません")
+        category_id = categories.get(record.get('category'))
+        if category_id is None:
+            raise RecordError(f"カテゴリー {record.get('category')!r} が存在しません")
+        condition = record.get('condition') or 'normal'
+        if condition not in CONDITIONS:
+            raise RecordError(f'コンディション {condition!r} は不正です')
+        if not record.get('title') or not record.get('content'):
+            raise RecordError('タイトルと本文は必須です')
+
+        created_at = _parse_datetime(record.get('created_at')) or now
+        comments = []
+        for comment in record.get('comments') or []:
+            comment_author = users.get(str(comment.get('author', '')))
+            if comment_author is None:
+                raise RecordError(f"コメントの社員番号 {comment.get('author')!r} のユーザーが存在しません")
+            comments.append(Comment(
+                author_id=comment_author,
+                text=comment.get('text', ''),
+                created_at=_parse_datetime(comment.get('created_at')) or created_at,
+            ))
+
+        report = DailyReport(
+            author_id=author_id,
+            category_id=category_id,
+            title=record['title'][:200],
+            content=record['content'],
+            condition=condition,
+            view_count=int(record.get('view_count') or 0),
+            image=record.get('image') or None,
+            created_at=created_at,
+            updated_at=_parse_datetime(record.get('updated_at')) or created_at,
+            comment_count=len(comments),
+        )
+        return report, [self.tags[name] for name in record.get('tags') or []], comments
+
+    def import_batch(self, numbered_records):
+        """
+        (行番号, レコード) のリストを1トランザクションで取り込み、取り込んだ件数を返す。
+        """
+        records = [record for _, record in numbered_records]
+        self._resolve(self.users, get_user_model(), 'employee_id', {
+            str(key) for record in records
+            for key in [record.get('author')] + [c.get('author') for c in record.get('comments') or []]
+        })
+        self._resolve(self.categories, Category, 'slug', {record.get('category') for record in records})
+        self._resolve_tags({name for record in records for name in record.get('tags') or []})
+
+        now = timezone.now()
+        built = []
+        for number, record in numbered_records:
+            try:
+                built.append(self._build(record, now))
+            except (RecordError, KeyError, TypeError, ValueError) as e:
+                self.errors.append((number, str(e)))
+        if not built:
+            return 0
+
+        # 投稿時の部署（signals.set_report_department と同じ値）をバッチ単位で1回引いて埋める
+        departments = dict(get_user_model().objects.filter(pk__in={report.author_id for report, _, _ in built})
+                                                   .values_list('pk', 'department'))
+        for report, _, _ in built:
+            report.department = departments[report.author_id]
+
+        with transaction.atomic():
+            reports = bulk_save(built, keep_timestamps=True)
+        return len(reports)
+
+
+def bulk_save(built, keep_timestamps=False):
+    """
+    (日報, タグIDのリスト, コメントのリスト) のリストを bulk_create でまとめて保存し、保存した日報のリストを返す。
+    日報・タグの中間テーブル・コメントはそれぞれ INSERT 1回。日報の部署は呼び出し元で埋めておくこと。
+    keep_timestamps=True なら、日報とコメントの作成日時・更新日時を入力のまま保存する（取り込み用）。
+    呼び出し元のトランザクションの中で実行する（取り込みと一括投稿 reports/batch.py で共通）。
+    """
+    def create(model, objs):
+        if keep_timestamps:
+            return bulk_create_keeping_timestamps(model, objs)
+        return model.objects.bulk_create(objs)
+
+    Through = DailyReport.tags.through
+    reports = create(DailyReport, [report for report, _, _ in built])
+
+    links = [
+        (report, tag_id)
+        for report, (_, tag_ids, _) in zip(reports, built)
+        for tag_id in set(tag_ids)
+    ]
+    Through.objects.bulk_create([Through(dailyreport_id=report.pk, tag_id=tag_id) for report, tag_id in links])
+
+    comments = []
+    for report, (_, _, report_comments) in zip(reports, built):
+        for comment in report_comments:
+            comment.report_id = report.pk
+            comments.append(comment)
+    create(Comment, comments)
+
+    # bulk_create はシグナルを送らないため、派生テーブルもここでまとめて更新する
+    ReportSearchDocument.objects.bulk_create([search.build_document(report) for report in reports])
+    deltas = {}
+    for report in reports:
+        key = (report.author_id, report.condition)
+        deltas[key] = deltas.get(key, 0) + 1
+    for (author_id, condition), delta in deltas.items():
+        stats.add(author_id, condition, delta)
+    rollups.add_reports(reports)
+    facets.add_reports(reports, links)
+    feed.add_reports(reports)
+    return reports
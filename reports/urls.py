@@ -1,16 +1,26 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+# 【追加】閲覧画面（一覧・詳細・ランキング）は ASGI で起動したときだけ非同期版を使う（config/asgi.py）
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
     # Read (一覧)
-    path('', views.report_list, name='report_list'),
+    path('', read_views.report_list, name='report_list'),
+    
+    # 【追加】Read (自分の部署の日報)
+    path('feed/', views.report_feed, name='report_feed'),
     
     # Read (詳細)
-    path('<int:pk>/', views.report_detail, name='report_detail'),
+    path('<int:pk>/', read_views.report_detail, name='report_detail'),
     
     # Create (新規作成)
     path('create/', views.report_create, name='report_create'),
     
+    # 【追加】Create (一括投稿)
+    path('batch/', views.report_batch, name='report_batch'),
+    
     # Update (編集)
     path('<int:pk>/edit/', views.report_update, name='report_update'),
     
@@ -18,5 +28,19 @@ urlpatterns = [
     path('<int:pk>/delete/', views.report_delete, name='report_delete'),
     
     # 【追加】ランキングページ
-    path('ranking/', views.report_ranking, name='report_ranking'),
-]
\ No newline at end of file
+    path('ranking/', read_views.report_ranking, name='report_ranking'),
+    
+    # 【追加】部署別コンディションのダッシュボード
+    path('dashboard/', views.report_dashboard, name='report_dashboard'),
+    
+    # 【追加】日報の一括出力（CSV / JSONL）
+    path('export/', views.report_export, name='report_export'),
+    
+    # 【追加】読み取り専用の JSON API
+    path('api/reports/', api.report_list, name='api_report_list'),
+    path('api/reports/<int:pk>/', api.report_detail, name='api_report_detail'),
+    path('api/reports/batch/', api.report_batch, name='api_report_batch'),
+    
+    # 【追加】Prometheus 用の計測値
+    path('metrics', views.metrics_view, name='metrics'),
+]
@@ -0,0 +1,186 @@
+"""
+【PVカウントの書き込み遅延（Write-Behind）】
+詳細ページを開くたびに UPDATE ... SET view_count = view_count + 1 を発行すると、
+人気の日報では同じ行のロック待ちでリクエストが直列化してしまいます。
+
+ここではプロセス内のメモリに「未反映の加算値」を貯めておき、一定間隔ごとに
+    WITH v(id, delta) AS (VALUES (1, 12), (5, 3), ...)
+    UPDATE reports_dailyreport SET view_count = view_count + v.delta FROM v WHERE id = v.id
+という1本のSQLでまとめて反映します。プロセス終了時（atexit）にも残りを書き出します。
+書き出しに失敗した加算値はバッファに戻して再試行し、FLUSH_MAX_ATTEMPTS 回続けて失敗したら捨てます
+（DBが止まっている間にメモリが増え続けないようにする）。
+
+settings.VIEW_COUNT_FLUSH_INTERVAL（秒）で間隔を設定します。0 以下なら遅延せず毎回即時反映します。
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+# 1本の UPDATE にまとめる最大行数
+FLUSH_BATCH_SIZE = 500
+
+# 書き出しを続けて失敗したときに、加算値を捨てるまでの回数
+FLUSH_MAX_ATTEMPTS = 5
+
+
+class ViewCountBuffer:
+    """
+    日報ID → 未反映のPV加算値 を保持するスレッドセーフなバッファ。
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stop = threading.Event()
+        self._failures = 0
+
+    @property
+    def interval(self):
+        return getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 5)
+
+    def record(self, pk, count=1):
+        """
+        PVを記録する。DBには interval 秒以内にまとめて反映される。
+        戻り値は、記録前に読み込んだDBの値に足すと現在のPV数になる加算値。
+        """
+        with self._lock:
+            delta = self._pending.get(pk, 0) + count
+            self._pending[pk] = delta
+        if self.interval <= 0:
+            self.flush()
+            return count
+        self._ensure_worker()
+        return delta
+
+    def pending(self, pk):
+        """
+        まだDBに反映されていない加算値（画面表示で永続値に足す分）。
+        """
+        with self._lock:
+            return self._pending.get(pk, 0)
+
+    def flush(self):
+        """
+        貯まっている加算値をDBに書き出し、反映した件数（日報数）を返す。
+        失敗した場合は加算値をバッファに戻し、次回に再試行する（FLUSH_MAX_ATTEMPTS 回続けて失敗したら捨てる）。
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        items = sorted(pending.items())  # ID順に更新してデッドロックを避ける
+        try:
+            with transaction.atomic():
+                for start in range(0, len(items), FLUSH_BATCH_SIZE):
+                    _apply(items[start:start + FLUSH_BATCH_SIZE])
+        except DatabaseError:
+            with self._lock:
+                self._failures += 1
+                failures = self._failures
+                if failures < FLUSH_MAX_ATTEMPTS:
+                    for pk, delta in items:
+                        self._pending[pk] = self._pending.get(pk, 0) + delta
+                else:
+                    self._failures = 0
+            # ログは続けて失敗した最初の1回と、捨てたときだけ出す
+            if failures == 1:
+                logger.exception('view count flush failed; %d reports kept for retry', len(items))
+            elif failures >= FLUSH_MAX_ATTEMPTS:
+                logger.error('view count flush failed %d times; dropped views of %d reports', failures, len(items))
+            return 0
+        self._failures = 0
+        return len(items)
+
+    def clear(self):
+        """
+        貯まっている加算値を書き出さずに捨て、捨てた件数（日報数）を返す（テストの後片付け用）。
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._failures = 0
+        return len(pending)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name='view-count-flusher', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        # interval 秒ごとにバッファを書き出すバックグラウンドスレッド
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            finally:
+                # このスレッド用のDB接続を使い回さず閉じる
+                connection.close()
+
+    def shutdown(self):
+        """
+        バックグラウンドスレッドを止め、残りを書き出す（プロセス終了時に呼ばれる）。
+        残りが無いとき・日報のテーブルが無いとき（テスト用DBの削除後など）は書き出さない。
+        """
+        self._stop.set()
+        with self._lock:
+            if not self._pending:
+                return
+        from .models import DailyReport
+
+        try:
+            if DailyReport._meta.db_table not in connection.introspection.table_names():
+                logger.warning('view count flush at shutdown skipped; %s does not exist', DailyReport._meta.db_table)
+                return
+            self.flush()
+        except Exception:
+            logger.exception('view count flush at shutdown failed')
+
+
+def _apply(items):
+    """
+    (id, 加算値) のリストを1本の UPDATE ... FROM (VALUES ...) で反映する。
+    """
+    from .models import DailyReport
+
+    table = DailyReport._meta.db_table
+    if connection.vendor in ('postgresql', 'sqlite'):
+        values = ', '.join(['(%s, %s)'] * len(items))
+        params = [value for item in items for value in item]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH v(id, delta) AS (VALUES {values}) "
+                f"UPDATE {table} SET view_count = {table}.view_count + v.delta "
+                f"FROM v WHERE {table}.id = v.id",
+                params,
+            )
+    else:
+        # UPDATE ... FROM に対応していないDBでは1件ずつアトミック更新
+        for pk, delta in items:
+            DailyReport.objects.filter(pk=pk).update(view_count=F('view_count') + delta)
+
+
+buffer = ViewCountBuffer()
+atexit.register(buffer.shutdown)
+
+
+def record_view(pk):
+    return buffer.record(pk)
+
+
+def pending_views(pk):
+    return buffer.pending(pk)
+
+
+def flush():
+    return buffer.flush()
@@ -1,64 +1,211 @@
+import itertools
+import logging
+from datetime import datetime, time, timedelta
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
-from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Count, Q, F  # F, Q, Count 全部必要です
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
 
 # 【ここが修正ポイント】 Category を追加
-from .models import DailyReport, Category
-from .forms import DailyReportForm, CommentForm
+from .models import DailyReport, Category, Tag
+from .forms import DailyReportForm, CommentForm, ConditionDashboardForm, ReportExportForm
+from .pagination import paginate
+from . import (
+    alerts, archive, batch, facets, feed, fragments, images, metrics, purge, rollups, search, similar, stats,
+    transfer, viewcounter,
+)
+
+logger = logging.getLogger(__name__)
+
+# 詳細画面で一度に表示するコメント数
+COMMENT_PAGE_SIZE = 20
+
+# 一括出力で1回のSELECTに取得する件数（メモリ使用量はこの件数分で頭打ちになる）
+EXPORT_CHUNK_SIZE = 2000
+
+def _report_facets(filters):
+    """
+    いまの絞り込み条件でのカテゴリー・調子・タグごとの件数と、表示するタグ（ID → Tag）を返す（reports/facets.py）。
+    """
+    def base():
+        reports, _ = search.apply_filters(
+            DailyReport.objects.all(), filters['query'], None,
+            tag_ids=filters['tag_ids'], match_all=filters['match_all'],
+        )
+        return reports
+
+    counts = facets.counts(
+        base, filters['query'], filters['category_id'], filters['condition'], filters['tag_ids'],
+        cache_key=repr(sorted(filters.items())),
+    )
+    # 絞り込み中のタグは件数の上位に無くても表示する（クリックで解除できるように）
+    tag_ids = {tag_id for tag_id, _ in counts['tags']} | set(filters['tag_ids'])
+    return counts, Tag.objects.in_bulk(tag_ids)
+
+def _toggle_url(params, key, value, multiple=False):
+    """
+    params の key に value を付け外しした一覧画面の URL（カーソルは先頭に戻す）。
+    """
+    params = params.copy()
+    params.pop('cursor', None)
+    value = str(value)
+    if multiple:
+        values = params.getlist(key)
+        params.setlist(key, [v for v in values if v != value] if value in values else values + [value])
+    elif params.get(key) == value:
+        params.pop(key)
+    else:
+        params[key] = value
+    query = params.urlencode()
+    return f'?{query}' if query else '?'
+
+def _facet_links(params, filters, counts, tags, categories):
+    """
+    ファセットの表示用データ（名前・件数・クリック時の URL・選択中か）を作る。
+    """
+    def link(label, count, key, value, active, multiple=False):
+        return {'label': label, 'count': count, 'url': _toggle_url(params, key, value, multiple), 'active': active}
+
+    links = {
+        'categories': [
+            link(category.name, counts['categories'].get(category.pk, 0), 'category', category.pk,
+                 category.pk == filters['category_id'])
+            for category in categories
+        ],
+        'conditions': [
+            link(label, counts['conditions'].get(value, 0), 'condition', value, value == filters['condition'])
+            for value, label in DailyReport.CONDITION_CHOICES
+        ],
+        'tags': [],
+    }
+    tag_counts = dict(counts['tags'])
+    for tag_id in [tag_id for tag_id, _ in counts['tags']] + [t for t in filters['tag_ids'] if t not in tag_counts]:
+        if tag_id in tags:
+            links['tags'].append(link(tags[tag_id].name, tag_counts.get(tag_id, 0), 'tag', tag_id,
+                                      tag_id in filters['tag_ids'], multiple=True))
+    if len(filters['tag_ids']) > 1:
+        # 複数タグの AND / OR の切り替え
+        links['tag_mode'] = {
+            'any': not filters['match_all'],
+            'url': _toggle_url(params, 'tag_mode', 'any'),
+        }
+    return links
 
 def report_list(request):
     """
     日報一覧表示 + 検索・絞り込み機能
     【DB評価ポイント: 検索クエリの構築】
     ユーザーの入力に基づいて動的にクエリを構築します。
-    - Qオブジェクト: 「タイトル または 本文」というOR条件検索を実現。
-    - filter: カテゴリーIDによる完全一致検索を実現。
+    - 全文検索: 「タイトル または 本文」を n-gram インデックスで検索し、関連度順に並べる。
+    - filter: カテゴリーID・調子による完全一致検索を実現。
+    - タグ: 複数タグの AND / OR を中間テーブルのサブクエリ1つで絞り込む。
     これらを組み合わせることで、柔軟な絞り込みを行います。
+
+    【ファセット件数】
+    いまの条件でのカテゴリー・調子・タグごとの件数を、タグごとの COUNT(*) ではなく
+    ファセット件数テーブル（ReportFacetCount）の SUM で求めます（詳細は reports/facets.py）。
+
+    【キーセットページネーション】
+    全件をテンプレートに渡すのではなく、(created_at, id) をキーにしたカーソルで
+    1ページ分だけを取得します。何ページ目でも1ページ目と同じコストになります。
     """
     # 基本のクエリ（N+1対策済み）
-    reports = DailyReport.objects.select_related('author', 'category') \
-                                 .prefetch_related('tags') \
-                                 .order_by('-created_at')
+    # 並び順 (created_at DESC, id DESC) は paginate() 側で付与する
+    # タグは、カードのキャッシュに無かった日報の分だけ fragments.render_cards() が prefetch する
+    reports = DailyReport.objects.select_related('author', 'category')
 
-    # --- ここから検索ロジック ---
-    
-    # 1. キーワード検索（タイトル または 本文 に含まれるか）
-    query = request.GET.get('query') # 検索フォームの入力値を取得
-    if query:
-        # icontains は「大文字小文字を区別しないあいまい検索」(= LIKE '%keyword%')
-        reports = reports.filter(
-            Q(title__icontains=query) | Q(content__icontains=query)
-        )
+    # 1. キーワード検索 + 2. カテゴリー・調子 + 3. タグの絞り込み（report_export と共通）
+    filters = search.parse_filters(request.GET)
+    reports, order_field = search.apply_filters(reports, **filters)
+
+    # 4. ページ分割（LIMIT page_size + 1 のみ発行）
+    page = paginate(reports, request.GET.get('cursor'), order_field=order_field)
 
-    # 2. カテゴリー絞り込み
-    category_id = request.GET.get('category')
-    if category_id:
-        reports = reports.filter(category_id=category_id)
+    # 5. 【フラグメントキャッシュ】カード1枚分のHTMLを日報ごとにキャッシュから取り出す
+    cards, hits, misses = fragments.render_cards(page)
 
-    # --- ここまで ---
+    # 6. ファセット件数
+    counts, tags = _report_facets(filters)
+
+    # ページ送りリンク用: 検索条件を保ったままカーソルだけ差し替える
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    base_query = params.urlencode()
 
     # 検索フォームのプルダウン用に全カテゴリーを取得
-    categories = Category.objects.all()
+    categories = list(Category.objects.all())
 
     context = {
-        'reports': reports,
+        'cards': cards,
+        'page': page,
+        'base_query': base_query,
         'categories': categories, # テンプレートに渡す
+        'facets': _facet_links(request.GET, filters, counts, tags, categories),
+        'filters': filters,
         'request': request,       # 検索キーワードをフォームに残すために渡す（通常は自動で入るが明示的に）
     }
-    return render(request, 'reports/report_list.html', context)
+    response = render(request, 'reports/report_list.html', context)
+    # キャッシュの効き具合を本番でも確認できるようにヘッダーで返す
+    response['X-Card-Cache'] = f'hit={hits} miss={misses}'
+    return response
+
+@login_required
+def report_feed(request):
+    """
+    自分の部署の日報（新着順）
+    【ファンアウト・オン・ライト】
+    日報を著者と JOIN して部署で絞り込み・ソートするのではなく、投稿時に書いておいた部署ごとの受信箱
+    （DepartmentFeedEntry）を (department, created_at, id) のインデックス順に1ページ分だけ読み、
+    その日報を主キーで取得します。部署の日報が何件あっても表示コストは変わりません（詳細は reports/feed.py）。
+    スタッフは ?department= で他の部署のフィードも表示できます。
+    """
+    department = request.user.department
+    if request.user.is_staff and request.GET.get('department'):
+        department = request.GET['department']
+
+    page = feed.page(department, request.GET.get('cursor'))
+    cards, hits, misses = fragments.render_cards(page)
+
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    context = {
+        'cards': cards,
+        'page': page,
+        'base_query': params.urlencode(),
+        'department': department,
+    }
+    response = render(request, 'reports/report_feed.html', context)
+    response['X-Card-Cache'] = f'hit={hits} miss={misses}'
+    return response
 
 def report_detail(request, pk):
     """
     記事詳細表示とコメント投稿
     【1対多の逆参照 (Reverse Relationship)】
     DailyReport(1) に対して Comment(多) の関係が成立しています。
-    テンプレート側で `report.comments.all` を呼び出すことで、
-    外部キーを逆方向に辿り、関連データを効率的に取得・表示します。
+
+    【クエリ数の固定 (N+1対策)】
+    - 日報本体 + 著者 + カテゴリー: select_related で JOIN して1クエリ
+    - タグ: prefetch_related で1クエリ
+    - コメント: 著者を JOIN した上で、新しい順に COMMENT_PAGE_SIZE 件だけ1クエリ
+    - コメント件数: 非正規化カラム comment_count を表示（COUNT(*) は実行しない）
+    コメントが何件あってもクエリ数は変わりません。古いコメントはカーソルで追加読み込みします。
+
+    【似ている日報】
+    TF-IDF のベクトルのメモリマップ済みスナップショットで上位の日報IDを求め、その日報だけを主キーで1クエリで読みます
+    （日報テーブルの全件と比べることはしません。詳細は reports/similar.py）。
     """
-    report = get_object_or_404(DailyReport, pk=pk)
+    try:
+        report = DailyReport.objects.select_related('author', 'category').prefetch_related('tags').get(pk=pk)
+    except DailyReport.DoesNotExist:
+        return report_archived(request, pk)
 
     # コメント投稿処理（POSTリクエスト時）
     if request.method == 'POST':
@@ -79,20 +226,40 @@ def report_detail(request, pk):
     else:
         form = CommentForm()
 
-    # 【アトミック更新 (Atomic Update)】
-    # Fオブジェクトを使用し、データベースレベルで `view_count = view_count + 1` を実行。
-    # 競合状態（レースコンディション）を防ぎ、正確なPV集計を実現。
-    DailyReport.objects.filter(pk=pk).update(view_count=F('view_count') + 1)
-    
-    # DBで更新された最新の値を再取得
-    report.refresh_from_db()
+    # 【PVカウントの書き込み遅延 (Write-Behind)】
+    # 1閲覧ごとに UPDATE を発行せず、プロセス内に加算値を貯めて数秒ごとにまとめて反映する。
+    # 同じ行へのロック競合が無くなり、人気の日報でもリクエストが直列化しない。
+    # 画面には「DBの値 + まだ反映していない加算値」を表示する（再取得のクエリは不要）。
+    report.view_count += viewcounter.record_view(report.pk)
+
+    # コメントは新しい順に1ページ分を取得し、画面では古い順（時系列）に並べ直す
+    # （削除済みのユーザーのコメントは、パージで消えるまで表示しない）
+    comments = paginate(
+        report.comments.select_related('author').filter(author__deleted_at__isnull=True),
+        request.GET.get('comments'),
+        page_size=COMMENT_PAGE_SIZE,
+    )
+    comments.object_list.reverse()
 
     context = {
         'report': report,
+        'comments': comments,
         'comment_form': form,
+        'similar_reports': similar.similar_reports(report.pk),
     }
     return render(request, 'reports/report_detail.html', context)
 
+def report_archived(request, pk):
+    """
+    【アーカイブ済みの日報】
+    日報テーブルに無い ID は、アーカイブ（reports/archive.py）から探して閲覧専用で表示する。
+    圧縮したレコード1行にコメント・タグも含まれているため、読み込みは主キー検索1回 + コメント著者名の1回。
+    """
+    archived = archive.load(pk)
+    if archived is None:
+        raise Http404('No DailyReport matches the given query.')
+    return render(request, 'reports/report_archived.html', {'archived': archived})
+
 # 【追加】未ログインなら実行させない
 @login_required
 def report_create(request):
@@ -112,16 +279,48 @@ def report_create(request):
                     report.save()
                     # 多対多関係の保存（中間テーブルへのレコード作成）
                     form.save_m2m()
+                    # SOS の通知はコミット後にジョブキューへ積む（このトランザクションでは送らない）
+                    alerts.report_saved(report)
+                    # 画像の縮小版はコミット後に別スレッドで生成（レスポンスを待たせない）
+                    if report.image:
+                        images.schedule_derivatives(report)
                 
                 return redirect('report_list')
                 
-            except Exception as e:
-                print(f"Transaction Error: {e}")
+            except Exception:
+                logger.exception('日報の投稿に失敗しました（ロールバック済み）')
     else:
         form = DailyReportForm()
 
     return render(request, 'reports/report_form.html', {'form': form})
 
+@login_required
+def report_batch(request):
+    """
+    日報の一括投稿（リーダーがメンバーの分をまとめて投稿する）
+    【一括 INSERT】
+    選択肢（社員・カテゴリー・タグ）を1クエリずつ読んで全行を検証し、エラーは行ごとに表示します。
+    全行が正しければ、1つのトランザクションで日報を bulk_create 1回、タグの中間テーブルを bulk_create 1回で保存します。
+    200件でも、1件ずつ投稿したときの約1000クエリではなく、十数クエリで終わります（reports/batch.py）。
+    """
+    if not batch.can_submit(request.user):
+        raise PermissionDenied
+    choices = batch.choices_for(request.user)
+
+    if request.method == 'POST':
+        formset = batch.formset(request.POST, choices=choices)
+        if formset.is_valid():
+            batch.save([form.cleaned_data for form in formset if form.has_changed()], choices)
+            return redirect('report_list')
+    else:
+        try:
+            rows = int(request.GET.get('rows', 10))
+        except ValueError:
+            rows = 10
+        formset = batch.formset(choices=choices, rows=rows)
+
+    return render(request, 'reports/report_batch.html', {'formset': formset, 'max_rows': batch.MAX_ROWS})
+
 # 【追加】未ログインなら実行させない
 @login_required
 def report_update(request, pk):
@@ -135,11 +334,27 @@ def report_update(request, pk):
         raise PermissionDenied
 
     if request.method == 'POST':
+        # フォームの検証で instance の値が書き換わるため、編集前に SOS だったかを先に覚えておく
+        was_sos = report.condition == alerts.SOS_CONDITION
+        old_derivatives = report.image_derivatives
         form = DailyReportForm(request.POST, request.FILES, instance=report)
         if form.is_valid():
             # 更新時もタグの整合性を保つためトランザクションを使用
             with transaction.atomic():
-                form.save()
+                report = form.save(commit=False)
+                update_fields = [f for f in form.Meta.fields if f != 'tags'] + ['updated_at']
+                if 'image' in form.changed_data:
+                    # 画像が差し替え・削除されたら古い派生ファイルを（コミット後に）消し、作り直す
+                    report.image_derivatives = {}
+                    update_fields.append('image_derivatives')
+                    images.discard_derivatives(old_derivatives)
+                    if report.image:
+                        images.schedule_derivatives(report)
+                # PV数・コメント数は別経路でアトミックに加算されるため、
+                # フォームの項目だけを UPDATE して古い値での上書きを防ぐ
+                report.save(update_fields=update_fields)
+                form.save_m2m()
+                alerts.report_saved(report, was_sos)
             return redirect('report_detail', pk=pk)
     else:
         form = DailyReportForm(instance=report)
@@ -159,8 +374,9 @@ def report_delete(request, pk):
         raise PermissionDenied
 
     if request.method == 'POST':
-        # 関連するタグ情報（中間テーブル）もカスケード、または設定に従い適切に削除される
-        report.delete()
+        # 【論理削除】deleted_at を設定して即座に非表示にする。コメント・タグの中間テーブルなどの関連行は
+        # バックグラウンドのパージで少しずつ削除する（reports/purge.py）
+        purge.delete_report(report)
         return redirect('report_list')
 
     return render(request, 'reports/report_confirm_delete.html', {'report': report})
@@ -169,27 +385,143 @@ def report_delete(request, pk):
 def report_ranking(request):
     """
     ランキング・集計画面
-    【DB評価ポイント: 集計関数と条件付き集計】
-    Pythonのforループで数えるのではなく、データベースの `GROUP BY` と集計関数を使用。
-    特に `Count(filter=Q(...))` を使うことで、「特定の条件（SOS）に合致する行だけ」を
-    効率的にカウントしています。
+    【DB評価ポイント: 集計テーブルによる Top-N 読み出し】
+    リクエストのたびに全日報を JOIN + GROUP BY + COUNT するのではなく、
+    日報の保存・削除時に差分更新している集計テーブル（UserReportStats）を読むだけにしています。
+    (report_count DESC) / (sos_count DESC) のインデックスを先頭から5件辿るだけなので、
+    日報が何件に増えてもコストは一定です。
+    集計の元になる条件付きカウント（Count(filter=Q(...))）は reports/stats.py の rebuild() を参照。
     """
-    User = get_user_model()
-
-    # 1. 投稿数ランキング（記事数が多い順）
-    # SQLイメージ: SELECT username, COUNT(report.id) AS report_count FROM user ... GROUP BY user.id ORDER BY report_count DESC
-    effort_ranking = User.objects.annotate(
-        report_count=Count('reports')
-    ).order_by('-report_count')[:5] # 上位5名
+    # 1. 投稿数ランキング（記事数が多い順。まだ投稿していない社員は投稿数0として下位に並べる）
+    # SQLイメージ: SELECT ... FROM reports_userreportstats JOIN custom_user ... ORDER BY report_count DESC LIMIT 5
+    effort_ranking = stats.effort_ranking(5) # 上位5名
 
-    # 2. SOS発信ランキング（条件: condition='bad' の回数）
-    # 関連するテーブル（reports）の中で、特定の条件を満たすものだけを数える高度なクエリ
-    sos_ranking = User.objects.annotate(
-        sos_count=Count('reports', filter=Q(reports__condition='bad'))
-    ).filter(sos_count__gt=0).order_by('-sos_count')[:5] # 0回の人を除外して上位5名
+    # 2. SOS発信ランキング（条件: condition='bad' の回数。0回の人を除外して上位5名）
+    sos_ranking = stats.sos_ranking(5)
 
     context = {
         'effort_ranking': effort_ranking,
         'sos_ranking': sos_ranking,
     }
-    return render(request, 'reports/report_ranking.html', context)
\ No newline at end of file
+    return render(request, 'reports/report_ranking.html', context)
+
+
+@login_required
+def report_dashboard(request):
+    """
+    部署別コンディションのダッシュボード
+    【DB評価ポイント: ロールアップテーブル】
+    日報テーブルを部署・調子・日付で GROUP BY するのではなく、日次に集計済みの
+    DepartmentConditionDaily から表示期間の行だけを読み、週・月単位に足し合わせます。
+    コストは表示期間の長さで決まり、日報の件数には依存しません（詳細は reports/rollups.py）。
+    """
+    form = ConditionDashboardForm(request.GET)
+    data = form.cleaned_data if form.is_valid() else {}
+    period = data.get('period') or 'week'
+    span = data.get('span') or 12
+    category_id = data.get('category')
+
+    # 表示期間: 今週（今月）を含む直近 span 週（か月）
+    today = timezone.localdate()
+    if period == 'month':
+        month = today.year * 12 + today.month - 1 - (span - 1)
+        date_from = today.replace(year=month // 12, month=month % 12 + 1, day=1)
+    else:
+        date_from = today - timedelta(days=today.weekday(), weeks=span - 1)
+
+    buckets, departments, cells = rollups.sos_trend(date_from, today, period, category_id)
+
+    # テンプレートで扱いやすいよう、部署ごとの行（期間ごとのセルのリスト）に組み替える
+    rows = []
+    for cell in cells.values():
+        # 背景色の濃さ（SOS率 25% 以上で最も濃くする）
+        cell['heat'] = round(min(cell['rate'] * 4, 1.0), 2)
+    for department in departments:
+        row_cells = [cells.get((bucket, department)) for bucket in buckets]
+        total = sum(cell['total'] for cell in row_cells if cell)
+        sos = sum(cell['sos'] for cell in row_cells if cell)
+        rows.append({
+            'department': department,
+            'cells': row_cells,
+            'total': total,
+            'sos': sos,
+            'rate': sos / total if total else 0.0,
+        })
+
+    context = {
+        'period': period,
+        'span': span,
+        'category_id': category_id,
+        'date_from': date_from,
+        'date_to': today,
+        'buckets': buckets,
+        'rows': rows,
+        'categories': Category.objects.all(),
+    }
+    return render(request, 'reports/report_dashboard.html', context)
+
+
+@login_required
+@require_GET
+def report_export(request):
+    """
+    日報の一括出力（CSV / JSONL）
+    【ストリーミング出力】
+    一覧画面と同じ query / category に加えて、期間（date_from, date_to）と部署（department）で絞り込めます。
+    全件をリストにしてから書き出すのではなく、.iterator(chunk_size=...) で EXPORT_CHUNK_SIZE 件ずつ取得し、
+    タグもチャンクごとに IN 句1回で prefetch しながら StreamingHttpResponse で1行ずつ送ります。
+    そのため何百万件でもメモリ使用量は一定で、最初の行はすぐにダウンロードが始まります。
+    """
+    form = ReportExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    data = form.cleaned_data
+
+    # 一覧画面の「CSV出力」から来た場合は、調子・タグの条件も一覧と同じにする
+    list_filters = search.parse_filters(request.GET)
+    reports, _ = search.apply_filters(
+        DailyReport.objects.all(), data['query'], data['category'],
+        condition=list_filters['condition'], tag_ids=list_filters['tag_ids'], match_all=list_filters['match_all'],
+    )
+    if data['department']:
+        reports = reports.filter(author__department=data['department'])
+    # 日付は created_at の範囲条件にする（__date で関数をかけるとインデックスが使えない）
+    tz = timezone.get_current_timezone()
+    if data['date_from']:
+        reports = reports.filter(created_at__gte=datetime.combine(data['date_from'], time.min, tzinfo=tz))
+    if data['date_to']:
+        reports = reports.filter(created_at__lt=datetime.combine(data['date_to'] + timedelta(days=1), time.min, tzinfo=tz))
+
+    # 行の取得（iterator の評価）はビューを抜けた後に行われるため、読み取り先の接続（レプリカ）をここで確定させる
+    reports = reports.using(reports.db)
+
+    export_format = data['format'] or 'csv'
+    reports = transfer.export_queryset(reports, with_comments=export_format == 'jsonl') \
+                      .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if export_format == 'jsonl':
+        rows = transfer.iter_jsonl(reports)
+        content_type = 'application/x-ndjson; charset=utf-8'
+    else:
+        # Excel で文字化けしないよう先頭に BOM を付ける
+        rows = itertools.chain(['\ufeff'], transfer.iter_csv(reports))
+        content_type = 'text/csv; charset=utf-8'
+
+    response = StreamingHttpResponse(rows, content_type=content_type)
+    filename = f"reports-{timezone.localdate():%Y%m%d}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus のスクレイプ用エンドポイント（/metrics）
+    画面ごとのレイテンシ・SQL本数・重複クエリ・テンプレート描画時間を返します（reports/metrics.py）。
+    settings.METRICS_TOKEN が設定されている場合は Authorization: Bearer <token> を要求します。
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not constant_time_compare(supplied, token):
+            return HttpResponse(status=401)
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')